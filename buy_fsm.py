@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 抢购状态机 - MONITORING → ARMED → FIRING → CONFIRMING → RECOVERING，每个状态声明唤醒时刻和输入需求
+
+import math
+import time
+from collections import deque
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from countdown_tracker import CountdownTracker
+from phase_estimator import PhaseEstimator
+from timer_decoder import TimerDecoder
+from ui_state import CONFIRM, LISTING, SUCCESS, UNKNOWN
+
+MONITORING = "monitoring"  # 读倒计时、锁定截止时刻和整秒边界
+ARMED = "armed"  # 临近点击时刻，精确等待
+FIRING = "firing"  # 已点击购买，等待确认弹窗
+CONFIRMING = "confirming"  # 点击确认，等待弹窗关闭
+RECOVERING = "recovering"  # 等待回到列表，刷新并检查三角币
+DONE = "done"
+
+# 各状态需要的输入：frame 为逐帧界面状态事件，ocr 为倒计时 / 三角币识别
+STATE_NEEDS = {
+    MONITORING: ("ocr",),
+    ARMED: (),
+    FIRING: ("frame",),
+    CONFIRMING: ("frame",),
+    RECOVERING: ("frame", "ocr"),
+    DONE: (),
+}
+
+
+class FrameEvent(NamedTuple):
+    """一帧的界面状态"""
+    timestamp: float  # 截图时间戳 (perf_counter)
+    state: str  # UiStateClassifier 的分类结果
+    frame: Optional[np.ndarray]
+
+
+class Transition(NamedTuple):
+    """一次状态转换"""
+    timestamp: float
+    source: str
+    target: str
+    reason: str
+
+
+class BuyStateMachine:
+    """抢购流程状态机
+
+    每个状态有一个处理函数 _on_<状态>(now, event)，处理完后设置 wake_at（下一次需要处理的时刻），
+    需要帧时由 actions.wait_event 逐帧送来界面状态事件。调度循环 run() 只做一件事：
+    等到 wake_at 或下一个事件，再调用当前状态的处理函数，不再有散落在各处的固定 sleep。
+
+    与界面、截图、OCR、鼠标的交互都通过 actions（ScriptThread）完成：
+        wait_event(deadline, frames) -> Optional[FrameEvent]
+            frames 为 True 时返回下一帧的界面状态，到 deadline 仍没有帧返回 None；
+            否则一直等到 deadline 返回 None。暂停、停止时可以提前返回 None。
+        read_timer() -> (OcrResult, 截图时间戳)
+        read_money() -> str
+        drain_transitions() -> [(跳变时刻, 不确定度), ...]
+        reset_transitions()
+        aim(name)            # 提前把光标移到按钮上，下一次 click(name) 只按下、不移动不停顿
+        click(name)          # "buy" / "verify" / "refresh" / "blank"
+        press(key)
+        learn_ui(state, sample=None)   # sample 为 None 时使用当前帧
+        ui_signature(frame) -> Optional[np.ndarray]
+        show_timer(display) / status(text) / mark(stage)
+    时钟由 clock 注入，回放时用虚拟时钟即可逐毫秒检查转换时刻。
+    """
+
+    def __init__(self, actions, config: dict, tracker: CountdownTracker, phase: PhaseEstimator,
+                 decoder: TimerDecoder, clock: Callable[[], float] = time.perf_counter,
+                 arm_lead: float = 0.05, recover_timeout: float = 1.5, max_buy_retries: int = 2,
+                 max_history: int = 1000):
+        """初始化状态机
+
+        Args:
+            actions: 界面交互接口（见类说明）
+            config: 脚本配置（buy_click_delay / buy_interval / buy_to_verify_delay / verify_interval /
+                ocr_interval / click_refresh_at_3s / continue_after_complete）
+            tracker: 倒计时跟踪器
+            phase: 整秒边界相位估计器
+            decoder: 倒计时文本解码器
+            clock: 单调时钟
+            arm_lead: 提前多少秒进入 ARMED（不再做 OCR，只等点击时刻）
+            recover_timeout: 等待回到列表的最长时间（秒）
+            max_buy_retries: 确认弹窗未出现时补点购买的次数
+            max_history: 保留的状态转换记录数
+        """
+        self.actions = actions
+        self.config = config
+        self.tracker = tracker
+        self.phase = phase
+        self.decoder = decoder
+        self.clock = clock
+        self.arm_lead = arm_lead
+        self.recover_timeout = recover_timeout
+        self.max_buy_retries = max_buy_retries
+        self.history = deque(maxlen=max_history)
+        self.state = MONITORING
+        self.wake_at = 0.0
+        self.money = ""
+        self.refreshed = False  # 本轮倒计时是否已在 0:03 点击过刷新
+        self.buy_clicks = 0
+        self.verify_clicks = 0
+        self.last_ui = UNKNOWN
+        self.last_frame: Optional[np.ndarray] = None
+
+    @property
+    def needs_frames(self) -> bool:
+        if self.state == CONFIRMING and self.verify_clicks == 0:
+            # 点确认前的 buy_to_verify_delay 是纯定时，不看帧，由调度器精确等待
+            return False
+        return "frame" in STATE_NEEDS[self.state]
+
+    def start(self, money: str, now: Optional[float] = None):
+        """记录初始三角币，从 MONITORING 开始"""
+        self.money = money
+        self.reset_countdown()
+        self.enter(MONITORING, self.clock() if now is None else now, "开始")
+
+    def run(self, running: Callable[[], bool]):
+        """调度循环：等到当前状态的唤醒时刻或下一个帧事件再处理，直到 DONE 或 running() 为 False"""
+        while running() and self.state != DONE:
+            event = self.actions.wait_event(self.wake_at, self.needs_frames)
+            self.step(self.clock(), event)
+
+    def step(self, now: float, event: Optional[FrameEvent] = None):
+        """处理一个事件或到期的唤醒；没有事件且未到唤醒时刻（提前醒来）时什么也不做"""
+        if event is None and now < self.wake_at:
+            return
+        if event is not None:
+            self.last_ui, self.last_frame = event.state, event.frame
+        getattr(self, "_on_" + self.state)(now, event)
+
+    def enter(self, state: str, now: float, reason: str = ""):
+        """转换到 state，执行其进入动作；默认立即唤醒"""
+        self.history.append(Transition(now, self.state, state, reason))
+        self.state = state
+        self.wake_at = now
+        self.last_ui, self.last_frame = UNKNOWN, None
+        on_enter = getattr(self, "_enter_" + state, None)
+        if on_enter is not None:
+            on_enter(now)
+
+    def transitions(self) -> List[Tuple[str, float]]:
+        """[(目标状态, 时刻), ...]"""
+        return [(t.target, t.timestamp) for t in self.history]
+
+    # ---- 倒计时与相位 ----
+
+    def reset_countdown(self):
+        """丢弃当前倒计时的跟踪和相位估计"""
+        self.tracker.reset()
+        self.phase.reset()
+        self.actions.reset_transitions()
+
+    def predicted_zero(self) -> float:
+        """预测显示变为 0 的时刻：有相位估计时用整秒边界拟合，否则用跟踪器的截止时刻"""
+        if self.phase.ready:
+            return self.phase.zero
+        return self.tracker.deadline - 1
+
+    def click_time(self) -> float:
+        """购买点击时刻 = 显示变为 0分1秒 的时刻 + buy_click_delay"""
+        return self.predicted_zero() - self.phase.period + self.config['buy_click_delay']
+
+    def drain_transitions(self):
+        """把检测线程积累的秒数跳变交给相位估计器"""
+        events = self.actions.drain_transitions()
+        if self.tracker.deadline is None:
+            # 未锁定时无法确定跳变后的秒数
+            return
+        if self.phase.ready and abs(self.phase.zero - (self.tracker.deadline - 1)) > 0.5 + self.tracker.uncertainty:
+            # OCR 校准后的截止时刻与相位估计相差超过半秒，说明倒计时换了，相位重新估计
+            self.phase.reset()
+        for timestamp, halfwidth in events:
+            # 跳变后的秒数由当前零点估计取整得到（误差远小于半秒）
+            self.phase.add_transition(round(self.predicted_zero() - timestamp), timestamp, halfwidth)
+
+    def ocr_needed(self, now: float) -> bool:
+        """是否需要 OCR 校准：临近截止且整秒边界已锁定时只靠跳变检测"""
+        remaining = self.tracker.remaining(now)
+        if self.phase.ready and remaining is not None and remaining <= self.tracker.dense_window:
+            return False
+        return self.tracker.should_read(now)
+
+    # ---- 各状态 ----
+
+    def _on_monitoring(self, now: float, event: Optional[FrameEvent]):
+        tracker = self.tracker
+        if self.ocr_needed(now):
+            result, timestamp = self.actions.read_timer()
+            # 按 "M分S秒" / "X天" / "X小时" 语法解码，跟踪器的预测作为先验
+            reading = self.decoder.decode(result, tracker.remaining(timestamp))
+            self.actions.mark("parse")
+            if reading is not None and reading.kind != "time":
+                # 还没进入分秒倒计时，刷新后隔 ocr_interval 再看
+                self.actions.click("refresh")
+                self.reset_countdown()
+                self.wake_at = self.clock() + self.config['ocr_interval']
+                return
+            # 与已锁定倒计时矛盾的误读由跟踪器丢弃
+            if reading is not None:
+                tracker.observe(reading.value, timestamp)
+                # 读到倒计时说明正处于列表界面，记录为列表状态的原型
+                self.actions.learn_ui(LISTING)
+            else:
+                tracker.miss(timestamp)
+            now = self.clock()
+
+        remaining = tracker.remaining(now)
+        if remaining is None:
+            # 尚未锁定，按跟踪器给出的节奏继续读
+            self.wake_at = tracker.next_read_at()
+            return
+        if remaining < 0:
+            # 截止时刻已过（例如暂停期间），等待新的倒计时
+            self.reset_countdown()
+            self.wake_at = now
+            return
+
+        display = tracker.display(now)
+        self.actions.show_timer(display)
+        self.drain_transitions()
+        self.actions.mark("decision")
+        # 剩余时间到 0:03 时点击刷新（如果启用）
+        if display <= 3 and self.config['click_refresh_at_3s'] and not self.refreshed:
+            self.actions.status("🔄 点击刷新...")
+            self.actions.click("refresh")
+            self.refreshed = True
+        click_at = self.click_time()
+        if now >= click_at - self.arm_lead:
+            self.enter(ARMED, now, f"距点击 {(click_at - now) * 1000:.0f}ms")
+            return
+        # 下一个事件：下一次校准 OCR、显示跳到下一秒或进入 ARMED
+        # （秒数跳变由检测线程逐帧处理，醒来后统一取走）
+        next_read = math.inf if self.phase.ready and remaining <= tracker.dense_window else tracker.next_read_at()
+        next_tick = tracker.deadline - display
+        if next_tick <= now:
+            # 恰好在跳变时刻醒来
+            next_tick += 1
+        self.wake_at = min(next_read, next_tick, click_at - self.arm_lead)
+
+    def _enter_armed(self, now: float):
+        self.actions.status("准备点击...")
+        # 等待期间先把光标移到购买按钮上，点击时刻只剩按下这一个动作
+        self.actions.aim("buy")
+        self.wake_at = self.click_time()
+
+    def _on_armed(self, now: float, event: Optional[FrameEvent]):
+        # 等待期间可能又检测到跳变，点击时刻以最新的相位估计为准
+        self.drain_transitions()
+        click_at = self.click_time()
+        if now < click_at:
+            self.wake_at = click_at
+            return
+        self.enter(FIRING, now, f"晚于点击时刻 {(now - click_at) * 1000:.2f}ms")
+
+    def _enter_firing(self, now: float):
+        self.actions.click("buy")
+        self.actions.mark("click")
+        self.buy_clicks = 1
+        self.wake_at = now + max(self.config['buy_interval'], 0.05)
+
+    def _on_firing(self, now: float, event: Optional[FrameEvent]):
+        if self.last_ui == CONFIRM:
+            self.enter(CONFIRMING, now, "确认弹窗出现")
+            return
+        if event is not None:
+            return
+        # 超时仍没有确认弹窗：补点购买，次数用完后照常点确认
+        if self.buy_clicks > self.max_buy_retries:
+            self.enter(CONFIRMING, now, "确认弹窗未出现")
+            return
+        self.actions.click("buy")
+        self.buy_clicks += 1
+        self.wake_at = now + max(self.config['buy_interval'], 0.05)
+
+    def _enter_confirming(self, now: float):
+        self.verify_clicks = 0
+        self.wake_at = now + self.config['buy_to_verify_delay']
+
+    def _on_confirming(self, now: float, event: Optional[FrameEvent]):
+        verify_wait = max(self.config['verify_interval'], 0.05)
+        if self.verify_clicks == 0:
+            if now < self.wake_at:
+                return
+            self.actions.click("verify")
+            self.actions.status("点击确认按钮...")
+            self.verify_clicks = 1
+            self.last_ui = UNKNOWN
+            self.wake_at = now + verify_wait
+            return
+        if event is not None:
+            if event.state != CONFIRM:
+                self.enter(RECOVERING, now, "确认弹窗关闭")
+            return
+        if self.last_ui != CONFIRM:
+            # 等待期间没有拿到帧
+            self.enter(RECOVERING, now, "无新帧")
+            return
+        # 弹窗仍在：补点确认，多次无效时先点空白处
+        self.verify_clicks += 1
+        if self.verify_clicks > 3:
+            self.actions.click("blank")
+        self.actions.click("verify")
+        self.wake_at = now + verify_wait
+
+    def _enter_recovering(self, now: float):
+        self.actions.status("等待刷新...")
+        self.wake_at = now + self.recover_timeout
+
+    def _on_recovering(self, now: float, event: Optional[FrameEvent]):
+        if event is not None and event.state != LISTING:
+            return
+        # 回到列表，或超时
+        if self.last_ui == CONFIRM:
+            self.actions.press('esc')
+        # 超时时停留的画面可能是成功提示，三角币确认变化后作为成功状态的原型
+        result_signature = None
+        if self.last_ui in (UNKNOWN, SUCCESS) and self.last_frame is not None:
+            result_signature = self.actions.ui_signature(self.last_frame)
+        self.actions.click("refresh")
+        # 成功抢购或结束后，重新锁定下一轮倒计时
+        self.reset_countdown()
+        # 检查三角币是否变化
+        now_money = self.actions.read_money()
+        self.actions.status(f"当前三角币: {now_money}")
+        if result_signature is not None and self.money and now_money and now_money != self.money:
+            self.actions.learn_ui(SUCCESS, result_signature)
+        self.config['continue_after_complete'] &= (now_money == self.money)
+        # 根据配置决定是否继续
+        if not self.config['continue_after_complete']:
+            self.actions.status("任务完成！")
+            self.enter(DONE, self.clock(), "三角币变化" if now_money != self.money else "不再继续")
+        else:
+            self.refreshed = False
+            self.actions.status("继续监控中...")
+            self.enter(MONITORING, self.clock(), "继续监控")
+
+    def _on_done(self, now: float, event: Optional[FrameEvent]):
+        pass
+
+    def summary(self) -> str:
+        return f"{self.state} 转换{len(self.history)}"
+
+
+if __name__ == "__main__":
+    # 回放检查：虚拟时钟下模拟一轮倒计时、500fps 截图流和界面响应，
+    # 检查各状态转换的时刻与预期一致
+    from ocr_engine import OcrResult
+
+    class _World:
+        """虚拟世界：显示在 zero 时刻变为 0 秒，购买点击后弹窗出现，确认后弹窗关闭、列表恢复"""
+
+        def __init__(self, zero: float, frame_interval: float = 0.002, ocr_cost: float = 0.03):
+            self.now = 0.0
+            self.zero = zero
+            self.frame_interval = frame_interval
+            self.ocr_cost = ocr_cost
+            self.confirm_at = math.inf
+            self.closed_at = math.inf
+            self.listing_at = 0.0
+            self.money = "100000"
+            self.clicks: List[Tuple[str, float]] = []
+            self._drained = -math.inf
+
+        def ui(self, t: float) -> str:
+            if self.confirm_at <= t < self.closed_at:
+                return CONFIRM
+            return LISTING if t >= self.listing_at else UNKNOWN
+
+        # ---- actions ----
+        def wait_event(self, deadline: float, frames: bool) -> Optional[FrameEvent]:
+            if frames:
+                t = (math.floor(self.now / self.frame_interval) + 1) * self.frame_interval
+                if t <= deadline:
+                    self.now = t
+                    return FrameEvent(t, self.ui(t), None)
+            self.now = max(self.now, deadline)
+            return None
+
+        def read_timer(self):
+            t = self.now
+            self.now += self.ocr_cost
+            seconds = max(0, math.floor(self.zero + 1 - t))
+            return OcrResult(f"{seconds // 60}分{seconds % 60}秒", 0.99, self.ocr_cost), t
+
+        def read_money(self) -> str:
+            self.now += self.ocr_cost
+            return self.money
+
+        def drain_transitions(self):
+            # 显示在 zero - k 时刻跳到 k
+            events = [(self.zero - k, 0.001) for k in range(0, 200)
+                      if self._drained < self.zero - k <= self.now]
+            self._drained = self.now
+            return sorted(events)
+
+        def reset_transitions(self):
+            self._drained = self.now
+
+        def aim(self, name: str):
+            self.clicks.append(("aim:" + name, self.now))
+
+        def click(self, name: str):
+            self.clicks.append((name, self.now))
+            if name == "buy" and self.confirm_at == math.inf:
+                self.confirm_at = self.now + 0.08
+            elif name == "verify":
+                self.closed_at = self.now + 0.05
+                self.listing_at = self.now + 0.6
+                self.money = "90000"
+
+        def press(self, key: str):
+            pass
+
+        def learn_ui(self, state, sample=None):
+            pass
+
+        def ui_signature(self, frame):
+            return None
+
+        def show_timer(self, display):
+            pass
+
+        def status(self, text):
+            pass
+
+        def mark(self, stage):
+            pass
+
+    config = {'buy_click_delay': 0.03, 'buy_interval': 0.2, 'buy_to_verify_delay': 0.02,
+              'verify_interval': 0.1, 'ocr_interval': 0.95, 'click_refresh_at_3s': False,
+              'continue_after_complete': True}
+    world = _World(zero=20.4567)
+    machine = BuyStateMachine(world, config, CountdownTracker(), PhaseEstimator(), TimerDecoder(),
+                              clock=lambda: world.now)
+    machine.start("100000", 0.0)
+    machine.run(lambda: world.now < 60)
+
+    click_at = world.zero - 1 + config['buy_click_delay']
+    expected = [
+        (MONITORING, 0.0, 0.0),
+        (ARMED, click_at - machine.arm_lead, 0.002),
+        (FIRING, click_at, 0.0005),
+        (CONFIRMING, click_at + 0.08, 0.002),  # 弹窗出现后的第一帧
+        (RECOVERING, click_at + 0.08 + 0.02 + 0.05, 0.003),  # 点确认 + 弹窗关闭后的第一帧
+        (DONE, click_at + 0.08 + 0.02 + 0.6, 0.04),  # 列表恢复后的第一帧 + 读三角币
+    ]
+    actual = machine.transitions()
+    for (state, t), (want, want_t, tol) in zip(actual, expected):
+        ok = state == want and abs(t - want_t) <= tol
+        print(f"{state:11s} {t:9.4f}s  预期 {want_t:9.4f}s ±{tol * 1000:.1f}ms {'✓' if ok else '✗'}")
+        assert ok
+    assert len(actual) == len(expected)
+    print(f"点击: {[(name, round(t, 4)) for name, t in world.clicks]}")
+    # 光标在 ARMED 时已就位，购买点击恰好在点击时刻发出
+    assert world.clicks[0][0] == "aim:buy" and world.clicks[1][0] == "buy"
+    assert abs(world.clicks[1][1] - click_at) <= 0.0005
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 多实例截图管理 - 每个输出屏幕一路截图流，多个游戏实例共用一个 OCR 模型
+
+import heapq
+import itertools
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ocr_engine import rec_probabilities
+from window_capture import CaptureBackend, CropPlan, WindowCapture
+
+# 接近抢购时间的实例使用的 OCR 优先级（数值越小越优先）
+URGENT_PRIORITY = 0
+
+
+class RegionSet:
+    """一个实例的区域配置，接口与 RegionSelector 的读取部分一致
+
+    RegionSelector 构造时会枚举 DXGI 设备并加载字体，多实例时只需要区域数据。
+    坐标使用虚拟桌面坐标，点击可以直接使用；截图时由 WindowCapture 减去屏幕原点。
+    """
+
+    def __init__(self, regions: Optional[Dict[str, Tuple[int, int, int, int]]] = None):
+        self.regions: Dict[str, Tuple[int, int, int, int]] = dict(regions or {})
+
+    def get_region(self, name: str) -> Optional[Tuple[int, int, int, int]]:
+        return self.regions.get(name)
+
+    def get_all_regions(self) -> Dict[str, Tuple[int, int, int, int]]:
+        return self.regions.copy()
+
+    def load_regions_from_file(self, filepath: str):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            self.regions = {name: tuple(coords) for name, coords in data.items()}
+        print(f"✓ 已从文件加载 {len(self.regions)} 个区域配置")
+
+
+class SharedOcrEngine:
+    """多个实例共用的 OCR 引擎
+
+    模型只加载一次，推理串行执行；等待中的请求按 (优先级, 到达顺序) 出队，
+    数值越小越优先，接近抢购时间的实例可以调高自己的优先级插队。
+    """
+
+    def __init__(self, ocr):
+        self.ocr = ocr
+        self._cond = threading.Condition()
+        self._busy = False
+        self._waiting: List[Tuple[int, int]] = []
+        self._tickets = itertools.count()
+        # 实例名 -> [调用次数, 累计排队时间, 累计推理时间]
+        self.stats: Dict[str, List[float]] = {}
+
+    def run(self, instance: str, priority: int, fn, *args, **kwargs):
+        """排队执行一次推理"""
+        ticket = (priority, next(self._tickets))
+        queued = time.perf_counter()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._cond.wait_for(lambda: not self._busy and self._waiting[0] == ticket)
+            heapq.heappop(self._waiting)
+            self._busy = True
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            finished = time.perf_counter()
+            with self._cond:
+                self._busy = False
+                stats = self.stats.setdefault(instance, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += started - queued
+                stats[2] += finished - started
+                self._cond.notify_all()
+
+    def for_instance(self, name: str, priority: int = 10) -> "OcrHandle":
+        return OcrHandle(self, name, priority)
+
+    def summary(self) -> str:
+        parts = []
+        for name, (calls, wait, run) in self.stats.items():
+            if calls:
+                parts.append(f"{name} {int(calls)}次 排队{wait / calls * 1000:.1f}ms 推理{run / calls * 1000:.1f}ms")
+        return " | ".join(parts)
+
+
+class OcrHandle:
+    """单个实例拿到的 OCR 句柄，调用方式与 RapidOCR 实例相同
+
+    脚本线程在倒计时进入加密校准窗口或开始抢购后调用 set_urgent(True)，
+    之后的推理请求以 URGENT_PRIORITY 排在其他实例前面。
+    """
+
+    def __init__(self, engine: SharedOcrEngine, name: str, priority: int = 10):
+        self.engine = engine
+        self.name = name
+        self.base_priority = priority
+        self.priority = priority
+
+    def set_urgent(self, urgent: bool):
+        """切换为紧急优先级或恢复为初始优先级"""
+        self.priority = URGENT_PRIORITY if urgent else self.base_priority
+
+    def __call__(self, *args, **kwargs):
+        return self.engine.run(self.name, self.priority, self.engine.ocr, *args, **kwargs)
+
+    def text_rec(self, img_list):
+        """仅识别模式：排队调用识别模型"""
+        return self.engine.run(self.name, self.priority, self.engine.ocr.text_rec, img_list)
+
+    def rec_probabilities(self, lines):
+        """仅识别模式：排队运行识别网络，返回每个时间步的字符概率"""
+        return self.engine.run(self.name, self.priority, rec_probabilities, self.engine.ocr.text_rec, lines)
+
+
+class CaptureInstance:
+    """一个游戏实例：区域配置 + 所在屏幕的截图流 + OCR 句柄"""
+
+    def __init__(self, name: str, selector: RegionSet, device_idx: int, output_idx: int,
+                 origin: Tuple[int, int], ocr: OcrHandle):
+        self.name = name
+        self.selector = selector
+        self.device_idx = device_idx
+        self.output_idx = output_idx
+        self.origin = origin
+        self.ocr = ocr
+        self.win_cap: Optional[WindowCapture] = None
+
+
+def read_instance_configs(filepath: str) -> List[dict]:
+    """读取实例列表 JSON，并把每项的 regions 文件加载为 RegionSet
+
+    格式: [{"name": "左屏", "regions": "regions_2k.json", "device_idx": 0, "output_idx": 1, "origin": [2560, 0]}, ...]
+    在创建 CaptureManager 之前调用，可以先按区域尺寸创建并预热共用的 OCR 模型。
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    for item in items:
+        selector = RegionSet()
+        selector.load_regions_from_file(item["regions"])
+        item["regions"] = selector
+    return items
+
+
+class CaptureManager:
+    """多实例截图管理器
+
+    同一块屏幕上的多个实例共用一路截图流，裁剪区域取它们所有区域的外接矩形；
+    所有实例共用一个 OCR 模型（SharedOcrEngine），避免每个实例各加载一份 RapidOCR。
+    """
+
+    def __init__(self, ocr, target_fps: int = 500, max_buffer_len: int = 2):
+        self.engine = SharedOcrEngine(ocr)
+        self.target_fps = target_fps
+        self.max_buffer_len = max_buffer_len
+        self.instances: Dict[str, CaptureInstance] = {}
+        self.captures: Dict[Tuple[int, int], WindowCapture] = {}
+
+    def add_instance(self, name: str, regions: Dict[str, Tuple[int, int, int, int]], device_idx: int = 0,
+                     output_idx: int = 0, origin: Tuple[int, int] = (0, 0)) -> CaptureInstance:
+        """登记一个实例（需在 start() 之前调用）
+
+        Args:
+            name: 实例名称
+            regions: 区域配置（RegionSelector 框选得到的屏幕内坐标）
+            device_idx: 显卡索引
+            output_idx: 屏幕索引
+            origin: 该屏幕左上角在虚拟桌面中的坐标
+        """
+        if name in self.instances:
+            raise ValueError(f"实例 {name} 已存在")
+        ox, oy = origin
+        desktop_regions = {key: (l + ox, t + oy, r + ox, b + oy) for key, (l, t, r, b) in regions.items()}
+        instance = CaptureInstance(name, RegionSet(desktop_regions), device_idx, output_idx, origin,
+                                   self.engine.for_instance(name))
+        self.instances[name] = instance
+        return instance
+
+    def load_instances(self, filepath: str):
+        """从 JSON 加载实例列表（格式见 read_instance_configs）"""
+        self.add_instances(read_instance_configs(filepath))
+
+    def add_instances(self, configs: List[dict]):
+        """按 read_instance_configs() 的结果登记实例"""
+        for item in configs:
+            self.add_instance(item["name"], item["regions"].regions, item.get("device_idx", 0),
+                              item.get("output_idx", 0), tuple(item.get("origin", (0, 0))))
+
+    def start(self, names: Optional[List[str]] = None,
+              backends: Optional[Dict[Tuple[int, int], CaptureBackend]] = None):
+        """为每块屏幕创建一路截图流
+
+        Args:
+            names: 参与裁剪的区域名称，None 表示全部
+            backends: 可选，按 (device_idx, output_idx) 指定截图后端（回放测试用）
+        """
+        groups: Dict[Tuple[int, int], List[CaptureInstance]] = {}
+        for instance in self.instances.values():
+            groups.setdefault((instance.device_idx, instance.output_idx), []).append(instance)
+        for key, members in groups.items():
+            regions = {}
+            for member in members:
+                for region_name, region in member.selector.regions.items():
+                    if names is None or region_name in names:
+                        regions[f"{member.name}/{region_name}"] = region
+            origins = {member.origin for member in members}
+            if len(origins) != 1:
+                raise ValueError(f"屏幕 {key} 上的实例 origin 不一致: {origins}")
+            backend = (backends or {}).get(key)
+            win_cap = WindowCapture(key[0], key[1], self.target_fps, self.max_buffer_len,
+                                    backend=backend, origin=origins.pop())
+            win_cap.set_crop_plan(CropPlan(regions))
+            if len(members) > 1:
+                # 多个脚本线程共用一路截图流时由取帧线程统一取帧，capture() 不再互相抢帧
+                win_cap.start_pump()
+            self.captures[key] = win_cap
+            for member in members:
+                member.win_cap = win_cap
+
+    def stop(self):
+        for win_cap in self.captures.values():
+            win_cap.stop()
+        self.captures.clear()
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 颜色匹配 - 量化 BGR→Lab 查找表（内存映射）+ 向量化 CIEDE2000，多探针判断区域颜色
+
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_LUT_BITS = 6
+
+
+def bgr_to_lab(bgr) -> np.ndarray:
+    """精确换算 BGR (uint8) 到 CIE Lab (D65)，L ∈ [0, 100]"""
+    bgr = np.asarray(bgr, dtype=np.float32).reshape(-1, 1, 3) / 255.0
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2Lab).reshape(-1, 3)
+
+
+class LabLut:
+    """量化的 BGR→Lab 查找表
+
+    每个通道保留高 bits 位，表中存放量化格中心颜色的 Lab 值（bits=6 时 64³×3 个 float32，
+    约 3MB）。第一次使用时生成并保存为 .npy，之后以只读内存映射加载，多个进程共享页缓存。
+    """
+
+    def __init__(self, bits: int = DEFAULT_LUT_BITS, filepath: Optional[str] = None):
+        """加载或生成查找表
+
+        Args:
+            bits: 每个通道保留的位数
+            filepath: .npy 文件路径，None 时为 bgr_lab_lut_{bits}.npy
+        """
+        self.bits = bits
+        self.shift = 8 - bits
+        self.filepath = filepath or f"bgr_lab_lut_{bits}.npy"
+        if not os.path.exists(self.filepath):
+            self._build()
+        self.table = np.load(self.filepath, mmap_mode='r')
+
+    def _build(self):
+        levels = 1 << self.bits
+        step = 1 << self.shift
+        centers = np.arange(levels) * step + (step - 1) / 2
+        b, g, r = np.meshgrid(centers, centers, centers, indexing='ij')
+        table = bgr_to_lab(np.stack([b, g, r], axis=-1)).astype(np.float32)
+        tmp_path = self.filepath + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, table)
+        os.replace(tmp_path, self.filepath)
+
+    def index(self, bgr: np.ndarray) -> np.ndarray:
+        """(..., 3) uint8 颜色在展平后的表中的下标"""
+        q = bgr >> self.shift
+        return (q[..., 0].astype(np.intp) << (2 * self.bits)) | (q[..., 1].astype(np.intp) << self.bits) | q[..., 2]
+
+    def __call__(self, bgr: np.ndarray) -> np.ndarray:
+        """查表换算，bgr 为 (..., 3) uint8，返回 (..., 3) float32"""
+        return self.table.reshape(-1, 3)[self.index(bgr)]
+
+
+_default_lut: Optional[LabLut] = None
+
+
+def default_lut() -> LabLut:
+    """进程内共享的默认查找表"""
+    global _default_lut
+    if _default_lut is None:
+        _default_lut = LabLut()
+    return _default_lut
+
+
+def delta_e_2000(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+    """CIEDE2000 色差，lab1 / lab2 为 (..., 3)，按 NumPy 规则广播"""
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+    c_mean = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    c7 = c_mean ** 7
+    g = 0.5 * (1 - np.sqrt(c7 / (c7 + 25.0 ** 7)))
+    a1p, a2p = a1 * (1 + g), a2 * (1 + g)
+    c1p, c2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dL = L2 - L1
+    dC = c2p - c1p
+    dh = h2p - h1p
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(c1p * c2p == 0, 0.0, dh)
+    dH = 2 * np.sqrt(c1p * c2p) * np.sin(np.radians(dh / 2))
+
+    L_mean = (L1 + L2) / 2
+    c_mean_p = (c1p + c2p) / 2
+    h_sum = h1p + h2p
+    h_mean = np.where(np.abs(h1p - h2p) > 180,
+                      np.where(h_sum < 360, h_sum + 360, h_sum - 360), h_sum) / 2
+    h_mean = np.where(c1p * c2p == 0, h_sum, h_mean)
+    t = (1 - 0.17 * np.cos(np.radians(h_mean - 30)) + 0.24 * np.cos(np.radians(2 * h_mean))
+         + 0.32 * np.cos(np.radians(3 * h_mean + 6)) - 0.20 * np.cos(np.radians(4 * h_mean - 63)))
+    d_theta = 30 * np.exp(-(((h_mean - 275) / 25) ** 2))
+    cp7 = c_mean_p ** 7
+    r_c = 2 * np.sqrt(cp7 / (cp7 + 25.0 ** 7))
+    l50 = (L_mean - 50) ** 2
+    s_l = 1 + 0.015 * l50 / np.sqrt(20 + l50)
+    s_c = 1 + 0.045 * c_mean_p
+    s_h = 1 + 0.015 * c_mean_p * t
+    r_t = -np.sin(np.radians(2 * d_theta)) * r_c
+    return np.sqrt((dL / s_l) ** 2 + (dC / s_c) ** 2 + (dH / s_h) ** 2
+                   + r_t * (dC / s_c) * (dH / s_h))
+
+
+def delta_e_table(lut: LabLut, targets_bgr: Sequence[Sequence[int]]) -> np.ndarray:
+    """查找表中每个量化颜色到各目标色的 CIEDE2000，形状 (目标数, 表项数) float32"""
+    targets_lab = bgr_to_lab(targets_bgr)[:, None, :]
+    return delta_e_2000(np.asarray(lut.table).reshape(1, -1, 3), targets_lab).astype(np.float32)
+
+
+def probe_grid(frame_region: Tuple[int, int, int, int], grid: int = 3,
+               inset: float = 0.2) -> Tuple[np.ndarray, np.ndarray]:
+    """区域（截图帧内坐标）内 grid×grid 个探针的坐标 (ys, xs)，grid=1 时为区域中心
+
+    Args:
+        frame_region: (left, top, right, bottom)
+        grid: 每个方向的探针数
+        inset: 探针网格距区域边缘的比例
+    """
+    left, top, right, bottom = frame_region
+    fractions = np.linspace(inset, 1 - inset, grid) if grid > 1 else np.array([0.5])
+    xs = np.clip(left + ((right - left - 1) * fractions).round().astype(np.intp), left, right - 1)
+    ys = np.clip(top + ((bottom - top - 1) * fractions).round().astype(np.intp), top, bottom - 1)
+    ys, xs = np.meshgrid(ys, xs, indexing='ij')
+    return ys.ravel(), xs.ravel()
+
+
+class ColorMatcher:
+    """多探针颜色匹配
+
+    在区域内部（四周各留 inset 比例）取 grid×grid 个探针像素，一次索引取出。
+    目标色固定，构造时把查找表中每个量化颜色到各目标色的 CIEDE2000 一次算好
+    （每个目标 1MB），匹配时只需一次查表，不再逐帧计算色差公式。
+    至少 min_fraction 的探针与某个目标色的色差小于 max_delta_e 即认为匹配，
+    单个像素的噪声、鼠标指针遮挡不会误判。
+    """
+
+    def __init__(self, targets_bgr: Sequence[Sequence[int]], max_delta_e: float = 15.0, grid: int = 3,
+                 inset: float = 0.2, min_fraction: float = 0.6, lut: Optional[LabLut] = None):
+        """初始化
+
+        Args:
+            targets_bgr: 目标颜色列表 [(B, G, R), ...]
+            max_delta_e: 判定为同色的最大 CIEDE2000 色差
+            grid: 每个方向的探针数
+            inset: 探针网格距区域边缘的比例
+            min_fraction: 需要匹配的探针比例
+            lut: BGR→Lab 查找表，None 时使用进程内共享的默认表
+        """
+        self.targets_lab = bgr_to_lab(targets_bgr)[:, None, :]
+        self.max_delta_e = max_delta_e
+        self.grid = grid
+        self.inset = inset
+        self.min_fraction = min_fraction
+        self.lut = lut or default_lut()
+        # (目标数, 表项数)：每个量化颜色到各目标色的色差
+        self.delta_table = delta_e_table(self.lut, targets_bgr)
+        self._probes: Dict[Tuple[int, int, int, int], Tuple[np.ndarray, np.ndarray]] = {}
+
+    def probes(self, frame_region: Tuple[int, int, int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """区域（截图帧内坐标）的探针坐标 (ys, xs)，按区域缓存"""
+        probes = self._probes.get(frame_region)
+        if probes is None:
+            probes = self._probes[frame_region] = probe_grid(frame_region, self.grid, self.inset)
+        return probes
+
+    def delta_e(self, frame: np.ndarray, frame_region: Tuple[int, int, int, int]) -> np.ndarray:
+        """各探针与各目标色的色差，形状 (目标数, 探针数)"""
+        ys, xs = self.probes(frame_region)
+        return self.delta_table[:, self.lut.index(frame[ys, xs])]
+
+    def match(self, frame: np.ndarray, frame_region: Tuple[int, int, int, int]) -> bool:
+        """区域颜色是否与某个目标色匹配"""
+        close = self.delta_e(frame, frame_region) < self.max_delta_e
+        return bool((close.mean(axis=1) >= self.min_fraction).any())
+
+
+if __name__ == "__main__":
+    # 自检：CIEDE2000 对照 Sharma 等人论文中的测试数据；查表量化误差；与逐像素欧氏距离的耗时对比
+    import tempfile
+    import time
+
+    pairs = np.array([
+        [[50.0, 2.6772, -79.7751], [50.0, 0.0, -82.7485], [2.0425, 0, 0]],
+        [[50.0, -1.3802, -84.2814], [50.0, 0.0, -82.7485], [1.0, 0, 0]],
+        [[50.0, 2.5, 0.0], [73.0, 25.0, -18.0], [27.1492, 0, 0]],
+        [[60.2574, -34.0099, 36.2677], [60.4626, -34.1751, 39.4387], [1.2644, 0, 0]],
+        [[90.8027, -2.0831, 1.441], [91.1528, -1.6435, 0.0447], [1.4441, 0, 0]],
+    ])
+    computed = delta_e_2000(pairs[:, 0], pairs[:, 1])
+    print(f"CIEDE2000 最大偏差: {np.abs(computed - pairs[:, 2, 0]).max():.5f}")
+
+    lut = LabLut(filepath=os.path.join(tempfile.mkdtemp(), "lut.npy"))
+    rng = np.random.default_rng(0)
+    colors = rng.integers(0, 256, (100000, 3), dtype=np.uint8)
+    error = delta_e_2000(lut(colors), bgr_to_lab(colors))
+    print(f"查表量化误差 ΔE: 平均 {error.mean():.3f} 最大 {error.max():.3f}")
+
+    frame = rng.integers(0, 256, (1440, 2560, 3), dtype=np.uint8)
+    frame[1000:1040, 2000:2100] = (65, 109, 175)
+    region = (2000, 1000, 2100, 1040)
+    start = time.perf_counter()
+    matcher = ColorMatcher([(65, 109, 175)], lut=lut)
+    print(f"色差表构建: {(time.perf_counter() - start) * 1000:.0f}ms")
+    assert matcher.match(frame, region) and not matcher.match(frame, (0, 0, 100, 40))
+    ys, xs = matcher.probes(region)
+    direct = delta_e_2000(lut(frame[ys, xs]), matcher.targets_lab)
+    assert np.allclose(direct, matcher.delta_e(frame, region), atol=1e-3)
+    target = np.array([65, 109, 175])
+    rounds = 20000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        np.linalg.norm(frame[1020, 2050] - target) < 50
+    single = (time.perf_counter() - start) / rounds * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds):
+        matcher.match(frame, region)
+    multi = (time.perf_counter() - start) / rounds * 1e6
+    print(f"单像素欧氏距离: {single:.1f}us  9 探针 CIEDE2000: {multi:.1f}us")
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 倒计时跟踪 - 锁定后按单调时钟推算剩余时间，只在需要时 OCR 校准
+
+import math
+import time
+from typing import Optional
+
+
+class CountdownTracker:
+    """倒计时跟踪器
+
+    界面显示 "m分s秒" 表示真实剩余时间在 [s, s+1) 之间，所以时刻 t 读到 s 说明截止时刻
+    位于 [t+s, t+s+1)。每次读数给出一个区间，取所有读数区间的交集：连续 lock_reads 次
+    读数交集非空即锁定，之后剩余时间 = 截止时刻 - time.perf_counter()，不再依赖每次 OCR。
+
+    锁定后与交集矛盾的读数视为误读并丢弃；连续 max_mismatches 次矛盾说明倒计时确实变了
+    （刷新、换商品），重新开始锁定。OCR 只在 next_read_at() 到达时进行：远离截止时刻时
+    每 resync_interval 秒校准一次，进入 dense_window 后每 dense_interval 秒一次。
+    """
+
+    def __init__(self, lock_reads: int = 3, max_mismatches: int = 2, resync_interval: float = 10.0,
+                 dense_window: float = 4.0, dense_interval: float = 0.25, unlocked_interval: float = 0.95,
+                 tolerance: float = 0.05):
+        """初始化跟踪器
+
+        Args:
+            lock_reads: 锁定所需的一致读数次数
+            max_mismatches: 锁定后连续多少次矛盾读数触发重新锁定
+            resync_interval: 锁定后远离截止时刻时的校准间隔（秒）
+            dense_window: 剩余时间小于该值时加密校准（秒）
+            dense_interval: 加密校准的间隔（秒）
+            unlocked_interval: 未锁定时的读数间隔（秒），剩余时间已很短时改用 dense_interval
+            tolerance: 每个读数区间两端放宽的时间（秒），吸收截图时间戳的误差
+        """
+        self.lock_reads = lock_reads
+        self.max_mismatches = max_mismatches
+        self.resync_interval = resync_interval
+        self.dense_window = dense_window
+        self.dense_interval = dense_interval
+        self.unlocked_interval = unlocked_interval
+        self.tolerance = tolerance
+        self.total_reads = 0
+        self.rejected = 0
+        self.reset()
+
+    def reset(self):
+        """丢弃当前倒计时（刷新列表、完成抢购后调用）"""
+        self.lo: Optional[float] = None
+        self.hi: Optional[float] = None
+        self.reads = 0
+        self.mismatches = 0
+        self.locked = False
+        self.last_read: Optional[float] = None
+        self.last_value: Optional[int] = None
+
+    def observe(self, remaining_seconds: int, timestamp: float) -> bool:
+        """输入一次 OCR 读数
+
+        Args:
+            remaining_seconds: 读到的剩余秒数（分 * 60 + 秒）
+            timestamp: 被识别那一帧的截图时间 (perf_counter)
+
+        Returns:
+            读数是否被采纳（False 表示与已锁定的倒计时矛盾，被当作误读丢弃）
+        """
+        self.total_reads += 1
+        self.last_read = timestamp
+        lo = timestamp + remaining_seconds - self.tolerance
+        hi = timestamp + remaining_seconds + 1 + self.tolerance
+        if self.lo is not None:
+            new_lo, new_hi = max(self.lo, lo), min(self.hi, hi)
+            if new_lo <= new_hi:
+                self.lo, self.hi = new_lo, new_hi
+                self.reads += 1
+                self.mismatches = 0
+                self.last_value = remaining_seconds
+                if self.reads >= self.lock_reads:
+                    self.locked = True
+                return True
+            self.rejected += 1
+            self.mismatches += 1
+            if self.locked and self.mismatches < self.max_mismatches:
+                return False
+        # 第一次读数，或矛盾读数足够多（未锁定时一次即可）：从这次读数重新开始
+        self.lo, self.hi = lo, hi
+        self.reads = 1
+        self.mismatches = 0
+        self.locked = False
+        self.last_value = remaining_seconds
+        return True
+
+    def miss(self, timestamp: float):
+        """记录一次没有读出时间的 OCR，只推迟下一次读数，不影响锁定状态"""
+        self.last_read = timestamp
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """估计的截止时刻 (perf_counter)，未锁定时为 None"""
+        if not self.locked:
+            return None
+        return (self.lo + self.hi) / 2
+
+    @property
+    def uncertainty(self) -> float:
+        """截止时刻估计的半宽（秒）"""
+        return (self.hi - self.lo) / 2 if self.lo is not None else math.inf
+
+    def remaining(self, now: Optional[float] = None) -> Optional[float]:
+        """推算的剩余时间（秒），未锁定时为 None"""
+        deadline = self.deadline
+        if deadline is None:
+            return None
+        return deadline - (time.perf_counter() if now is None else now)
+
+    def display(self, now: Optional[float] = None) -> Optional[int]:
+        """界面此刻应显示的剩余秒数"""
+        remaining = self.remaining(now)
+        if remaining is None:
+            return None
+        return max(0, int(math.floor(remaining)))
+
+    def next_read_at(self) -> float:
+        """下一次应该 OCR 的时刻 (perf_counter)"""
+        if self.last_read is None:
+            return 0.0
+        if not self.locked or self.mismatches:
+            if self.last_value is not None and self.last_value <= self.dense_window:
+                return self.last_read + self.dense_interval
+            return self.last_read + self.unlocked_interval
+        dense_start = self.deadline - self.dense_window
+        if self.last_read >= dense_start:
+            return self.last_read + self.dense_interval
+        return min(self.last_read + self.resync_interval, dense_start)
+
+    def should_read(self, now: Optional[float] = None) -> bool:
+        return (time.perf_counter() if now is None else now) >= self.next_read_at()
+
+    def summary(self) -> str:
+        if not self.locked:
+            return f"未锁定 读数{self.total_reads} 丢弃{self.rejected}"
+        return f"已锁定 ±{self.uncertainty * 1000:.0f}ms 读数{self.total_reads} 丢弃{self.rejected}"
+
+
+if __name__ == "__main__":
+    # 仿真：2 分钟倒计时，OCR 每次 40ms 且有 3% 误读，对比每 0.95 秒读一次的原策略
+    import random
+
+    random.seed(1)
+    start, duration, step = 1000.0, 120.37, 0.001
+    deadline = start + duration
+    tracker = CountdownTracker()
+    now, busy_until = start, start
+    while now < deadline - 1.0:
+        if now >= busy_until and tracker.should_read(now):
+            shown = int(math.floor(deadline - now))
+            if random.random() < 0.03:
+                shown = random.randint(0, 200)
+            tracker.observe(shown, now)
+            busy_until = now + 0.04
+        now += step
+    naive = int(duration / 0.95) + int(5 / 0.04)
+    print(f"OCR 次数: {tracker.total_reads} (原策略约 {naive})")
+    print(f"截止时刻误差: {(tracker.deadline - deadline) * 1000:+.1f}ms, {tracker.summary()}")
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 倒计时区域专用字形识别 - 列投影切分字符 + 模板库向量化相关匹配
+
+import os
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class TemplateDigitRecognizer:
+    """倒计时字形识别器
+
+    time 区域只会出现数字和 "分"/"秒"/"天"/"小时"，字体固定。流程：
+    Otsu 二值化 -> 按列投影切分字符格 -> 每格裁到字形外接框、保持宽高比放进方形画布
+    -> 缩放到 cell_size 并归一化 -> 与模板库做一次矩阵乘法得到全部相关系数。
+
+    模板库不随代码分发，而是从 RapidOCR 的识别结果自学习：切出的格数与识别文本
+    字符数一致时，每格按对应字符入库。任一格的最高相关系数低于 min_score 时
+    recognize() 返回 None，调用方回退到 RapidOCR。
+    """
+
+    def __init__(self, filepath: Optional[str] = None, cell_size: int = 20, min_score: float = 0.85,
+                 max_per_label: int = 8, merge_gap: float = 0.12):
+        """初始化识别器
+
+        Args:
+            filepath: 模板库文件 (.npz)，存在时自动加载
+            cell_size: 归一化后的字符格边长（像素）
+            min_score: 接受识别结果的最低相关系数
+            max_per_label: 每个字符最多保留的模板数
+            merge_gap: 小于 字高*merge_gap 的列间隙视为同一字符内部（如 "秒" 的左右部件）
+        """
+        self.filepath = filepath
+        self.cell_size = cell_size
+        self.min_score = min_score
+        self.max_per_label = max_per_label
+        self.merge_gap = merge_gap
+        self.labels: List[str] = []
+        self.templates = np.zeros((0, cell_size * cell_size), dtype=np.float32)
+        if filepath and os.path.exists(filepath):
+            self.load()
+
+    def binarize(self, roi: np.ndarray) -> np.ndarray:
+        """Otsu 二值化，前景（文字）为 255；像素占多数的一方视为背景"""
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if cv2.countNonZero(binary) * 2 > binary.size:
+            binary = cv2.bitwise_not(binary)
+        return binary
+
+    def segment(self, binary: np.ndarray) -> List[Tuple[int, int]]:
+        """按列投影切分字符，返回各字符的 (起始列, 结束列)"""
+        rows = np.flatnonzero(binary.any(axis=1))
+        if rows.size == 0:
+            return []
+        height = rows[-1] - rows[0] + 1
+        cols = binary.any(axis=0).astype(np.int8)
+        # 前景列的起止位置
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], cols, [0]))))
+        spans = list(zip(edges[::2], edges[1::2]))
+        merged = []
+        for start, end in spans:
+            if merged and start - merged[-1][1] < height * self.merge_gap:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def _normalize(self, binary: np.ndarray, spans: List[Tuple[int, int]]) -> np.ndarray:
+        """把每个字符格变成零均值、单位范数的向量，返回 (N, cell_size^2)"""
+        size = self.cell_size
+        cells = np.empty((len(spans), size * size), dtype=np.float32)
+        for i, (start, end) in enumerate(spans):
+            glyph = binary[:, start:end]
+            rows = np.flatnonzero(glyph.any(axis=1))
+            glyph = glyph[rows[0]:rows[-1] + 1]
+            h, w = glyph.shape
+            side = max(h, w)
+            canvas = np.zeros((side, side), dtype=np.uint8)
+            top, left = (side - h) // 2, (side - w) // 2
+            canvas[top:top + h, left:left + w] = glyph
+            cells[i] = cv2.resize(canvas, (size, size), interpolation=cv2.INTER_AREA).ravel()
+        cells -= cells.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(cells, axis=1, keepdims=True)
+        cells /= np.maximum(norms, 1e-6)
+        return cells
+
+    def _cells(self, roi: np.ndarray) -> np.ndarray:
+        binary = self.binarize(roi)
+        return self._normalize(binary, self.segment(binary))
+
+    def recognize(self, roi: np.ndarray) -> Optional[str]:
+        """识别 time 区域
+
+        Args:
+            roi: 截图中的 time 区域 (BGR 或灰度)
+
+        Returns:
+            识别文本；模板库为空、没有字符或有字符无法可靠匹配时返回 None
+        """
+        if not self.labels:
+            return None
+        cells = self._cells(roi)
+        if len(cells) == 0:
+            return None
+        scores = cells @ self.templates.T
+        best = scores.argmax(axis=1)
+        if scores[np.arange(len(best)), best].min() < self.min_score:
+            return None
+        return "".join(self.labels[i] for i in best)
+
+    def learn(self, roi: np.ndarray, text: str) -> bool:
+        """用 RapidOCR 的识别结果扩充模板库
+
+        Args:
+            roi: 与 recognize() 相同的原始区域
+            text: RapidOCR 识别出的文本
+
+        Returns:
+            是否学习（切分格数与字符数不一致时跳过）
+        """
+        text = text.replace(" ", "")
+        if not text:
+            return False
+        cells = self._cells(roi)
+        if len(cells) != len(text):
+            return False
+        labels = np.array(self.labels)
+        for char, cell in zip(text, cells):
+            mask = labels == char
+            count = int(mask.sum())
+            if count >= self.max_per_label:
+                continue
+            # 与已有同字符模板几乎相同时不再重复入库
+            if count and float((self.templates[mask] @ cell).max()) > 0.97:
+                continue
+            self.labels.append(char)
+            self.templates = np.vstack([self.templates, cell[None]])
+            labels = np.append(labels, char)
+        return True
+
+    def load(self):
+        data = np.load(self.filepath)
+        if data["templates"].shape[1] != self.cell_size * self.cell_size:
+            print("字形模板尺寸已变化，忽略旧模板库")
+            return
+        self.labels = [str(label) for label in data["labels"]]
+        self.templates = data["templates"].astype(np.float32)
+        print(f"✓ 已加载 {len(self.labels)} 个字形模板")
+
+    def save(self):
+        if not self.filepath or not self.labels:
+            return
+        np.savez(self.filepath, labels=np.array(self.labels), templates=self.templates)
+
+
+if __name__ == "__main__":
+    # 自检：用 OpenCV 字体渲染 "m:ss" 形式的倒计时，先学习再识别并测速
+    import time
+
+    def render(text: str) -> np.ndarray:
+        img = np.full((36, 160, 3), 30, dtype=np.uint8)
+        x = 6
+        for char in text:
+            cv2.putText(img, char, (x, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (235, 235, 235), 2)
+            x += 12 if char == ":" else 22
+        return img
+
+    recognizer = TemplateDigitRecognizer()
+    for text in ["0:59", "1:28", "3:47", "5:06", "0:10"]:
+        recognizer.learn(render(text), text)
+    print(f"模板数: {len(recognizer.labels)} 字符: {''.join(sorted(set(recognizer.labels)))}")
+    samples = [f"{m}:{s:02d}" for m in range(6) for s in range(0, 60, 7)]
+    correct = sum(recognizer.recognize(render(t)) == t for t in samples)
+    print(f"准确率: {correct}/{len(samples)}")
+    img = render("2:35")
+    start = time.perf_counter()
+    for _ in range(1000):
+        recognizer.recognize(img)
+    print(f"单次识别: {(time.perf_counter() - start):.3f}ms")
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 秒数跳变检测 - 只比较 time 区域中秒数字形所在的小格，逐帧输出带时间戳的跳变事件
+
+import threading
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from digit_recognizer import TemplateDigitRecognizer
+
+
+class SecondsDigitDetector:
+    """秒数字形跳变检测器
+
+    "m分ss秒" 中每秒都会变化的是 "秒" 字前面的两个字符格。第一次输入时用与模板识别器
+    相同的列投影切分找到这一格，之后每帧只比较这一小块像素：与上一帧差值超过
+    pixel_threshold 的像素数不少于 min_pixels 即为跳变，跳变时刻取前后两帧时间戳的中点。
+    每帧只有一次几百像素的相减和计数，耗时在微秒级。
+    """
+
+    def __init__(self, pixel_threshold: int = 48, min_pixels: int = 4, margin: int = 2):
+        """初始化检测器
+
+        Args:
+            pixel_threshold: 单个像素（绿色通道）变化超过该值才计入
+            min_pixels: 变化像素数不少于该值视为跳变
+            margin: 字符格四周额外保留的像素
+        """
+        self.pixel_threshold = pixel_threshold
+        self.min_pixels = min_pixels
+        self.margin = margin
+        self._segmenter = TemplateDigitRecognizer()
+        self.reset()
+
+    def reset(self):
+        """丢弃字符格位置和上一帧（界面刷新、布局可能变化时调用）"""
+        self.cell: Optional[Tuple[slice, slice]] = None
+        self._previous: Optional[np.ndarray] = None
+        self._timestamp: Optional[float] = None
+
+    def locate(self, roi: np.ndarray) -> Optional[Tuple[slice, slice]]:
+        """在 time 区域中定位秒数字符格，返回 (行切片, 列切片)；没有文字时返回 None"""
+        binary = self._segmenter.binarize(roi)
+        spans = self._segmenter.segment(binary)
+        if not spans:
+            return None
+        rows = np.flatnonzero(binary.any(axis=1))
+        top = max(0, rows[0] - self.margin)
+        bottom = min(roi.shape[0], rows[-1] + 1 + self.margin)
+        if len(spans) >= 3:
+            # 最后一格是 "秒"，前两格是秒数（个位数秒时前一格是 "分"，保持不变不影响检测）
+            left = max(0, spans[-3][0] - self.margin)
+            right = min(roi.shape[1], spans[-1][0])
+        else:
+            left, right = 0, roi.shape[1]
+        return slice(top, bottom), slice(left, right)
+
+    def feed(self, roi: np.ndarray, timestamp: float) -> Optional[Tuple[float, float]]:
+        """输入一帧 time 区域
+
+        Args:
+            roi: time 区域图像 (BGR)
+            timestamp: 帧时间戳 (perf_counter)
+
+        Returns:
+            检测到跳变时返回 (跳变时刻, 不确定度)，不确定度为前后两帧间隔的一半；
+            否则返回 None。同一帧重复输入时返回 None。
+        """
+        if timestamp == self._timestamp:
+            return None
+        if self.cell is None:
+            self.cell = self.locate(roi)
+            if self.cell is None:
+                return None
+        rows, cols = self.cell
+        patch = roi[rows, cols, 1] if roi.ndim == 3 else roi[rows, cols]
+        event = None
+        if self._previous is not None and self._previous.shape == patch.shape:
+            diff = np.abs(patch.astype(np.int16) - self._previous)
+            if np.count_nonzero(diff > self.pixel_threshold) >= self.min_pixels:
+                event = ((self._timestamp + timestamp) / 2, (timestamp - self._timestamp) / 2)
+        self._previous = patch.astype(np.int16)
+        self._timestamp = timestamp
+        return event
+
+
+class TransitionMonitor:
+    """在后台线程中对每一帧运行 SecondsDigitDetector
+
+    通过 WindowCapture.wait_frame() 消费截图流的每一帧（会启动取帧线程），
+    跳变事件放进队列，由脚本线程在方便的时候 drain() 取走，不需要任何 OCR。
+    """
+
+    def __init__(self, win_cap, region: Tuple[int, int, int, int],
+                 detector: Optional[SecondsDigitDetector] = None, max_events: int = 64):
+        """初始化
+
+        Args:
+            win_cap: WindowCapture
+            region: time 区域（屏幕坐标）
+            detector: 跳变检测器，None 时使用默认参数
+            max_events: 队列中最多保留的未取走事件数
+        """
+        self.win_cap = win_cap
+        self.region = region
+        self.detector = detector or SecondsDigitDetector()
+        self._events = deque(maxlen=max_events)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._reset_requested = False
+        self.frames = 0
+        self.transitions = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="TransitionMonitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def reset(self):
+        """下一帧重新定位秒数字符格（由检测线程执行）"""
+        self._reset_requested = True
+        self._events.clear()
+
+    def drain(self) -> List[Tuple[float, float]]:
+        """取走所有未处理的跳变事件 [(跳变时刻, 不确定度), ...]"""
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
+
+    def _loop(self):
+        left, top, right, bottom = self.win_cap.frame_region(self.region)
+        seq = -1
+        while self._running:
+            item = self.win_cap.wait_frame(seq, timeout=0.1)
+            if item is None:
+                continue
+            seq, timestamp, frame = item
+            if frame is None:
+                continue
+            start = time.perf_counter()
+            if self._reset_requested:
+                self._reset_requested = False
+                self.detector.reset()
+            event = self.detector.feed(frame[top:bottom, left:right], timestamp)
+            self.busy_seconds += time.perf_counter() - start
+            self.frames += 1
+            if event is not None:
+                self.transitions += 1
+                self._events.append(event)
+
+    def summary(self) -> str:
+        cost = self.busy_seconds / self.frames * 1e6 if self.frames else 0.0
+        return f"{self.frames}帧 {cost:.1f}us/帧 跳变{self.transitions}"
+
+
+if __name__ == "__main__":
+    # 自检：渲染 "0:ss" 倒计时帧，检测跳变并测量单帧耗时
+    import cv2
+
+    def render(value: int) -> np.ndarray:
+        img = np.full((30, 160, 3), 25, dtype=np.uint8)
+        x = 8
+        for char in f"0:{value:02d}s":
+            cv2.putText(img, char, (x, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (235, 235, 235), 2)
+            x += 12 if char == ":" else 20
+        return img
+
+    frames = [render(v) for v in range(12, 0, -1)]
+    detector = SecondsDigitDetector()
+    events = []
+    t = 0.0
+    for img in frames:
+        for _ in range(500):
+            noisy = cv2.add(img, np.random.randint(0, 6, img.shape, dtype=np.uint8))
+            event = detector.feed(noisy, t)
+            if event:
+                events.append(event)
+            t += 0.002
+    print(f"字符格: {detector.cell} 跳变 {len(events)} 次 (应为 {len(frames) - 1})")
+    print(f"跳变时刻: {[round(e[0], 3) for e in events[:4]]} ...")
+    roi = frames[0]
+    start = time.perf_counter()
+    for i in range(20000):
+        detector.feed(roi, 100.0 + i)
+    print(f"单帧耗时: {(time.perf_counter() - start) / 20000 * 1e6:.1f}us")
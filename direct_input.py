@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 精确的 pydirectinput 鼠标操作 - pydirectinput 自带的 time.sleep 停顿改用精确等待
+
+import pydirectinput
+
+from precise_timer import precise_sleep
+
+
+def direct_click(x: int, y: int, clicks=1, interval=0.1):
+    """pydirectinput 点击，移动后、点击后的停顿 (pydirectinput.PAUSE) 和点击间隔改用精确等待
+
+    pydirectinput 内部用 time.sleep 实现这些停顿，会晚几毫秒；这里时长不变，只是更准。
+    """
+    pydirectinput.moveTo(x, y, _pause=False)
+    precise_sleep(pydirectinput.PAUSE)
+    for _ in range(clicks):
+        pydirectinput.click(button=pydirectinput.LEFT, _pause=False)
+        precise_sleep(interval)
+    precise_sleep(pydirectinput.PAUSE)
+
+
+def move_to(x: int, y: int):
+    """只移动光标，不停顿"""
+    pydirectinput.moveTo(x, y, _pause=False)
+
+
+def press_click():
+    """在光标当前位置立即按下、抬起，前后都不停顿（光标需已提前移到目标上）"""
+    pydirectinput.click(button=pydirectinput.LEFT, _pause=False)
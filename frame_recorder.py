@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 会话录制 - 把截图帧（或配置区域）写入预分配的内存映射文件，供离线回放和基准测试
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_MAGIC = b"DFREC\x00\x01\x00"
+_HEADER_BYTES = 4096
+
+
+def _record_dtype(fields: List[Tuple[str, Tuple[int, int, int]]]) -> np.dtype:
+    """定长记录：8 字节时间戳 + 各字段的原始像素"""
+    return np.dtype([("timestamp", "<f8")] + [(name, np.uint8, tuple(shape)) for name, shape in fields])
+
+
+class FrameRecorder:
+    """会话录制器
+
+    文件 = 4KB 头部 (魔数 + 已写入条数 + JSON 元数据) + capacity 条定长记录。
+    文件在创建时一次性分配，写入一帧只是把像素 memcpy 进映射内存，不做任何编码。
+    写满后不再追加，append() 返回 False。
+    """
+
+    def __init__(self, filepath: str, shape: Tuple[int, int, int], capacity: int,
+                 regions: Optional[Dict[str, Tuple[int, int, int, int]]] = None,
+                 origin: Tuple[int, int] = (0, 0)):
+        """创建录制文件
+
+        Args:
+            filepath: 输出文件路径（建议 .dfrec）
+            shape: capture() 返回帧的形状 (height, width, channels)
+            capacity: 最多记录的帧数
+            regions: 只录制这些区域（帧内坐标），None 表示录制整帧
+            origin: 帧左上角对应的屏幕坐标（使用裁剪计划时不为 0）
+        """
+        self.filepath = filepath
+        self.capacity = capacity
+        self.origin = origin
+        if regions:
+            self._slices = {name: (slice(t, b), slice(l, r)) for name, (l, t, r, b) in regions.items()}
+            fields = [(name, (b - t, r - l, shape[2])) for name, (l, t, r, b) in regions.items()]
+            screen_regions = {name: [l + origin[0], t + origin[1], r + origin[0], b + origin[1]]
+                              for name, (l, t, r, b) in regions.items()}
+        else:
+            self._slices = None
+            fields = [("frame", tuple(shape))]
+            screen_regions = {"frame": [origin[0], origin[1], origin[0] + shape[1], origin[1] + shape[0]]}
+        self.dtype = _record_dtype(fields)
+        meta = json.dumps({
+            "capacity": capacity,
+            "fields": [[name, list(s)] for name, s in fields],
+            "regions": screen_regions,
+        }).encode("utf-8")
+        if len(meta) > _HEADER_BYTES - 16:
+            raise ValueError("录制元数据过长")
+
+        size = _HEADER_BYTES + capacity * self.dtype.itemsize
+        self._mm = np.memmap(filepath, dtype=np.uint8, mode="w+", shape=(size,))
+        self._mm[:8] = np.frombuffer(_MAGIC, dtype=np.uint8)
+        self._mm[16:16 + len(meta)] = np.frombuffer(meta, dtype=np.uint8)
+        self._count = np.ndarray((1,), dtype=np.int64, buffer=self._mm, offset=8)
+        self._count[0] = 0
+        self._records = np.ndarray((capacity,), dtype=self.dtype, buffer=self._mm, offset=_HEADER_BYTES)
+
+    @property
+    def count(self) -> int:
+        return int(self._count[0])
+
+    def append(self, frame: np.ndarray, timestamp: float) -> bool:
+        """追加一帧
+
+        Args:
+            frame: capture() 返回的帧
+            timestamp: 帧时间戳 (perf_counter 秒)
+
+        Returns:
+            是否写入成功（写满时返回 False）
+        """
+        idx = self.count
+        if idx >= self.capacity:
+            return False
+        record = self._records[idx]
+        record["timestamp"] = timestamp
+        if self._slices is None:
+            record["frame"] = frame
+        else:
+            for name, (rows, cols) in self._slices.items():
+                record[name] = frame[rows, cols]
+        # 像素写完后再更新条数，读取方只会看到完整的记录
+        self._count[0] = idx + 1
+        return True
+
+    def close(self):
+        """刷新到磁盘并关闭"""
+        self._mm.flush()
+        del self._records, self._count
+        del self._mm
+        print(f"✓ 已录制 {self.filepath}")
+
+
+class FrameRecording:
+    """录制文件读取器，以 NumPy 数组形式随机访问
+
+    recording.timestamps -> (N,) 时间戳
+    recording["time"]    -> (N, h, w, c) 区域像素（整帧录制时字段名为 "frame"）
+    recording.compose(i) -> 把各区域贴回屏幕坐标，得到以 origin 为左上角的合成帧
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        mm = np.memmap(filepath, dtype=np.uint8, mode="r")
+        if bytes(mm[:8]) != _MAGIC:
+            raise ValueError(f"不是录制文件: {filepath}")
+        count = int(np.ndarray((1,), dtype=np.int64, buffer=mm, offset=8)[0])
+        meta = json.loads(bytes(mm[16:_HEADER_BYTES]).rstrip(b"\x00").decode("utf-8"))
+        self.fields = [(name, tuple(shape)) for name, shape in meta["fields"]]
+        self.regions = {name: tuple(r) for name, r in meta["regions"].items()}
+        self.dtype = _record_dtype(self.fields)
+        self._records = np.ndarray((count,), dtype=self.dtype, buffer=mm, offset=_HEADER_BYTES)
+        self.timestamps = self._records["timestamp"]
+        boxes = list(self.regions.values())
+        self.bounds = (
+            min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes),
+        )
+        self._canvas = None
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._records[name]
+
+    @property
+    def frames(self) -> np.ndarray:
+        """整帧录制的 (N, H, W, C) 数组"""
+        return self._records["frame"]
+
+    @property
+    def origin(self) -> Tuple[int, int]:
+        return (self.bounds[0], self.bounds[1])
+
+    def compose(self, idx: int) -> np.ndarray:
+        """合成第 idx 帧：各区域贴回外接矩形内的原位置，其余像素为 0"""
+        if len(self.fields) == 1 and self.fields[0][0] == "frame":
+            return np.ascontiguousarray(self.frames[idx])
+        ox, oy, ex, ey = self.bounds
+        if self._canvas is None:
+            channels = self.fields[0][1][2]
+            self._canvas = np.zeros((ey - oy, ex - ox, channels), dtype=np.uint8)
+        for name, _ in self.fields:
+            left, top, right, bottom = self.regions[name]
+            self._canvas[top - oy:bottom - oy, left - ox:right - ox] = self._records[name][idx]
+        return self._canvas.copy()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 共享内存帧环形缓冲区 - 截图、OCR、决策可以分别跑在独立进程里
+
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from window_capture import CaptureBackend, ReplayBackend
+
+# 头部字段 (int64): 最新序号, 槽位数, 高, 宽, 通道, 裁剪区域 left/top/right/bottom (-1 表示整屏)
+_HEADER_FIELDS = 9
+_HEADER_BYTES = 128
+
+
+class SharedFrameRing:
+    """基于 multiprocessing.shared_memory 的帧环形缓冲区
+
+    单写多读。每个槽位带序号和 perf_counter 时间戳，写入时先把槽位序号置为 -1，
+    拷贝完成后再写入新序号（seqlock）。读取方拿到的是共享内存上的 NumPy 视图，
+    不经过 pickle，但视图内容随时可能被生产者改写：读取方应先把需要的部分处理或拷贝出来，
+    再用 is_valid(seq) 确认这期间该帧没有被覆盖，否则丢弃结果。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self._header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        slots, height, width, channels = (int(v) for v in self._header[1:5])
+        self.slots = slots
+        self.shape = (height, width, channels)
+        offset = _HEADER_BYTES
+        self._seqs = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += slots * 8
+        self._timestamps = np.ndarray((slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += slots * 8
+        self._frames = np.ndarray((slots, height, width, channels), dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+    @classmethod
+    def create(cls, shape: Tuple[int, int, int], slots: int = 8, name: Optional[str] = None,
+               region: Optional[Tuple[int, int, int, int]] = None) -> "SharedFrameRing":
+        """创建新的环形缓冲区
+
+        Args:
+            shape: 单帧形状 (height, width, channels)
+            slots: 槽位数
+            name: 共享内存名称，None 时自动生成
+            region: 帧对应的屏幕区域，None 表示整屏
+        """
+        height, width, channels = shape
+        size = _HEADER_BYTES + slots * 16 + slots * height * width * channels
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = [-1, slots, height, width, channels] + list(region if region is not None else (-1, -1, -1, -1))
+        ring = cls(shm, owner=True)
+        ring._seqs[:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedFrameRing":
+        """在其他进程中按名称连接已有的缓冲区"""
+        # 子进程与创建方共用同一个 resource_tracker，释放统一由创建方负责
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def region(self) -> Optional[Tuple[int, int, int, int]]:
+        region = tuple(int(v) for v in self._header[5:9])
+        return None if region[0] < 0 else region
+
+    @property
+    def head(self) -> int:
+        """最新写入完成的帧序号，-1 表示还没有帧"""
+        return int(self._header[0])
+
+    def write(self, frame: np.ndarray, timestamp: float, seq: Optional[int] = None) -> int:
+        """写入一帧（只应由单个生产者调用），返回帧序号
+
+        Args:
+            frame: 帧图像，形状需与缓冲区一致
+            timestamp: 截图时间戳
+            seq: 帧序号（需大于已写入的序号），None 表示上一帧 + 1
+        """
+        if seq is None:
+            seq = self.head + 1
+        slot = seq % self.slots
+        self._seqs[slot] = -1
+        np.copyto(self._frames[slot], frame)
+        self._timestamps[slot] = timestamp
+        self._seqs[slot] = seq
+        self._header[0] = seq
+        return seq
+
+    def get(self, seq: int) -> Optional[Tuple[float, np.ndarray]]:
+        """按序号取帧视图，已被覆盖或正在写入时返回 None
+
+        只保证调用时槽位里是这一帧；用完视图后需再调用 is_valid(seq) 确认。
+        """
+        slot = seq % self.slots
+        if seq < 0 or self._seqs[slot] != seq:
+            return None
+        return float(self._timestamps[slot]), self._frames[slot]
+
+    def latest(self) -> Optional[Tuple[int, float, np.ndarray]]:
+        """读取最新一帧 (seq, timestamp, view)"""
+        seq = self.head
+        item = self.get(seq)
+        if item is None:
+            return None
+        return (seq,) + item
+
+    def wait_next(self, after_seq: int, timeout: Optional[float] = None,
+                  poll: float = 0.0005) -> Optional[Tuple[int, float, np.ndarray]]:
+        """等待序号大于 after_seq 的新帧，超时返回 None"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            if self.head > after_seq:
+                item = self.latest()
+                if item is not None:
+                    return item
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(poll)
+
+    def is_valid(self, seq: int) -> bool:
+        """确认 seq 对应的帧仍未被覆盖"""
+        return seq >= 0 and self._seqs[seq % self.slots] == seq
+
+    def close(self):
+        """断开连接，创建方同时释放共享内存"""
+        # 先释放 NumPy 视图，否则 SharedMemory.close() 会因缓冲区被引用而失败
+        del self._header, self._seqs, self._timestamps, self._frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingBackend(CaptureBackend):
+    """从共享内存环形缓冲区读取帧的截图后端，可直接交给 WindowCapture 使用
+
+    WindowCapture 把返回的帧原样交给 OCR、界面分类等消费者，它们持有的时间不确定，
+    共享内存视图随时可能被生产者覆盖。所以这里把槽位拷贝出来，拷贝后用 is_valid(seq)
+    确认拷贝期间没有被覆盖，否则换到更新的帧重试。
+    """
+
+    def __init__(self, ring: SharedFrameRing, timeout: float = 1.0):
+        self.ring = ring
+        self.timeout = timeout
+        self.seq = -1
+        self._timestamp = 0.0
+
+    def capture(self) -> Optional[np.ndarray]:
+        while True:
+            item = self.ring.wait_next(self.seq, self.timeout)
+            if item is None:
+                return None
+            seq, timestamp, view = item
+            frame = view.copy()
+            if self.ring.is_valid(seq):
+                self.seq, self._timestamp = seq, timestamp
+                return frame
+            # 拷贝期间槽位被覆盖，说明已有更新的帧
+            self.seq = seq
+
+    @property
+    def frame_timestamp(self) -> float:
+        return self._timestamp
+
+    @property
+    def resolution(self) -> Tuple[int, int]:
+        height, width, _ = self.ring.shape
+        return (width, height)
+
+    def set_region(self, region: Optional[Tuple[int, int, int, int]]):
+        # 裁剪在生产者进程中完成，这里只校验和缓冲区一致
+        if region != self.ring.region:
+            raise ValueError(f"裁剪区域 {region} 与共享缓冲区 {self.ring.region} 不一致")
+
+
+def capture_producer(ring_name: str, backend_factory: Callable[[], CaptureBackend],
+                     region: Optional[Tuple[int, int, int, int]], stop_event):
+    """截图生产者进程入口：不断截图并写入共享缓冲区
+
+    Args:
+        ring_name: 共享缓冲区名称
+        backend_factory: 可 pickle 的后端工厂（例如 functools.partial(ReplayBackend, path)）
+        region: 裁剪区域，需与缓冲区创建时一致
+        stop_event: multiprocessing.Event，置位后退出
+    """
+    ring = SharedFrameRing.attach(ring_name)
+    backend = backend_factory()
+    if region is not None:
+        backend.set_region(region)
+    try:
+        while not stop_event.is_set():
+            frame = backend.capture()
+            if frame is None:
+                if isinstance(backend, ReplayBackend):
+                    # 回放结束
+                    break
+                continue
+            ring.write(frame, backend.frame_timestamp)
+    finally:
+        backend.stop()
+        ring.close()
+
+
+def start_capture_process(backend_factory: Callable[[], CaptureBackend], shape: Tuple[int, int, int],
+                          slots: int = 8, region: Optional[Tuple[int, int, int, int]] = None):
+    """创建共享缓冲区并启动截图进程
+
+    Returns:
+        (ring, process, stop_event)
+    """
+    ring = SharedFrameRing.create(shape, slots, region=region)
+    stop_event = multiprocessing.Event()
+    process = multiprocessing.Process(
+        target=capture_producer, args=(ring.name, backend_factory, region, stop_event), daemon=True
+    )
+    process.start()
+    return ring, process, stop_event
+
+
+if __name__ == "__main__":
+    import sys
+    import functools
+    from window_capture import WindowCapture, measure_fps
+
+    # python frame_ring.py <回放源>：生产者进程回放，主进程从共享内存拷出帧（不经过 pickle）
+    source = sys.argv[1]
+    probe = ReplayBackend(source)
+    width, height = probe.resolution
+    probe.stop()
+    ring, process, stop_event = start_capture_process(
+        functools.partial(ReplayBackend, source, speed=0, loop=True), (height, width, 3)
+    )
+    wc = WindowCapture(backend=RingBackend(ring))
+    print(f"共享内存读取帧率: {measure_fps(wc, 3.0):.1f} fps")
+    stop_event.set()
+    process.join()
+    ring.close()
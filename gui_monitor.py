@@ -34,6 +34,7 @@ class MonitorWindow(QMainWindow):
         self.confidence = 0.0
         self.click_count = 0
         self.status = "就绪"
+        self.perf_stats = {}
         
         # 配置变量
         self.buy_click_delay = 0.50  # 购买点击延迟（秒）
@@ -41,8 +42,11 @@ class MonitorWindow(QMainWindow):
         self.buy_interval = 0.05  # 购买按钮点击间隔（秒）
         self.verify_interval = 0.05  # 确认按钮点击间隔（秒）
         self.ocr_interval = 0.95  # OCR识别间隔（time >= 5）（秒）
+        self.min_ocr_confidence = 0.75  # 低于该置信度的识别结果直接丢弃
         self.continue_after_complete = True  # 任务完成后继续运行
         self.click_refresh_at_3s = True  # 3秒时点击刷新按钮
+        self.record_session = False  # 录制截图区域用于离线回放
+        self.rec_only = True  # 固定区域跳过文字检测，只跑识别模型
         
         self.init_ui()
         
@@ -130,6 +134,29 @@ class MonitorWindow(QMainWindow):
         timer_layout.addWidget(self.timer_label)
 
         main_layout.addWidget(timer_group)
+
+        # ========== 性能统计组 ===========
+        perf_group = QGroupBox("性能统计")
+        perf_group.setStyleSheet("""
+            QGroupBox {
+                font-size: 14px;
+                font-weight: bold;
+                border: 2px solid #607D8B;
+                border-radius: 5px;
+                margin-top: 0px;
+                padding-top: 10px;
+            }
+        """)
+        perf_layout = QVBoxLayout()
+        perf_group.setLayout(perf_layout)
+
+        self.perf_label = QLabel("--")
+        self.perf_label.setFont(QFont("微软雅黑", 9))
+        self.perf_label.setWordWrap(True)
+        self.perf_label.setStyleSheet("color: #546E7A; padding: 5px;")
+        perf_layout.addWidget(self.perf_label)
+
+        main_layout.addWidget(perf_group)
         
         # ========== 脚本配置组 ==========
         config_group = QGroupBox("脚本配置")
@@ -154,9 +181,10 @@ class MonitorWindow(QMainWindow):
         self.delay_spin = QDoubleSpinBox()
         self.delay_spin.setRange(0.0, 5.0)
         self.delay_spin.setValue(self.buy_click_delay)
-        self.delay_spin.setSingleStep(0.1)
-        self.delay_spin.setDecimals(2)
+        self.delay_spin.setSingleStep(0.01)
+        self.delay_spin.setDecimals(3)
         self.delay_spin.setSuffix(" 秒")
+        self.delay_spin.setToolTip("从倒计时跳到 0分1秒 的时刻起算（按逐帧检测到的整秒边界预测）")
         self.delay_spin.setFont(QFont("微软雅黑", 10))
         self.delay_spin.valueChanged.connect(self.on_delay_changed)
         delay_layout.addWidget(delay_label)
@@ -235,6 +263,24 @@ class MonitorWindow(QMainWindow):
         ocr_interval_layout.addWidget(self.ocr_interval_spin)
         ocr_interval_layout.addStretch()
         config_layout.addLayout(ocr_interval_layout)
+
+        # OCR最低置信度设置
+        confidence_layout = QHBoxLayout()
+        confidence_label = QLabel("OCR最低置信度:")
+        confidence_label.setFont(QFont("微软雅黑", 10))
+        confidence_label.setFixedWidth(120)
+        self.confidence_spin = QDoubleSpinBox()
+        self.confidence_spin.setRange(0.0, 1.0)
+        self.confidence_spin.setValue(self.min_ocr_confidence)
+        self.confidence_spin.setSingleStep(0.05)
+        self.confidence_spin.setDecimals(2)
+        self.confidence_spin.setFont(QFont("微软雅黑", 10))
+        self.confidence_spin.setToolTip("识别置信度低于该值的结果视为读取失败，不参与解析和缓存")
+        self.confidence_spin.valueChanged.connect(self.on_confidence_changed)
+        confidence_layout.addWidget(confidence_label)
+        confidence_layout.addWidget(self.confidence_spin)
+        confidence_layout.addStretch()
+        config_layout.addLayout(confidence_layout)
         
         # 任务完成后继续运行选项
         continue_layout = QHBoxLayout()
@@ -273,6 +319,44 @@ class MonitorWindow(QMainWindow):
         refresh_layout.addWidget(self.refresh_checkbox)
         refresh_layout.addStretch()
         config_layout.addLayout(refresh_layout)
+
+        # 录制会话选项
+        record_layout = QHBoxLayout()
+        self.record_checkbox = QCheckBox("录制会话(回放调试用)")
+        self.record_checkbox.setFont(QFont("微软雅黑", 10))
+        self.record_checkbox.setChecked(self.record_session)
+        self.record_checkbox.stateChanged.connect(self.on_record_changed)
+        self.record_checkbox.setStyleSheet("""
+            QCheckBox {
+                padding: 5px;
+            }
+            QCheckBox::indicator {
+                width: 18px;
+                height: 18px;
+            }
+        """)
+        record_layout.addWidget(self.record_checkbox)
+        record_layout.addStretch()
+        config_layout.addLayout(record_layout)
+
+        # 仅识别模式选项
+        rec_only_layout = QHBoxLayout()
+        self.rec_only_checkbox = QCheckBox("仅识别模式(跳过文字检测)")
+        self.rec_only_checkbox.setFont(QFont("微软雅黑", 10))
+        self.rec_only_checkbox.setChecked(self.rec_only)
+        self.rec_only_checkbox.stateChanged.connect(self.on_rec_only_changed)
+        self.rec_only_checkbox.setStyleSheet("""
+            QCheckBox {
+                padding: 5px;
+            }
+            QCheckBox::indicator {
+                width: 18px;
+                height: 18px;
+            }
+        """)
+        rec_only_layout.addWidget(self.rec_only_checkbox)
+        rec_only_layout.addStretch()
+        config_layout.addLayout(rec_only_layout)
         
         main_layout.addWidget(config_group)
         
@@ -422,10 +506,16 @@ class MonitorWindow(QMainWindow):
         except:
             pass
     
-    def update_ocr(self, text, confidence):
-        """更新OCR信息"""
+    def update_perf(self, key, text):
+        """更新性能统计（同一个 key 覆盖显示）"""
+        self.perf_stats[key] = text
+        self.perf_label.setText("\n".join(f"{k}: {v}" for k, v in self.perf_stats.items()))
+
+    def update_ocr(self, text, confidence, elapsed):
+        """更新OCR信息（识别文本、置信度、推理耗时）"""
         self.ocr_text = text
         self.confidence = confidence
+        self.update_perf("最近OCR", f"{text or '--'} 置信度{confidence:.2f} {elapsed * 1000:.0f}ms")
     
     def on_delay_changed(self, value):
         """购买点击延迟变更"""
@@ -464,6 +554,23 @@ class MonitorWindow(QMainWindow):
         status = "启用" if self.click_refresh_at_3s else "禁用"
         self.add_log(f"⚙️ 3秒时点击刷新: {status}")
     
+    def on_record_changed(self, state):
+        """录制会话选项变更"""
+        self.record_session = (state == 2)  # Qt.CheckState.Checked = 2
+        status = "启用" if self.record_session else "禁用"
+        self.add_log(f"⚙️ 录制会话: {status}")
+
+    def on_confidence_changed(self, value):
+        """OCR最低置信度变更"""
+        self.min_ocr_confidence = value
+        self.add_log(f"⚙️ OCR最低置信度已设置为: {value:.2f}")
+    
+    def on_rec_only_changed(self, state):
+        """仅识别模式选项变更"""
+        self.rec_only = (state == 2)  # Qt.CheckState.Checked = 2
+        status = "启用" if self.rec_only else "禁用"
+        self.add_log(f"⚙️ 仅识别模式: {status}")
+    
     def get_config(self):
         """获取当前配置"""
         return {
@@ -472,8 +579,11 @@ class MonitorWindow(QMainWindow):
             'buy_interval': self.buy_interval,
             'verify_interval': self.verify_interval,
             'ocr_interval': self.ocr_interval,
+            'min_ocr_confidence': self.min_ocr_confidence,
             'continue_after_complete': self.continue_after_complete,
-            'click_refresh_at_3s': self.click_refresh_at_3s
+            'click_refresh_at_3s': self.click_refresh_at_3s,
+            'record_session': self.record_session,
+            'rec_only': self.rec_only
         }
     
     def increment_clicks(self):
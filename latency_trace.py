@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 逐阶段延迟统计 - 从截图到点击每个阶段的直方图与 Chrome trace 导出
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# ScriptThread.run 中按顺序打点的阶段
+STAGES = ("capture", "crop", "preprocess", "ocr", "parse", "decision", "click")
+
+
+class LatencyHistogram:
+    """对数分桶直方图：O(1) 记录，内存固定，按桶估算分位数
+
+    桶覆盖 1 微秒 ~ 100 秒，每十倍 20 个桶，相对误差约 12%。
+    """
+
+    BUCKETS_PER_DECADE = 20
+    MIN_SECONDS = 1e-6
+    DECADES = 8
+
+    def __init__(self):
+        self.counts = [0] * (self.BUCKETS_PER_DECADE * self.DECADES + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        if seconds <= self.MIN_SECONDS:
+            idx = 0
+        else:
+            idx = int(math.log10(seconds / self.MIN_SECONDS) * self.BUCKETS_PER_DECADE) + 1
+            idx = min(idx, len(self.counts) - 1)
+        self.counts[idx] += 1
+        self.total += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def _bucket_upper(self, idx: int) -> float:
+        return self.MIN_SECONDS * 10 ** (idx / self.BUCKETS_PER_DECADE)
+
+    def percentile(self, p: float) -> float:
+        """估算分位数 (秒)，p 取 0-100"""
+        if self.total == 0:
+            return 0.0
+        target = self.total * p / 100.0
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._bucket_upper(idx), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+
+class LatencyTracer:
+    """逐阶段延迟打点
+
+    每轮循环调用 begin()，各阶段结束时调用 mark(stage)，阶段耗时为距上一次打点的时间。
+    跳过的阶段（例如命中 OCR 缓存时没有 preprocess/ocr）不会记录。
+    所有时间戳使用 time.perf_counter()，与截图后端的帧时间戳一致。
+    """
+
+    def __init__(self, max_events: int = 200000, enabled: bool = True):
+        """初始化打点器
+
+        Args:
+            max_events: Chrome trace 最多保留的事件数（超出后丢弃最早的）
+            enabled: 关闭时所有打点直接返回
+        """
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.events = deque(maxlen=max_events)
+        self.iteration = 0
+        self._begin = None
+        self._last = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def begin(self, timestamp: Optional[float] = None):
+        """开始新的一轮循环
+
+        Args:
+            timestamp: 循环起点，例如帧的截图时间戳；None 表示现在
+        """
+        if not self.enabled:
+            return
+        self.end()
+        self.iteration += 1
+        self._begin = self._last = time.perf_counter() if timestamp is None else timestamp
+
+    def mark(self, stage: str, timestamp: Optional[float] = None):
+        """记录一个阶段结束
+
+        Args:
+            stage: 阶段名称（见 STAGES）
+            timestamp: 阶段结束时间，None 表示现在
+        """
+        if not self.enabled or self._last is None:
+            return
+        now = time.perf_counter() if timestamp is None else timestamp
+        self._record(stage, self._last, now)
+        self._last = now
+
+    def end(self):
+        """结束当前循环，记录从 begin 到最后一次打点的总耗时"""
+        if not self.enabled or self._begin is None:
+            return
+        if self._last > self._begin:
+            self._record("iteration", self._begin, self._last)
+        self._begin = self._last = None
+
+    def _record(self, stage: str, start: float, stop: float):
+        with self._lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = LatencyHistogram()
+            hist.record(stop - start)
+            self.events.append((stage, start, stop, self.iteration, threading.get_ident()))
+
+    def percentiles(self, stage: str) -> Tuple[float, float, float]:
+        """(p50, p95, p99)，单位毫秒"""
+        hist = self.histograms.get(stage)
+        if hist is None:
+            return (0.0, 0.0, 0.0)
+        return tuple(hist.percentile(p) * 1000 for p in (50, 95, 99))
+
+    def summary(self, stages: Optional[List[str]] = None) -> str:
+        """各阶段 p50/p95/p99 文本，用于日志和监控窗口"""
+        lines = []
+        for stage in stages or list(STAGES) + ["iteration"]:
+            if stage not in self.histograms:
+                continue
+            p50, p95, p99 = self.percentiles(stage)
+            lines.append(f"{stage} {p50:.2f}/{p95:.2f}/{p99:.2f}ms")
+        return " | ".join(lines)
+
+    def export_chrome_trace(self, filepath: str):
+        """导出为 Chrome trace_event JSON（chrome://tracing 或 Perfetto 打开）
+
+        Args:
+            filepath: 输出文件路径
+        """
+        with self._lock:
+            events = list(self.events)
+        trace = [{
+            "name": stage,
+            "cat": "iteration" if stage == "iteration" else "stage",
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": (stop - start) * 1e6,
+            "pid": self._pid,
+            "tid": tid,
+            "args": {"iteration": iteration},
+        } for stage, start, stop, iteration, tid in events]
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        print(f"✓ 延迟追踪已导出到: {filepath}")
@@ -13,6 +13,9 @@ import ctypes
 from window_capture import *
 from region_selector import RegionSelector
 from gui_monitor import MonitorWindow
+from latency_trace import LatencyTracer
+from precise_timer import default_timer, precise_sleep
+from direct_input import direct_click
 
 import numpy
 from paddleocr import PaddleOCR
@@ -72,7 +75,8 @@ def click_region_center(region: tuple, clicks=1, interval=0.1):
     center_x += int((os.urandom(1)[0] / 255 - 0.5) * 10)
     center_y += int((os.urandom(1)[0] / 255 - 0.5) * 10)
 
-    pydirectinput.click(x=center_x, y=center_y, clicks=clicks, interval=interval, button=pydirectinput.LEFT)
+    direct_click(center_x, center_y, clicks=clicks, interval=interval)
+
 
 def extract_and_merge_digits(s: str) -> str:
     """识别字符串中的所有数字并合并为一个新字符串"""
@@ -85,6 +89,7 @@ class ScriptThread(QThread):
     status_updated = pyqtSignal(str)
     timer_updated = pyqtSignal(str, str)
     ocr_updated = pyqtSignal(str, float)
+    perf_updated = pyqtSignal(str, str)
     click_performed = pyqtSignal()
     task_completed = pyqtSignal()
     
@@ -96,6 +101,17 @@ class ScriptThread(QThread):
         self.config = config
         self.is_running = True
         self.is_paused = False
+        # 截图 -> 点击各阶段延迟
+        self.tracer = LatencyTracer()
+        self._last_perf_report = 0.0
+
+    def report_perf_stats(self):
+        """每秒向监控窗口上报一次各阶段延迟"""
+        now = time.perf_counter()
+        if now - self._last_perf_report >= 1.0:
+            self._last_perf_report = now
+            self.perf_updated.emit("延迟 p50/p95/p99", self.tracer.summary())
+            self.perf_updated.emit("精确等待", default_timer().summary())
     
     def frame_cut(self, frame, region):
         """裁剪图像区域"""
@@ -132,8 +148,12 @@ class ScriptThread(QThread):
         frame = self.win_cap.capture()
         # while frame is None or frame.size == 0: frame = self.win_cap.capture()
         if frame is None or frame.size == 0: return ""
+        self.tracer.mark("capture")
         roi = self.frame_cut(frame, region)
+        self.tracer.mark("crop")
         res = self.ocr.ocr(roi)
+        self.tracer.mark("ocr")
+        self.report_perf_stats()
         if not res or not res[0]['rec_texts']:
             return ""
         return res[0]['rec_texts'][0]
@@ -160,13 +180,16 @@ class ScriptThread(QThread):
             while self.is_running:
                 # 暂停时等待
                 while self.is_paused: time.sleep(0.2); continue
+                self.tracer.begin()
                 # 截图并OCR识别时间
                 res = self.ocr_region(time_region)
                 if "天" in res or "小时" in res: click_region_center(refresh_region); continue
                 match = pattern.search(res)
+                self.tracer.mark("parse")
                 if match:
                     minutes = int(match.group(1))
                     seconds = int(match.group(2))
+                    self.tracer.mark("decision")
                     # 更新时间显示
                     self.timer_updated.emit(str(minutes), str(seconds))
                     # 剩余时间到 0:03 时点击刷新（如果启用）
@@ -177,17 +200,18 @@ class ScriptThread(QThread):
                     # 剩余时间到 0:01 时执行点击
                     if minutes == 0 and seconds == 1:
                         self.status_updated.emit("准备点击...")
-                        time.sleep(self.config['buy_click_delay'])
+                        precise_sleep(self.config['buy_click_delay'])
                         # 点击购买按钮
                         click_region_center(buy_region, interval=0)
+                        self.tracer.mark("click")
                         # 校验点击是否成功（可能造成延迟）
                         buy_count = 0
                         while not self.verify_window() and buy_count < 5:
                             buy_count += 1
                             if buy_count <= 2:
-                                time.sleep(self.config['buy_interval'])
+                                precise_sleep(self.config['buy_interval'])
                                 click_region_center(buy_region, interval=0)
-                        time.sleep(self.config['buy_to_verify_delay'])
+                        precise_sleep(self.config['buy_to_verify_delay'])
                         # 点击确认按钮
                         click_region_center(verify_region, interval=self.config['verify_interval'])
                         self.status_updated.emit("点击确认按钮...")
@@ -196,11 +220,11 @@ class ScriptThread(QThread):
                         while self.verify_window():
                             verify_counter += 1
                             if verify_counter > 2:
-                                pydirectinput.click(1, 1, interval=0.1)
+                                direct_click(1, 1, interval=0.1)
                             click_region_center(verify_region, interval=self.config['verify_interval'])
                         
                         self.status_updated.emit("等待刷新...")
-                        time.sleep(1.5)
+                        precise_sleep(1.5)
                         if self.verify_window(): pydirectinput.press('esc')
                         click_region_center(refresh_region)
                         # 检查三角币是否变化
@@ -224,6 +248,8 @@ class ScriptThread(QThread):
         except Exception as e:
             self.status_updated.emit(f"错误: {str(e)}")
             print(f"脚本运行错误: {e}")
+        finally:
+            self.tracer.end()
     
     def pause(self):
         self.is_paused = True
@@ -278,6 +304,7 @@ def main():
         script_thread.status_updated.connect(lambda s: window.update_status(s))
         script_thread.status_updated.connect(lambda s: window.add_log(s))
         script_thread.timer_updated.connect(lambda m, s: window.update_timer(m, s))
+        script_thread.perf_updated.connect(lambda k, v: window.update_perf(k, v))
         script_thread.task_completed.connect(lambda: window.on_complete())
         
         script_thread.start()
@@ -290,10 +317,15 @@ def main():
         if script_thread:
             script_thread.resume()
     
+    def export_trace():
+        if script_thread:
+            script_thread.tracer.export_chrome_trace(time.strftime("trace_%Y%m%d_%H%M%S.json"))
+
     def on_stop():
         if script_thread:
             script_thread.stop()
             script_thread.wait()
+            export_trace()
     
     window.controller.start_requested.connect(on_start)
     window.controller.pause_requested.connect(on_pause)
@@ -304,6 +336,7 @@ def main():
         if script_thread and script_thread.isRunning():
             script_thread.stop()
             script_thread.wait()
+            export_trace()
         win_cap.stop()
     
     app.aboutToQuit.connect(cleanup)
@@ -18,11 +18,31 @@ except Exception as e:
 import re
 import time
 import ctypes
+from concurrent.futures import FIRST_COMPLETED, wait
 import cv2
+from typing import Dict, List, Optional, Tuple
 
 from window_capture import *
 from region_selector import RegionSelector
 from gui_monitor import MonitorWindow
+from roi_change import RegionChangeDetector
+from latency_trace import LatencyTracer
+from color_match import ColorMatcher
+from capture_manager import CaptureManager, OcrHandle, read_instance_configs
+from ocr_cache import OcrResultCache
+from digit_recognizer import TemplateDigitRecognizer
+from ocr_engine import OcrResult, PreprocessPlan, RecOnlyEngine, result_from_lines
+from ocr_service import OcrService
+from frame_ring import SharedFrameRing
+from ocr_profile import tune_ocr
+from countdown_tracker import CountdownTracker
+from phase_estimator import PhaseEstimator
+from timer_decoder import TimerDecoder
+from digit_transition import TransitionMonitor
+from ui_state import CONFIRM, UiStateClassifier
+from buy_fsm import DONE, MONITORING, BuyStateMachine, FrameEvent
+from precise_timer import default_timer
+from direct_input import direct_click, move_to, press_click
 
 import numpy
 from rapidocr_onnxruntime import RapidOCR
@@ -70,8 +90,8 @@ def run_as_admin():
     return True
 
 
-def click_region_center(region: tuple, clicks=1, interval=0.1):
-    """点击区域的中心位置 - 使用多种方法尝试
+def region_center(region: tuple) -> Tuple[int, int]:
+    """区域中心位置，带随机偏移
 
     Args:
         region: (left, top, right, bottom) 格式的区域坐标
@@ -84,8 +104,17 @@ def click_region_center(region: tuple, clicks=1, interval=0.1):
     # 在20个像素的范围内随机偏移，防止被检测
     center_x += int((os.urandom(1)[0] / 255 - 0.5) * 10)
     center_y += int((os.urandom(1)[0] / 255 - 0.5) * 10)
+    return center_x, center_y
 
-    pydirectinput.click(x=center_x, y=center_y, clicks=clicks, interval=interval, button=pydirectinput.LEFT)
+
+def click_region_center(region: tuple, clicks=1, interval=0.1):
+    """点击区域的中心位置
+
+    Args:
+        region: (left, top, right, bottom) 格式的区域坐标
+    """
+    center_x, center_y = region_center(region)
+    direct_click(center_x, center_y, clicks=clicks, interval=interval)
 
 
 def extract_and_merge_digits(s: str) -> str:
@@ -93,16 +122,27 @@ def extract_and_merge_digits(s: str) -> str:
     return ''.join(re.findall(r'\d', s))
 
 
+# 确认按钮颜色 (BGR)，与之色差小说明确认弹窗已显示
+VERIFY_BUTTON_BGR = (65, 109, 175)
+# 界面状态分类使用的特征区域（需在截图裁剪范围内）
+UI_SIGNATURE_REGIONS = ["time", "money", "verify_check"]
+
+
 class ScriptThread(QThread):
     """脚本运行线程"""
 
     status_updated = pyqtSignal(str)
     timer_updated = pyqtSignal(str, str)
-    ocr_updated = pyqtSignal(str, float)
+    ocr_updated = pyqtSignal(str, float, float)
+    perf_updated = pyqtSignal(str, str)
     click_performed = pyqtSignal()
     task_completed = pyqtSignal()
 
-    def __init__(self, selector: RegionSelector, win_cap: WindowCapture, ocr, config):
+    def __init__(self, selector: RegionSelector, win_cap: WindowCapture, ocr, config,
+                 ocr_cache: Optional[OcrResultCache] = None,
+                 digit_recognizer: Optional[TemplateDigitRecognizer] = None,
+                 ocr_service: Optional[OcrService] = None,
+                 ui_state: Optional[UiStateClassifier] = None):
         super().__init__()
         self.selector = selector
         self.win_cap = win_cap
@@ -110,6 +150,70 @@ class ScriptThread(QThread):
         self.config = config
         self.is_running = True
         self.is_paused = False
+        # ROI 像素未变化时跳过 OCR
+        self.change_detector = RegionChangeDetector()
+        # 预处理后图像相同（感知哈希一致）时直接返回历史识别结果
+        self.ocr_cache = ocr_cache if ocr_cache is not None else OcrResultCache()
+        # time 区域优先用模板匹配识别，无法可靠匹配时回退 RapidOCR 并从其结果学习
+        self.digit_recognizer = digit_recognizer
+        # 区域固定为单行文字，可跳过检测网络直接识别
+        self.rec_engine = RecOnlyEngine(ocr)
+        # 设置了 OCR 进程池时推理在工作进程中执行，本线程等待期间继续看新帧
+        self.ocr_service = ocr_service
+        # 每个区域一份预处理计划，复用输出缓冲
+        self.preprocess_plans: Dict[str, PreprocessPlan] = {}
+        # 倒计时锁定后按单调时钟推算，OCR 只用于校准
+        self.tracker = CountdownTracker(unlocked_interval=config['ocr_interval'])
+        # 后台线程逐帧检测秒数字形跳变（不经过 OCR），估计整秒边界，按固定偏移点击
+        self.phase = PhaseEstimator()
+        self.transition_monitor: Optional[TransitionMonitor] = None
+        # 时间文本在识别网络的 top-k 候选上按 "M分S秒" 等语法解码，并参考跟踪器的预测
+        self.timer_decoder = TimerDecoder()
+        self.lattice_k = 5
+        # 确认弹窗检测（多探针颜色匹配）
+        self.verify_matcher = ColorMatcher([VERIFY_BUTTON_BGR], max_delta_e=16)
+        # 购买流程等待界面状态变化，而不是固定延时
+        self.ui_state = ui_state if ui_state is not None else UiStateClassifier()
+        # 抢购流程状态机，本线程作为它的界面交互接口
+        self.fsm = BuyStateMachine(self, config, self.tracker, self.phase, self.timer_decoder)
+        self._event_seq = -1
+        self._aimed: Optional[str] = None
+        # 点击时刻、点击间隔等等待都用睡眠 + 自旋的精确等待
+        self.timer = default_timer()
+        # 截图 -> 点击各阶段延迟
+        self.tracer = LatencyTracer()
+        self._last_perf_report = 0.0
+        # 模型识别结果（含置信度、耗时）限频推送到监控窗口
+        self._last_ocr_report = 0.0
+        self.rejected_reads = 0
+        # 区域名 -> 最近一次识别所用帧的截图时间戳
+        self.read_timestamps: Dict[str, float] = {}
+
+    def report_perf_stats(self):
+        """每秒向监控窗口上报一次 OCR 缓存命中率和各阶段延迟"""
+        now = time.perf_counter()
+        if now - self._last_perf_report >= 1.0:
+            self._last_perf_report = now
+            self.perf_updated.emit("OCR缓存命中", self.change_detector.summary())
+            self.perf_updated.emit("OCR结果缓存", self.ocr_cache.summary())
+            self.perf_updated.emit("低置信度丢弃", str(self.rejected_reads))
+            self.perf_updated.emit("延迟 p50/p95/p99", self.tracer.summary())
+            if self.ocr_service is not None:
+                self.perf_updated.emit("OCR进程池", self.ocr_service.summary())
+            self.perf_updated.emit("倒计时跟踪", self.tracker.summary())
+            self.perf_updated.emit("相位估计", self.phase.summary())
+            if self.transition_monitor is not None:
+                self.perf_updated.emit("秒跳变检测", self.transition_monitor.summary())
+            self.perf_updated.emit("界面状态", self.ui_state.summary())
+            self.perf_updated.emit("状态机", self.fsm.summary())
+            self.perf_updated.emit("精确等待", self.timer.summary())
+
+    def report_ocr(self, result: OcrResult):
+        """把一次模型识别结果推送到监控窗口，最多每 0.2 秒一次"""
+        now = time.perf_counter()
+        if now - self._last_ocr_report >= 0.2:
+            self._last_ocr_report = now
+            self.ocr_updated.emit(result.text, result.confidence, result.elapsed)
 
     def frame_cut(self, frame, region):
         """裁剪图像区域"""
@@ -142,35 +246,18 @@ class ScriptThread(QThread):
     #     return False
 
     def verify_window(self) -> bool:
-        """检查确认按钮区域的颜色是否变化 (优化版，不使用 colormath)"""
+        """检查确认按钮区域的颜色是否变化（多探针 CIEDE2000，查表实现）"""
         frame = self.win_cap.capture()
         if frame is None or frame.size == 0:
             return False
 
         region = self.selector.get_region("verify_check")
-        # 确保坐标合法
-        l, t, r, b = region
+        # 确保坐标合法（换算到截图帧内坐标）
+        l, t, r, b = self.win_cap.frame_region(region)
         if r <= l or b <= t: return False
 
-        # 获取区域中心点的颜色 (BGR)
-        center_x, center_y = (l + r) // 2, (t + b) // 2
-        # 注意：OpenCV 坐标是 [y, x]
-        color_bgr = frame[center_y, center_x]
-
-        # 预设的确认按钮目标颜色 (这里根据你的日志 175, 109, 65 调整)
-        # 假设目标 BGR 是 [65, 109, 175]
-        target_bgr = numpy.array([65, 109, 175])
-        current_bgr = numpy.array(color_bgr)
-
-        # 计算欧氏距离 (取代 delta_e)
-        distance = numpy.linalg.norm(current_bgr - target_bgr)
-
-        # self.status_updated.emit(f"颜色距离: {distance:.2f}") # 调试用
-
-        # 距离越小颜色越接近，通常距离小于 30 就认为匹配成功
-        if distance < 50:
-            return True
-        return False
+        # 区域内 3x3 个探针与确认按钮颜色的色差，多数探针接近即认为弹窗已显示
+        return self.verify_matcher.match(frame, (l, t, r, b))
 
     # def ocr_region(self, region):
     #     """OCR 识别"""
@@ -183,204 +270,311 @@ class ScriptThread(QThread):
     #         return ""
     #     return res[0]['rec_texts'][0]
 
-    def ocr_region(self, region_name, region):
-        """OCR 识别 (适配 RapidOCR + 防错处理)"""
-        frame = self.win_cap.capture()
-        if frame is None or frame.size == 0:
-            return ""
+    def preprocess(self, region_name: str, roi):
+        """按区域预处理（money 原图，time 自适应二值化 + 放大），返回的图像会被下一次调用覆盖"""
+        plan = self.preprocess_plans.get(region_name)
+        if plan is None or not plan.matches(roi):
+            plan = self.preprocess_plans[region_name] = PreprocessPlan(region_name, roi.shape)
+        return plan(roi)
+
+    def ocr_region(self, region_name, region) -> OcrResult:
+        """OCR 识别单个区域"""
+        return self.ocr_regions([(region_name, region)])[region_name]
+
+    def ocr_regions(self, regions: List[Tuple[str, tuple]]) -> Dict[str, OcrResult]:
+        """在同一帧上识别多个区域 (适配 RapidOCR + 防错处理)
+
+        像素未变化、模板匹配或结果缓存能回答的区域不进模型，其余区域在仅识别模式下
+        合并为一次批量推理；设置了 OCR 进程池时交给进程池识别。置信度低于
+        config['min_ocr_confidence'] 的结果视为读取失败：文本和 top-k 候选都置空，且不写入任何缓存。
+
+        Args:
+            regions: [(区域名, 区域坐标), ...]
+
+        Returns:
+            区域名 -> OcrResult，缓存命中的置信度为 1.0，失败时文本为空；
+            各区域所识别帧的截图时间戳记在 self.read_timestamps
+        """
+        results = {name: OcrResult("", 0.0, 0.0) for name, _ in regions}
+        self.update_ocr_priority()
+        item = self.win_cap.latest_frame()
+        if item is None or item[2].size == 0:
+            return results
+        seq, timestamp, frame = item
+        for region_name, _ in regions:
+            self.read_timestamps[region_name] = timestamp
+        self.tracer.mark("capture")
+
+        rois = {}
+        for region_name, region in regions:
+            # 确保裁剪区域合法（换算到截图帧内坐标）
+            left, top, right, bottom = self.win_cap.frame_region(region)
+            if right <= left or bottom <= top:
+                continue
+            roi = frame[top:bottom, left:right]
+            if roi.size:
+                rois[region_name] = roi
+        self.tracer.mark("crop")
+        self.report_perf_stats()
+
+        pending = []
+        for region_name, roi in rois.items():
+            # 像素没有变化时直接复用上一次的识别结果
+            cached = self.change_detector.lookup(region_name, roi)
+            if cached is None and region_name == "time" and self.digit_recognizer is not None:
+                cached = self.digit_recognizer.recognize(roi)
+                if cached is not None:
+                    self.change_detector.store(region_name, cached)
+            if cached is not None:
+                results[region_name] = OcrResult(cached, 1.0, 0.0)
+                continue
+            # 按区域类型分流预处理（money 原图，time 自适应二值化）
+            input_img = self.preprocess(region_name, roi)
+            cached = self.ocr_cache.get(region_name, input_img)
+            if cached is not None:
+                self.change_detector.store(region_name, cached)
+                results[region_name] = OcrResult(cached, 1.0, 0.0)
+                continue
+            pending.append((region_name, roi, input_img))
+        if not pending:
+            return results
+        self.tracer.mark("preprocess")
 
-        # 确保裁剪区域合法
-        left, top, right, bottom = region
-        if right <= left or bottom <= top:
-            return ""
-
-        roi = frame[top:bottom, left:right]
-        if roi.size == 0:
-            return ""
-        # --- 策略分流 ---
-        if region_name == "money":
-            # 三角币识别：直接识别，不处理（或者只做简单的灰度）
-            input_img = roi
+        try:
+            if self.ocr_service is not None:
+                reads = self.recognize_in_service(pending, dict(regions), seq)
+            elif self.config.get('rec_only'):
+                reads = self.rec_engine.recognize_many([(name, img) for name, _, img in pending], self.lattice_k)
+            else:
+                reads = []
+                for _, _, input_img in pending:
+                    start = time.perf_counter()
+                    result, _ = self.ocr(input_img)
+                    reads.append(result_from_lines(result, time.perf_counter() - start))
+            self.tracer.mark("ocr")
+        except Exception as e:
+            print(f"OCR 内部错误: {e}")
+            return results
+
+        min_confidence = self.config.get('min_ocr_confidence', 0.0)
+        for (region_name, roi, input_img), result in zip(pending, reads):
+            self.report_ocr(result)
+            if result.text and result.confidence < min_confidence:
+                # 低置信度的读数（如 "分" 读成 "份"）文本置空、不缓存，下一帧重新识别；
+                # top-k 候选一并丢弃，否则倒计时解码器会从候选里解出时间，绕过置信度门限
+                self.rejected_reads += 1
+                results[region_name] = result._replace(text="", lattice=None)
+                continue
+            self.change_detector.store(region_name, result.text)
+            self.ocr_cache.put(region_name, input_img, result.text)
+            if region_name == "time" and self.digit_recognizer is not None:
+                self.digit_recognizer.learn(roi, result.text)
+            results[region_name] = result
+        return results
+
+    def update_ocr_priority(self):
+        """多实例共用模型时，倒计时进入加密校准窗口或已开始抢购的实例推理插队"""
+        if not isinstance(self.ocr, OcrHandle):
+            return
+        remaining = self.tracker.remaining()
+        near = remaining is not None and remaining <= self.tracker.dense_window
+        self.ocr.set_urgent(near or self.fsm.state not in (MONITORING, DONE))
+
+    def recognize_in_service(self, pending: list, regions: Dict[str, tuple], seq: int) -> List[OcrResult]:
+        """交给 OCR 进程池识别，等待期间继续截图
+
+        等待中某个区域的像素又变了（例如倒计时跳秒），就用新帧重新提交，旧请求作废，
+        最终只等待每个区域最新一次提交的结果。pending 中的 (区域名, roi, 预处理图像)
+        会被替换为实际识别的那一帧，供调用方写入缓存。进程池连接了共享内存帧缓冲区时，
+        只提交帧序号和区域坐标，由工作进程在共享内存上取图。
+
+        Args:
+            pending: [(区域名, roi, 预处理图像), ...]
+            regions: 区域名 -> 区域坐标
+            seq: pending 所在帧的序号
+
+        Returns:
+            [OcrResult, ...]，顺序与 pending 一致
+        """
+        service = self.ocr_service
+        rec_only = bool(self.config.get('rec_only'))
+        for region_name, _, input_img in pending:
+            box = self.win_cap.frame_region(regions[region_name])
+            service.submit(region_name, input_img, rec_only, self.lattice_k, (seq, box))
+        while True:
+            futures = [service.latest(region_name) for region_name, _, _ in pending]
+            # 工作进程取图前帧已被覆盖（结果为 None）的区域也要用新帧重新提交
+            lost = [f.done() and f.exception() is None and f.result() is None for f in futures]
+            # 只等还没完成的请求：已完成的 future 会让 FIRST_COMPLETED 立即返回，循环空转占满 CPU
+            not_done = [f for f in futures if not f.done()]
+            if (not not_done and not any(lost)) or not self.is_running:
+                break
+            if not_done:
+                wait(not_done, timeout=0.005, return_when=FIRST_COMPLETED)
+            else:
+                self.win_cap.wait_frame(seq, timeout=0.005)
+            item = self.win_cap.latest_frame()
+            if item is None or item[0] == seq:
+                continue
+            seq, timestamp, frame = item
+            for i, (region_name, _, _) in enumerate(pending):
+                if futures[i].done() and not lost[i]:
+                    continue
+                box = self.win_cap.frame_region(regions[region_name])
+                left, top, right, bottom = box
+                roi = frame[top:bottom, left:right]
+                input_img = self.preprocess(region_name, roi)
+                if lost[i] or service.is_stale(region_name, input_img):
+                    # 更新变化检测器的待存签名，使其与最终识别的帧一致
+                    self.change_detector.lookup(region_name, roi)
+                    service.submit(region_name, input_img, rec_only, self.lattice_k, (seq, box))
+                    pending[i] = (region_name, roi, input_img)
+                    self.read_timestamps[region_name] = timestamp
+        reads = [service.latest(region_name).result(timeout=1.0) for region_name, _, _ in pending]
+        return [OcrResult("", 0.0, 0.0) if result is None else result for result in reads]
+
+    def setup_ui_state(self, frame):
+        """按截图帧尺寸和特征区域设置界面状态分类器，确认按钮颜色作为确认弹窗的规则"""
+        patches = {}
+        for name in UI_SIGNATURE_REGIONS:
+            region = self.selector.get_region(name)
+            if region is not None:
+                patches[name] = self.win_cap.frame_region(region)
+        self.ui_state.set_layout(frame.shape, patches)
+        verify_check = patches.get("verify_check")
+        if verify_check is not None:
+            self.ui_state.rules = [(CONFIRM, lambda f: self.verify_matcher.match(f, verify_check))]
+
+    # ---- 状态机接口（见 BuyStateMachine） ----
+
+    def wait_event(self, deadline: float, frames: bool) -> Optional[FrameEvent]:
+        """等到 deadline；frames 为 True 时有新帧即返回其界面状态。暂停、停止时提前返回 None"""
+        if self.is_paused:
+            while self.is_paused and self.is_running:
+                time.sleep(0.2)
+            return None
+        if not frames:
+            self.timer.wait_until(deadline)
+            # 每次定时唤醒记为一轮（截图 -> 识别 -> 决策 -> 点击），逐帧事件不单独计
+            self.tracer.begin()
+            return None
+        while self.is_running:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            item = self.win_cap.wait_frame(self._event_seq, timeout=remaining)
+            if item is None:
+                return None
+            self._event_seq, timestamp, frame = item
+            state, _ = self.ui_state.classify(frame)
+            return FrameEvent(timestamp, state, frame)
+        return None
+
+    def read_timer(self) -> Tuple[OcrResult, float]:
+        """识别 time 区域，返回 (结果, 所识别帧的截图时间戳)"""
+        result = self.ocr_region("time", self.regions["time"])
+        return result, self.read_timestamps.get("time", 0.0)
+
+    def read_money(self) -> str:
+        """识别三角币；时间同帧批量识别，结果留在缓存里"""
+        reads = self.ocr_regions([("money", self.regions["money"]), ("time", self.regions["time"])])
+        return extract_and_merge_digits(reads["money"].text)
+
+    def drain_transitions(self) -> List[Tuple[float, float]]:
+        return self.transition_monitor.drain()
+
+    def reset_transitions(self):
+        if self.transition_monitor is not None:
+            self.transition_monitor.reset()
+
+    def aim(self, name: str):
+        """提前把光标移到按钮上，到点击时刻只需按下"""
+        x, y = region_center(self.regions[name])
+        move_to(x, y)
+        self._aimed = name
+
+    def click(self, name: str):
+        if name == self._aimed:
+            # 光标已在按钮上：不再移动，也不做 pydirectinput.PAUSE 停顿，按下即返回
+            self._aimed = None
+            press_click()
+            return
+        self._aimed = None
+        if name == "blank":
+            direct_click(1, 1, interval=0.1)
+        elif name == "buy":
+            click_region_center(self.regions["buy"], interval=0)
+        elif name == "verify":
+            click_region_center(self.regions["verify"], interval=self.config['verify_interval'])
         else:
-            # 时间识别：使用自适应处理，不要用固定 150 阈值
-            gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-            # 使用自适应二值化 (Adaptive Thresholding) 应对光影变化
-            binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                           cv2.THRESH_BINARY, 11, 2)
-            # 只放大 1.5 倍，避免锯齿严重
-            upscaled = cv2.resize(binary, None, fx=1.5, fy=1.5, interpolation=cv2.INTER_CUBIC)
-            input_img = cv2.cvtColor(upscaled, cv2.COLOR_GRAY2BGR)
+            click_region_center(self.regions[name])
 
-        try:
-            result, _ = self.ocr(input_img)
-            if result:
-                full_text = "".join([line[1] for line in result])
-                return full_text
-        except:
-            pass
-        return ""
-    # 调用 RapidOCR
-        # try:
-        #     result, _ = self.ocr(roi)
-        #     if result and len(result) > 0:
-        #         # result 格式: [[box, text, score], ...]
-        #         return str(result[0][1])  # 返回识别到的第一个文本
-        # except Exception as e:
-        #     print(f"OCR 内部错误: {e}")
-        #
-        # return ""
+    def press(self, key: str):
+        pydirectinput.press(key)
+
+    def learn_ui(self, state: str, sample=None):
+        """记录已知状态的样本，sample 为 None 时使用当前帧"""
+        if not self.ui_state.ready:
+            return
+        if sample is None:
+            sample = self.win_cap.capture()
+        if sample is not None:
+            self.ui_state.learn(state, sample)
 
+    def ui_signature(self, frame):
+        return self.ui_state.signature(frame) if self.ui_state.ready else None
+
+    def show_timer(self, display: int):
+        """更新时间显示，只有当时间数字真正改变时才触发 UI 更新"""
+        current_min, current_sec = (str(v) for v in divmod(display, 60))
+        if current_min != self.last_ui_min or current_sec != self.last_ui_sec:
+            self.timer_updated.emit(current_min, current_sec)
+            self.last_ui_min = current_min
+            self.last_ui_sec = current_sec
+
+    def status(self, text: str):
+        self.status_updated.emit(text)
+
+    def mark(self, stage: str):
+        self.tracer.mark(stage)
 
     def run(self):
         """运行脚本"""
         try:
             self.status_updated.emit("初始化中...")
 
-            time_region = self.selector.get_region("time")
             # 初始化记录变量（放在 run 函数开始处）
             self.last_ui_min = ""
             self.last_ui_sec = ""
-            buy_region = self.selector.get_region("buy")
-            verify_region = self.selector.get_region("verify")
-            refresh_region = self.selector.get_region("refresh")
-            money_region = self.selector.get_region("money")
-
-            # money = self.ocr_region(money_region)
-            money = self.ocr_region("money", money_region)
-            money = extract_and_merge_digits(money)
+            self.regions = {name: self.selector.get_region(name)
+                            for name in ["time", "buy", "verify", "refresh", "money"]}
+
+            # 三角币和时间同帧批量识别，时间结果留在缓存里，第一轮监控不用再跑模型
+            money = self.read_money()
             self.status_updated.emit(f"初始三角币: {money}")
-            pattern = re.compile(r'(\d+)\s*分\s*(\d+)\s*秒')
 
-            # --- 增加：初始化时间校验变量 ---
-            last_total_seconds = 9999
-            # ---------------------------
+            frame = self.win_cap.capture()
+            if frame is not None:
+                self.setup_ui_state(frame)
+            # 秒数跳变检测在后台线程中处理截图流的每一帧
+            self.transition_monitor = TransitionMonitor(self.win_cap, self.regions["time"])
+            self.transition_monitor.start()
+            self._event_seq = self.win_cap.frame_seq
 
             self.status_updated.emit("监控中...")
-            refreshed = False  # 标记是否刚刚点击过刷新
-            click_region_center(refresh_region)
-            while self.is_running:
-                # 暂停时等待
-                while self.is_paused: time.sleep(0.2); continue
-
-                # 截图并OCR识别时间
-                res = self.ocr_region("time", time_region)
-                # print(f"DEBUG - 时间区域识别结果: '{res}'")
-                # if "天" in res or "小时" in res: click_region_center(refresh_region); continue
-                # match = pattern.search(res)
-                # if match:
-                #     minutes = int(match.group(1))
-                #     seconds = int(match.group(2))
-                #     # 更新时间显示
-                #     self.timer_updated.emit(str(minutes), str(seconds))
-
-
-                # --- 增强处理开始 ---
-                if not res:
-                    time.sleep(self.config['ocr_interval'])
-                    continue
-
-                # 预处理字符串：去掉空格，统一替换常见误识别字符
-                clean_res = res.replace(" ", "").replace("份", "分").replace("b", "6")
-
-                if "天" in clean_res or "小时" in clean_res:
-                    click_region_center(refresh_region)
-                    # 刷新后重置校验值，允许时间变大
-                    last_total_seconds = 9999
-                    refreshed = True
-                    continue
-
-                # 更加宽松的正则匹配：只提取数字，不强制要求中间有“分”或“秒”
-                # 原逻辑：match = pattern.search(res)
-                # 建议逻辑：直接尝试提取前两个连续数字序列
-                digits = re.findall(r'\d+', clean_res)
-
-                if len(digits) >= 2:
-                    minutes = int(digits[0])
-                    seconds = int(digits[1])
-                    # 过滤掉不合理的数值（比如识别到了其他地方的数字）
-                    if minutes > 60 or seconds > 60:
-                        continue
-                    # --- 增加：逻辑过滤校验 ---
-                    current_total_seconds = minutes * 60 + seconds
-
-                    # 如果当前时间比上次大，且不是刚刷新（且在1小时内），判定为误读
-                    if current_total_seconds > last_total_seconds and current_total_seconds < 3600:
-                        if not refreshed:
-                            # self.status_updated.emit(f"检测到时间跳变: {last_total_seconds} -> {current_total_seconds}，已忽略")
-                            continue
-                    # 校验通过，更新最后一次记录的时间
-                    last_total_seconds = current_total_seconds
-                    refreshed = False  # 已经成功识别一次，重置刷新状态
-                    # -------------------------
-
-                    # 更新时间显示
-                    current_min = str(minutes)
-                    current_sec = str(seconds)
-
-                    # 只有当时间数字真正改变时，才触发 UI 更新
-                    if current_min != self.last_ui_min or current_sec != self.last_ui_sec:
-                        self.timer_updated.emit(current_min, current_sec)
-                        self.last_ui_min = current_min
-                        self.last_ui_sec = current_sec
-                    # --- 增强处理结束 ---
-
-                    # 剩余时间到 0:03 时点击刷新（如果启用）
-                    if minutes == 0 and seconds == 3 and self.config['click_refresh_at_3s'] and not refreshed:
-                        self.status_updated.emit("🔄 点击刷新...")
-                        click_region_center(refresh_region)
-                        refreshed = True
-                    # 剩余时间到 0:01 时执行点击
-                    if minutes == 0 and seconds == 1:
-                        self.status_updated.emit("准备点击...")
-                        time.sleep(self.config['buy_click_delay'])
-                        # 点击购买按钮
-                        click_region_center(buy_region, interval=0)
-                        # 校验点击是否成功（可能造成延迟）
-                        buy_count = 0
-                        while not self.verify_window() and buy_count < 5:
-                            buy_count += 1
-                            if buy_count <= 2:
-                                time.sleep(self.config['buy_interval'])
-                                click_region_center(buy_region, interval=0)
-                        time.sleep(self.config['buy_to_verify_delay'])
-                        # 点击确认按钮
-                        click_region_center(verify_region, interval=self.config['verify_interval'])
-                        self.status_updated.emit("点击确认按钮...")
-                        # 校验点到了确认
-                        verify_counter = 0
-                        while self.verify_window():
-                            verify_counter += 1
-                            if verify_counter > 2:
-                                pydirectinput.click(1, 1, interval=0.1)
-                            click_region_center(verify_region, interval=self.config['verify_interval'])
-
-                        self.status_updated.emit("等待刷新...")
-                        time.sleep(1.5)
-                        if self.verify_window(): pydirectinput.press('esc')
-                        click_region_center(refresh_region)
-                        # 成功抢购或结束后，重置校验
-                        last_total_seconds = 9999
-                        # 检查三角币是否变化
-                        now_money = self.ocr_region(money_region)
-                        now_money = extract_and_merge_digits(now_money)
-                        self.status_updated.emit(f"当前三角币: {now_money}")
-                        self.config['continue_after_complete'] &= (now_money == money)
-                        # 根据配置决定是否继续
-                        if not self.config['continue_after_complete']:
-                            self.status_updated.emit("任务完成！")
-                            self.task_completed.emit()
-                            break
-                        else:
-                            refreshed = False
-                            self.status_updated.emit("继续监控中...")
-                    else:
-                        if minutes > 0 or seconds > 5:
-                            time.sleep(self.config['ocr_interval'])
-                else:
-                    time.sleep(self.config['ocr_interval'])
+            click_region_center(self.regions["refresh"])
+            # 各状态自己决定唤醒时刻和是否需要逐帧事件，状态机在两次唤醒之间阻塞等待
+            self.fsm.start(money)
+            self.fsm.run(lambda: self.is_running)
+            if self.fsm.state == DONE:
+                self.task_completed.emit()
         except Exception as e:
             self.status_updated.emit(f"错误: {str(e)}")
             print(f"脚本运行错误: {e}")
+        finally:
+            if self.transition_monitor is not None:
+                self.transition_monitor.stop()
+            self.tracer.end()
 
     def pause(self):
         self.is_paused = True
@@ -392,16 +586,15 @@ class ScriptThread(QThread):
         self.is_running = False
 
 
-def main():
-    """主函数"""
-    app = QApplication(sys.argv)
-    selector = RegionSelector()
-    # selector.load_regions_from_file("regions_2k.json")
-    selector.load_regions_from_file("regions_config.json")
-    win_cap = WindowCapture(max_buffer_len=2)
+def create_ocr(region_sizes: Optional[Dict[str, Tuple[int, int]]] = None):
+    """初始化 OCR，按 ocr_profile.json 调优会话并用各区域尺寸预热
 
-    # 初始化 OCR
+    Args:
+        region_sizes: 区域名 -> (宽, 高)，预热时按实际尺寸生成空白输入
 
+    Returns:
+        (ocr, 预热摘要)
+    """
     ocr = RapidOCR(
         # use_doc_orientation_classify=False,
         # use_doc_unwarping=False,
@@ -413,32 +606,80 @@ def main():
         det_score_mode='fast',  # 快速模式
         binarize=True  # 内部开启二值化
     )
+    return ocr, tune_ocr(ocr, region_sizes)
+
+
+def region_sizes(selector, names) -> Dict[str, Tuple[int, int]]:
+    """区域名 -> (宽, 高)"""
+    sizes = {}
+    for name in names:
+        region = selector.get_region(name)
+        if region:
+            sizes[name] = (region[2] - region[0], region[3] - region[1])
+    return sizes
 
+
+def create_monitor(app, selector, win_cap: WindowCapture, ocr, name: str = "", index: int = 0,
+                   ocr_service: Optional[OcrService] = None):
+    """创建一个监控窗口并绑定脚本线程
+
+    Args:
+        app: QApplication
+        selector: 区域配置（RegionSelector 或 RegionSet）
+        win_cap: 该实例使用的截图流
+        ocr: OCR 引擎（或多实例共享的 OCR 句柄）
+        name: 实例名称，多实例时用于区分窗口和输出文件
+        index: 窗口序号，多实例时窗口依次向右排列
+        ocr_service: 可选，OCR 进程池
+
+    Returns:
+        (window, cleanup) cleanup 在程序退出时调用
+    """
     window = MonitorWindow()
+    if name:
+        window.setWindowTitle(f"Delta Force 脚本监控 - {name}")
     window.show()
     # 移动到屏幕右下角
     screen = app.primaryScreen().geometry()
     win_h = window.height()
-    x = screen.x() + 10
+    x = screen.x() + 10 + index * (window.width() + 10)
     y = screen.y() + screen.height() - win_h - 30
     window.move(x, y)
     window.add_log("程序已启动")
     window.add_log("点击 [开始] 按钮启动监控")
     script_thread = None
+    # 本实例自己的录制（同屏实例共用截图流，各自录制、各自停止）
+    recorder = None
+    prefix = f"{name}_" if name else ""
+    # 识别结果缓存跨多次开始/停止保留，退出时写盘，下次启动直接加载
+    ocr_cache = OcrResultCache(filepath=prefix + "ocr_cache.json")
+    digit_recognizer = TemplateDigitRecognizer(filepath=prefix + "digit_templates.npz")
+    ui_state = UiStateClassifier(filepath=prefix + "ui_states.npz")
 
     def on_start():
-        nonlocal script_thread
+        nonlocal script_thread, recorder
         window.add_log("正在启动监控线程...")
 
         # 获取当前配置
         config = window.get_config()
         window.add_log(f"配置: 购买延迟={config['buy_click_delay']}秒")
 
-        script_thread = ScriptThread(selector, win_cap, ocr, config)
+        if config['record_session']:
+            # 只录制用到的区域，每帧几十 KB，60000 帧约 2 分钟 (500fps)
+            path = prefix + time.strftime("session_%Y%m%d_%H%M%S.dfrec")
+            # 多实例时裁剪计划中的区域名带有 "实例名/" 前缀
+            names = [f"{name}/{n}" if name else n for n in ["time", "money", "verify_check"]]
+            recorder = win_cap.start_recording(path, capacity=60000, names=names)
+            window.add_log(f"录制到: {path}")
+
+        script_thread = ScriptThread(selector, win_cap, ocr, config, ocr_cache, digit_recognizer,
+                                     ocr_service, ui_state)
 
         script_thread.status_updated.connect(lambda s: window.update_status(s))
         script_thread.status_updated.connect(lambda s: window.add_log(s))
         script_thread.timer_updated.connect(lambda m, s: window.update_timer(m, s))
+        script_thread.perf_updated.connect(lambda k, v: window.update_perf(k, v))
+        script_thread.ocr_updated.connect(lambda t, c, e: window.update_ocr(t, c, e))
         script_thread.task_completed.connect(lambda: window.on_complete())
 
         script_thread.start()
@@ -451,10 +692,22 @@ def main():
         if script_thread:
             script_thread.resume()
 
+    def export_trace():
+        if script_thread:
+            script_thread.tracer.export_chrome_trace(prefix + time.strftime("trace_%Y%m%d_%H%M%S.json"))
+
     def on_stop():
+        nonlocal recorder
         if script_thread:
             script_thread.stop()
             script_thread.wait()
+            export_trace()
+            ocr_cache.save()
+            digit_recognizer.save()
+            ui_state.save()
+        if recorder is not None:
+            win_cap.stop_recording(recorder)
+            recorder = None
 
     window.controller.start_requested.connect(on_start)
     window.controller.pause_requested.connect(on_pause)
@@ -465,7 +718,77 @@ def main():
         if script_thread and script_thread.isRunning():
             script_thread.stop()
             script_thread.wait()
+            export_trace()
+        ocr_cache.save()
+        digit_recognizer.save()
+        ui_state.save()
+
+    return window, cleanup
+
+
+def main(ocr_workers: int = 0):
+    """主函数
+
+    Args:
+        ocr_workers: OCR 工作进程数，0 表示在脚本线程内直接推理
+    """
+    app = QApplication(sys.argv)
+    selector = RegionSelector()
+    # selector.load_regions_from_file("regions_2k.json")
+    selector.load_regions_from_file("regions_config.json")
+    # 只截取需要读取像素的区域，减少每帧拷贝
+    crop_plan = CropPlan.from_selector(selector, ["time", "money", "verify_check"])
+    win_cap = WindowCapture(max_buffer_len=2, crop_plan=crop_plan)
+
+    # 预热完成后才创建窗口，点击开始后的第一次读取已经是稳定延迟
+    ocr, warmup_message = create_ocr(region_sizes(selector, ["time", "money"]))
+    ring, ocr_service = None, None
+    if ocr_workers > 0:
+        # 截图帧写入共享内存，OCR 工作进程按帧序号直接裁剪，不经过 pickle
+        width, height = crop_plan.size
+        # 槽位数覆盖排队 + 推理期间的帧（500fps 下约 64ms），取图前被覆盖的请求会用新帧重新提交
+        ring = SharedFrameRing.create((height, width, 3), slots=32, region=crop_plan.bounds)
+        win_cap.set_frame_ring(ring)
+        ocr_service = OcrService(ocr_workers, ring_name=ring.name)
+    window, cleanup_monitor = create_monitor(app, selector, win_cap, ocr, ocr_service=ocr_service)
+    window.add_log(warmup_message)
+
+    def cleanup():
+        cleanup_monitor()
+        if ocr_service is not None:
+            ocr_service.shutdown()
         win_cap.stop()
+        if ring is not None:
+            win_cap.set_frame_ring(None)
+            ring.close()
+
+    app.aboutToQuit.connect(cleanup)
+
+    sys.exit(app.exec())
+
+
+def main_multi(instances_file: str):
+    """多实例主函数：每个实例一个监控窗口，同屏实例共用截图流，所有实例共用一个 OCR 模型"""
+    app = QApplication(sys.argv)
+    # 先读实例配置，按第一个实例的区域尺寸创建并预热共用模型，再用它创建管理器
+    configs = read_instance_configs(instances_file)
+    first = configs[0]["regions"] if configs else None
+    ocr, warmup_message = create_ocr(region_sizes(first, ["time", "money"]) if first else None)
+    manager = CaptureManager(ocr)
+    manager.add_instances(configs)
+    manager.start(["time", "money", "verify_check"])
+
+    monitors = []
+    for index, instance in enumerate(manager.instances.values()):
+        window, cleanup_monitor = create_monitor(app, instance.selector, instance.win_cap, instance.ocr,
+                                                 instance.name, index)
+        window.add_log(warmup_message)
+        monitors.append((window, cleanup_monitor))
+
+    def cleanup():
+        for _, cleanup_monitor in monitors:
+            cleanup_monitor()
+        manager.stop()
 
     app.aboutToQuit.connect(cleanup)
 
@@ -479,4 +802,11 @@ if __name__ == "__main__":
         run_as_admin()
     else:
         print("Delta Force 自动购买脚本 - PyQt6 GUI版本 (管理员模式)")
-        main()
+        # python main_gui_amd.py --instances instances.json 启动多实例
+        # python main_gui_amd.py --workers 2 使用 2 个 OCR 工作进程
+        if len(sys.argv) > 2 and sys.argv[1] == "--instances":
+            main_multi(sys.argv[2])
+        elif len(sys.argv) > 2 and sys.argv[1] == "--workers":
+            main(int(sys.argv[2]))
+        else:
+            main()
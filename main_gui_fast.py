@@ -19,11 +19,16 @@ import re
 import time
 import ctypes
 import cv2
+from typing import List, Optional
 
 import bettercam
 from window_capture import *
 from region_selector import RegionSelector
 from gui_monitor import MonitorWindow
+from latency_trace import LatencyTracer
+from color_match import ColorMatcher
+from pixel_triggers import PixelTrigger, PixelTriggerEngine, load_triggers
+from precise_timer import default_timer, precise_sleep
 
 import numpy
 from rapidocr_onnxruntime import RapidOCR
@@ -112,7 +117,8 @@ def win32_hardware_click(x, y):
     # 按下
     ctypes.windll.user32.mouse_event(MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_LEFTDOWN, nx, ny, 0, 0)
     # 这里的微小延迟（约10ms）非常重要，防止点击太快被引擎过滤
-    time.sleep(0.01)
+    # time.sleep 可能多睡几毫秒，用睡眠 + 自旋精确等待
+    precise_sleep(0.01)
     # 弹起
     ctypes.windll.user32.mouse_event(MOUSEEVENTF_ABSOLUTE | MOUSEEVENTF_LEFTUP, nx, ny, 0, 0)
 
@@ -151,16 +157,32 @@ def extract_and_merge_digits(s: str) -> str:
     return ''.join(re.findall(r'\d', s))
 
 
+# 确认按钮颜色 (BGR)，与之色差小说明确认弹窗已显示
+VERIFY_BUTTON_BGR = (65, 109, 175)
+# 像素触发器，可在 triggers.json 中覆盖：区域、探针图案、目标颜色 (BGR)、CIEDE2000 容差、去抖帧数
+TRIGGERS_FILE = "triggers.json"
+DEFAULT_TRIGGERS = [
+    # 购买按钮变为可点击
+    {"name": "buy_ready", "region": "buy", "pattern": "grid3", "target_bgr": [32, 29, 20],
+     "tolerance": 15, "debounce": 1},
+    # 确认弹窗的按钮出现
+    {"name": "confirm_ready", "region": "verify", "pattern": "grid3", "target_bgr": [32, 29, 20],
+     "tolerance": 18, "debounce": 1},
+]
+
+
 class ScriptThread(QThread):
     """脚本运行线程"""
 
     status_updated = pyqtSignal(str)
     timer_updated = pyqtSignal(str, str)
     ocr_updated = pyqtSignal(str, float)
+    perf_updated = pyqtSignal(str, str)
     click_performed = pyqtSignal()
     task_completed = pyqtSignal()
 
-    def __init__(self, selector: RegionSelector, win_cap: WindowCapture, ocr, config):
+    def __init__(self, selector: RegionSelector, win_cap: WindowCapture, ocr, config,
+                 triggers: Optional[List[PixelTrigger]] = None):
         super().__init__()
         self.selector = selector
         self.win_cap = win_cap
@@ -168,12 +190,29 @@ class ScriptThread(QThread):
         self.config = config
         self.is_running = True
         self.is_paused = False
+        self.triggers = triggers or [PixelTrigger.from_dict(data) for data in DEFAULT_TRIGGERS]
+        self.trigger_engine: Optional[PixelTriggerEngine] = None
+        # 确认弹窗检测（多探针颜色匹配）
+        self.verify_matcher = ColorMatcher([VERIFY_BUTTON_BGR], max_delta_e=16)
+        # 截图 -> 点击各阶段延迟
+        self.tracer = LatencyTracer()
+        self._last_perf_report = 0.0
         # --- 新增：寻找窗口句柄 ---
         # 请确保窗口标题正确，例如 "Delta Force" 或 "三角洲行动"
         self.hwnd = win32gui.FindWindow(None, "三角洲行动  ")
         if not self.hwnd:
             print("警告：未找到游戏窗口句柄！")
 
+    def report_perf_stats(self):
+        """每秒向监控窗口上报一次各阶段延迟"""
+        now = time.perf_counter()
+        if now - self._last_perf_report >= 1.0:
+            self._last_perf_report = now
+            self.perf_updated.emit("延迟 p50/p95/p99", self.tracer.summary())
+            if self.trigger_engine is not None:
+                self.perf_updated.emit("像素触发器", self.trigger_engine.summary())
+            self.perf_updated.emit("精确等待", default_timer().summary())
+
     def frame_cut(self, frame, region):
         """裁剪图像区域"""
         left, top, right, bottom = region
@@ -205,35 +244,18 @@ class ScriptThread(QThread):
     #     return False
 
     def verify_window(self) -> bool:
-        """检查确认按钮区域的颜色是否变化 (优化版，不使用 colormath)"""
+        """检查确认按钮区域的颜色是否变化（多探针 CIEDE2000，查表实现）"""
         frame = self.win_cap.capture()
         if frame is None or frame.size == 0:
             return False
 
         region = self.selector.get_region("verify_check")
-        # 确保坐标合法
-        l, t, r, b = region
+        # 确保坐标合法（换算到截图帧内坐标）
+        l, t, r, b = self.win_cap.frame_region(region)
         if r <= l or b <= t: return False
 
-        # 获取区域中心点的颜色 (BGR)
-        center_x, center_y = (l + r) // 2, (t + b) // 2
-        # 注意：OpenCV 坐标是 [y, x]
-        color_bgr = frame[center_y, center_x]
-
-        # 预设的确认按钮目标颜色 (这里根据你的日志 175, 109, 65 调整)
-        # 假设目标 BGR 是 [65, 109, 175]
-        target_bgr = numpy.array([65, 109, 175])
-        current_bgr = numpy.array(color_bgr)
-
-        # 计算欧氏距离 (取代 delta_e)
-        distance = numpy.linalg.norm(current_bgr - target_bgr)
-
-        # self.status_updated.emit(f"颜色距离: {distance:.2f}") # 调试用
-
-        # 距离越小颜色越接近，通常距离小于 30 就认为匹配成功
-        if distance < 50:
-            return True
-        return False
+        # 区域内 3x3 个探针与确认按钮颜色的色差，多数探针接近即认为弹窗已显示
+        return self.verify_matcher.match(frame, (l, t, r, b))
 
     # def ocr_region(self, region):
     #     """OCR 识别"""
@@ -252,8 +274,8 @@ class ScriptThread(QThread):
         if frame is None or frame.size == 0:
             return ""
 
-        # 确保裁剪区域合法
-        left, top, right, bottom = region
+        # 确保裁剪区域合法（换算到截图帧内坐标）
+        left, top, right, bottom = self.win_cap.frame_region(region)
         if right <= left or bottom <= top:
             return ""
 
@@ -304,11 +326,14 @@ class ScriptThread(QThread):
             refresh_region = self.selector.get_region("refresh")
             l3, t3, r3, b3 = refresh_region
             cx3, cy3 = (l3 + r3) // 2, (t3 + b3) // 2
-            target_bgr = numpy.array([32, 29, 20])
+            # 全部触发器编译为一组探针，每帧一次取像素、一次查表
+            triggers = self.trigger_engine = PixelTriggerEngine(self.triggers, self.selector, self.win_cap)
             # 初始化上一次执行的时间
             last_execution_time = time.time()
             # 设定间隔时间（秒），5分钟 = 300秒
             interval = 300
+            # 已处理过的帧序号，wait_frame 只在有新帧时返回
+            seq = -1
             while self.is_running:
                 if self.is_paused:
                     time.sleep(0.1)
@@ -322,55 +347,67 @@ class ScriptThread(QThread):
                     self.status_updated.emit("五分钟固定刷新！")
                     # 更新上一次执行的时间戳
                     last_execution_time = current_time
-                frame = self.win_cap.capture()
-                if frame is None: continue
+                # 阻塞到下一帧到达（超时用于及时响应暂停/停止）
+                item = self.win_cap.wait_frame(seq, timeout=0.1)
+                if item is None: continue
+                seq, frame_ts, frame = item
+                # capture 阶段 = 帧时间戳到线程被唤醒
+                self.tracer.begin(frame_ts)
+                self.tracer.mark("capture")
 
                 # 获取购买按钮中心
                 l, t, r, b = buy_region
                 cx, cy = (l + r) // 2, (t + b) // 2
-                current_bgr = frame[cy, cx]
 
-                # 颜色匹配判断
-                if numpy.linalg.norm(current_bgr - target_bgr) < 30:
+                # 颜色匹配判断：购买按钮变为可点击的那一帧（上升沿）触发
+                events = triggers.update(frame, frame_ts, seq)
+                self.tracer.mark("decision")
+                self.report_perf_stats()
+                if any(event.name == "buy_ready" and event.active for event in events):
                     # --- 执行硬件级点击 ---
                     win32_hardware_click(cx, cy)
+                    self.tracer.mark("click")
                     self.status_updated.emit("触发购买！")
 
                     # --- 快速检测确认弹窗 ---
                     start_v = time.time()
                     while time.time() - start_v < 2.0:
-                        frame = self.win_cap.capture()
-                        if frame is None: continue
+                        item = self.win_cap.wait_frame(seq, timeout=0.1)
+                        if item is None: continue
+                        seq, frame_ts, frame = item
+                        triggers.update(frame, frame_ts, seq)
 
                         # 检测确认区域
                         # l2, t2, r2, b2 = verify_check
                         l2, t2, r2, b2 = verify_region
                         cx2, cy2 = (l2 + r2) // 2, (t2 + b2) // 2
 
-                        if numpy.linalg.norm(frame[cy2, cx2] - target_bgr) < 50:
+                        if triggers.active("confirm_ready"):
                             # 再次执行硬件级点击
                             win32_hardware_click(cx2, cy2)
-                            time.sleep(0.25)
+                            precise_sleep(0.25)
                             win32_hardware_click(cx2, cy2)
-                            time.sleep(0.1)
+                            precise_sleep(0.1)
                             win32_hardware_click(cx2, cy2)
-                            time.sleep(0.1)
+                            precise_sleep(0.1)
                             win32_hardware_click(cx2, cy2)
-                            time.sleep(0.1)
+                            precise_sleep(0.1)
                             win32_hardware_click(cx2, cy2)
-                            time.sleep(0.1)
+                            precise_sleep(0.1)
                             win32_hardware_click(cx2, cy2)
                             win32_hardware_click(cx2, cy2)
-                            time.sleep(0.2)
+                            precise_sleep(0.2)
                             win32_hardware_click(cx2, cy2)
                             self.status_updated.emit("确认成功")
-                            time.sleep(1.0)
+                            precise_sleep(1.0)
                             win32_hardware_click(cx3, cy3)
-
-                time.sleep(0.001)
+                    # 确认窗口结束后重新判断：购买按钮仍可点击时，下一帧会再次产生上升沿
+                    triggers.reset()
 
         except Exception as e:
             self.status_updated.emit(f"错误: {str(e)}")
+        finally:
+            self.tracer.end()
 
     def pause(self):
         self.is_paused = True
@@ -388,7 +425,11 @@ def main():
     selector = RegionSelector()
     # selector.load_regions_from_file("regions_2k.json")
     selector.load_regions_from_file("regions_config.json")
-    win_cap = WindowCapture(max_buffer_len=2)
+    triggers = load_triggers(TRIGGERS_FILE, DEFAULT_TRIGGERS)
+    # 只截取像素触发用到的区域，减少每帧拷贝
+    trigger_regions = list(dict.fromkeys([trigger.region for trigger in triggers] + ["verify_check"]))
+    crop_plan = CropPlan.from_selector(selector, trigger_regions)
+    win_cap = WindowCapture(max_buffer_len=2, crop_plan=crop_plan)
 
     # 初始化 OCR
 
@@ -424,11 +465,18 @@ def main():
         config = window.get_config()
         window.add_log(f"配置: 购买延迟={config['buy_click_delay']}秒")
 
-        script_thread = ScriptThread(selector, win_cap, ocr, config)
+        if config['record_session']:
+            # 只录制用到的区域，每帧约 200 KB，10000 帧约 2 GB
+            path = time.strftime("session_%Y%m%d_%H%M%S.dfrec")
+            win_cap.start_recording(path, capacity=10000, names=trigger_regions)
+            window.add_log(f"录制到: {path}")
+
+        script_thread = ScriptThread(selector, win_cap, ocr, config, triggers)
 
         script_thread.status_updated.connect(lambda s: window.update_status(s))
         script_thread.status_updated.connect(lambda s: window.add_log(s))
         script_thread.timer_updated.connect(lambda m, s: window.update_timer(m, s))
+        script_thread.perf_updated.connect(lambda k, v: window.update_perf(k, v))
         script_thread.task_completed.connect(lambda: window.on_complete())
 
         script_thread.start()
@@ -441,10 +489,16 @@ def main():
         if script_thread:
             script_thread.resume()
 
+    def export_trace():
+        if script_thread:
+            script_thread.tracer.export_chrome_trace(time.strftime("trace_%Y%m%d_%H%M%S.json"))
+
     def on_stop():
         if script_thread:
             script_thread.stop()
             script_thread.wait()
+            export_trace()
+            win_cap.stop_recording()
 
     window.controller.start_requested.connect(on_start)
     window.controller.pause_requested.connect(on_pause)
@@ -455,6 +509,7 @@ def main():
         if script_thread and script_thread.isRunning():
             script_thread.stop()
             script_thread.wait()
+            export_trace()
         win_cap.stop()
 
     app.aboutToQuit.connect(cleanup)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: OCR 基准测试 - 在录制的 time/money 区域上对比 检测+识别 与 仅识别 的延迟和结果
+
+import glob
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from frame_recorder import FrameRecording
+from latency_trace import LatencyHistogram
+from ocr_engine import RecOnlyEngine, preprocess
+
+# 各区域识别结果应满足的格式，用于在没有人工标注时估计准确率
+EXPECTED = {
+    "time": re.compile(r'^\d+分\d+秒$'),
+    "money": re.compile(r'^[\d,.]+$'),
+}
+
+
+def load_samples(source: str, limit: int = 200) -> Dict[str, List[np.ndarray]]:
+    """加载区域样本
+
+    Args:
+        source: .dfrec 录制文件（取 time/money 字段，多实例录制取 "实例名/time" 等），
+                或目录（文件名以区域名开头，例如 time_0001.png）
+        limit: 每个区域最多取的样本数（录制文件中等间隔抽取）
+
+    Returns:
+        区域名 -> 图像列表
+    """
+    samples: Dict[str, List[np.ndarray]] = {}
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "*.png"))):
+            name = os.path.basename(path).split("_")[0]
+            if name in EXPECTED:
+                samples.setdefault(name, []).append(cv2.imread(path))
+        return {name: imgs[:limit] for name, imgs in samples.items()}
+
+    recording = FrameRecording(source)
+    for field, _ in recording.fields:
+        name = field.split("/")[-1]
+        if name not in EXPECTED:
+            continue
+        data = recording[field]
+        indices = np.linspace(0, len(data) - 1, min(limit, len(data))).astype(int)
+        samples.setdefault(name, []).extend(np.ascontiguousarray(data[i]) for i in indices)
+    return samples
+
+
+def run_benchmark(ocr, samples: Dict[str, List[np.ndarray]], warmup: int = 3):
+    """逐区域对比两种模式并打印结果"""
+    engine = RecOnlyEngine(ocr)
+    for name, rois in samples.items():
+        images = [preprocess(name, roi) for roi in rois]
+        for img in images[:warmup]:
+            ocr(img)
+            engine.recognize(name, img)
+
+        full_hist, rec_hist = LatencyHistogram(), LatencyHistogram()
+        full_texts, rec_texts = [], []
+        for img in images:
+            start = time.perf_counter()
+            result, _ = ocr(img)
+            full_hist.record(time.perf_counter() - start)
+            full_texts.append("".join(line[1] for line in result) if result else "")
+
+            start = time.perf_counter()
+            text = engine.recognize(name, img).text
+            rec_hist.record(time.perf_counter() - start)
+            rec_texts.append(text)
+
+        pattern = EXPECTED[name]
+        total = len(images)
+        agree = sum(a == b for a, b in zip(full_texts, rec_texts))
+        print(f"\n[{name}] {total} 个样本")
+        for label, hist, texts in (("检测+识别", full_hist, full_texts), ("仅识别", rec_hist, rec_texts)):
+            valid = sum(bool(pattern.match(t.replace(" ", ""))) for t in texts)
+            print(f"  {label:<6} p50 {hist.percentile(50) * 1000:7.2f}ms  p95 {hist.percentile(95) * 1000:7.2f}ms"
+                  f"  平均 {hist.mean * 1000:7.2f}ms  格式正确 {valid}/{total}")
+        print(f"  两种模式结果一致: {agree}/{total}")
+        for a, b in [(a, b) for a, b in zip(full_texts, rec_texts) if a != b][:5]:
+            print(f"    '{a}' vs '{b}'")
+
+
+def run_batch_benchmark(ocr, samples: Dict[str, List[np.ndarray]], max_regions: int = 6):
+    """批量识别：区域数从 1 增加到 max_regions 时单次调用的耗时
+
+    不足的区域数用已有样本循环补齐，对比逐个调用的总耗时。
+    """
+    engine = RecOnlyEngine(ocr)
+    pool = [(name, preprocess(name, roi)) for name, rois in samples.items() for roi in rois[:max_regions]]
+    if not pool:
+        return
+    items = [pool[i % len(pool)] for i in range(max_regions)]
+    engine.recognize_many(items)
+    print("\n[批量识别] 区域数  逐个调用  一次批量")
+    for count in range(1, max_regions + 1):
+        batch = items[:count]
+        single, batched = LatencyHistogram(), LatencyHistogram()
+        for _ in range(20):
+            start = time.perf_counter()
+            for item in batch:
+                engine.recognize(*item)
+            single.record(time.perf_counter() - start)
+            start = time.perf_counter()
+            engine.recognize_many(batch)
+            batched.record(time.perf_counter() - start)
+        print(f"  {count:>6}  {single.percentile(50) * 1000:7.2f}ms  {batched.percentile(50) * 1000:7.2f}ms")
+
+
+if __name__ == "__main__":
+    # python ocr_benchmark.py session_xxx.dfrec [每区域样本数]
+    if len(sys.argv) < 2:
+        print("用法: python ocr_benchmark.py <录制文件.dfrec | 图片目录> [每区域样本数]")
+        sys.exit(1)
+    from rapidocr_onnxruntime import RapidOCR
+
+    samples = load_samples(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 200)
+    ocr = RapidOCR(det_score_mode='fast', binarize=True)
+    run_benchmark(ocr, samples)
+    run_batch_benchmark(ocr, samples)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: OCR 结果 LRU 缓存 - 以预处理后 ROI 的感知哈希为键，可持久化到磁盘
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class OcrResultCache:
+    """OCR 结果缓存
+
+    倒计时的字形 ("0分5秒"、"0分4秒"...) 每一轮都会重复出现。把预处理后的 ROI
+    转为灰度、缩小到固定尺寸再按 128 二值化、按位打包作为键（均值哈希），对轻微噪声不敏感。
+    exact_regions 中的区域（默认 money）改用 ROI 字节的精确摘要：余额购买前后只差几个字形，
+    均值哈希可能相同，命中旧余额会让状态机误判购买未成功。
+    超过 max_entries 时淘汰最久未使用的条目；save() 写入 JSON，下次启动 load() 后
+    大多数读数无需模型推理。
+    """
+
+    VERSION = 2
+
+    def __init__(self, max_entries: int = 4096, filepath: Optional[str] = None,
+                 hash_size: Tuple[int, int] = (64, 16), exact_regions: Iterable[str] = ("money",)):
+        """初始化缓存
+
+        Args:
+            max_entries: 最多缓存的条目数
+            filepath: 持久化文件路径，None 表示只在内存中缓存
+            hash_size: 哈希缩略图尺寸 (width, height)
+            exact_regions: 按 ROI 字节精确匹配的区域名
+        """
+        self.max_entries = max_entries
+        self.filepath = filepath
+        self.hash_size = tuple(hash_size)
+        self.exact_regions = frozenset(exact_regions)
+        self.entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if filepath and os.path.exists(filepath):
+            self.load()
+
+    def key(self, name: str, img: np.ndarray) -> str:
+        """区域名 + 感知哈希（exact_regions 中的区域为形状 + 字节摘要）"""
+        if name in self.exact_regions:
+            digest = hashlib.blake2b(np.ascontiguousarray(img).tobytes(), digest_size=16)
+            digest.update(str(img.shape).encode())
+            return f"{name}#{digest.hexdigest()}"
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        thumb = cv2.resize(img, self.hash_size, interpolation=cv2.INTER_AREA)
+        bits = np.packbits(thumb >= 128)
+        return f"{name}:{bits.tobytes().hex()}"
+
+    def get(self, name: str, img: np.ndarray) -> Optional[str]:
+        """查询缓存，命中时返回文本"""
+        key = self.key(name, img)
+        text = self.entries.get(key)
+        if text is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, name: str, img: np.ndarray, text: str):
+        """写入识别结果（空文本不缓存）"""
+        if not text:
+            return
+        key = self.key(name, img)
+        self.entries[key] = text
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return f"{self.hit_rate:.0%}({self.hits}/{self.hits + self.misses}) 条目{len(self.entries)}"
+
+    def load(self):
+        """从磁盘加载，哈希参数不一致时忽略旧文件"""
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"OCR 缓存加载失败: {e}")
+            return
+        if data.get("version") != self.VERSION or tuple(data.get("hash_size", ())) != self.hash_size:
+            print("OCR 缓存格式已变化，忽略旧缓存")
+            return
+        self.entries = OrderedDict((k, v) for k, v in data["entries"][-self.max_entries:])
+        print(f"✓ 已加载 {len(self.entries)} 条 OCR 缓存")
+
+    def save(self):
+        """按 LRU 顺序写入磁盘"""
+        if not self.filepath:
+            return
+        data = {
+            "version": self.VERSION,
+            "hash_size": list(self.hash_size),
+            "entries": list(self.entries.items()),
+        }
+        tmp = self.filepath + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.filepath)
+
+
+if __name__ == "__main__":
+    # 自检：money 区域余额只差一个字形时不能命中旧结果；time 区域按灰度哈希（文字只在绿色、红色通道也能区分）
+    def render(text: str) -> np.ndarray:
+        img = np.full((27, 160, 3), 25, dtype=np.uint8)
+        cv2.putText(img, text, (8, 21), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (235, 235, 235), 2)
+        return img
+
+    cache = OcrResultCache()
+    cache.put("money", render("1286500"), "1286500")
+    assert cache.get("money", render("1286500")) == "1286500"
+    assert cache.get("money", render("1236500")) is None
+    cache.put("time", render("0:05"), "0分5秒")
+    assert cache.get("time", render("0:05")) == "0分5秒"
+    green = np.zeros((27, 160, 3), dtype=np.uint8)
+    green[:, 80:, 1] = 255
+    assert cache.key("time", green) != cache.key("time", np.zeros_like(green))
+    print(cache.summary())
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 固定区域 OCR - 区域预处理与跳过文字检测的仅识别模式
+
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# PP-OCR 识别模型的输入高度
+REC_HEIGHT = 48
+
+
+class TopKLattice(NamedTuple):
+    """识别网络每个时间步概率最高的 k 个字符（CTC 输出，"blank" 为空白）"""
+    chars: List[List[str]]  # [时间步][名次] -> 字符
+    probs: np.ndarray  # (时间步, k) 对应的概率，每行降序
+
+
+class OcrResult(NamedTuple):
+    """一次区域识别的结果"""
+    text: str
+    confidence: float  # 各文本行置信度的最小值，缓存/模板命中为 1.0，失败为 0.0
+    elapsed: float  # 推理耗时（秒），批量识别时为整批耗时，未经模型为 0.0
+    lattice: Optional[TopKLattice] = None  # 仅识别模式下请求了 top-k 时提供
+
+
+def result_from_lines(result, elapsed: float) -> OcrResult:
+    """把 RapidOCR 的 [[box, text, score], ...] 合并为一个 OcrResult"""
+    if not result:
+        return OcrResult("", 0.0, elapsed)
+    text = "".join([line[1] for line in result])
+    return OcrResult(text, min(float(line[2]) for line in result), elapsed)
+
+
+def preprocess(region_name: str, roi: np.ndarray) -> np.ndarray:
+    """按区域类型预处理，得到送入 OCR 的图像
+
+    Args:
+        region_name: 区域名称
+        roi: 截图中的区域 (BGR)
+
+    Returns:
+        BGR 图像
+    """
+    if region_name == "money":
+        # 三角币识别：直接识别，不处理
+        return roi
+    # 时间识别：使用自适应二值化应对光影变化，不要用固定 150 阈值
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                   cv2.THRESH_BINARY, 11, 2)
+    # 只放大 1.5 倍，避免锯齿严重
+    upscaled = cv2.resize(binary, None, fx=1.5, fy=1.5, interpolation=cv2.INTER_CUBIC)
+    return cv2.cvtColor(upscaled, cv2.COLOR_GRAY2BGR)
+
+
+class PreprocessPlan:
+    """单个区域的预处理计划，按区域尺寸构建一次
+
+    与 preprocess() 结果一致，但灰度/二值/放大（以及可选的三通道）图像都写进预先分配的
+    缓冲（OpenCV 的 dst 参数），每次调用不再分配新数组。返回值就是内部缓冲，下一次调用
+    会覆盖它，需要保留时由调用方拷贝。
+
+    RapidOCR 和 RecOnlyEngine 都接受单通道输入（前者内部转换，后者在缩放到识别高度
+    之后再扩展成三通道，像素更少），默认不做 GRAY2BGR。
+    """
+
+    UPSCALE = 1.5
+
+    def __init__(self, region_name: str, roi_shape: Tuple[int, ...], bgr_output: bool = False):
+        """构建预处理计划
+
+        Args:
+            region_name: 区域名称（money 原样返回，其余按时间区域处理）
+            roi_shape: 区域图像形状 (height, width[, channels])
+            bgr_output: 是否输出三通道图像（供只接受 BGR 输入的引擎使用）
+        """
+        self.region_name = region_name
+        self.shape = tuple(roi_shape[:2])
+        self.passthrough = region_name == "money"
+        if self.passthrough:
+            return
+        height, width = self.shape
+        # 与 cv2.resize(fx=1.5, fy=1.5) 计算输出尺寸的方式一致
+        self.dsize = (int(round(width * self.UPSCALE)), int(round(height * self.UPSCALE)))
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.binary = np.empty((height, width), dtype=np.uint8)
+        self.upscaled = np.empty((self.dsize[1], self.dsize[0]), dtype=np.uint8)
+        self.bgr = np.empty((self.dsize[1], self.dsize[0], 3), dtype=np.uint8) if bgr_output else None
+
+    def matches(self, roi: np.ndarray) -> bool:
+        return roi.shape[:2] == self.shape
+
+    def __call__(self, roi: np.ndarray) -> np.ndarray:
+        if self.passthrough:
+            return roi
+        cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        cv2.adaptiveThreshold(self.gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                              cv2.THRESH_BINARY, 11, 2, dst=self.binary)
+        cv2.resize(self.binary, None, dst=self.upscaled, fx=self.UPSCALE, fy=self.UPSCALE,
+                   interpolation=cv2.INTER_CUBIC)
+        if self.bgr is None:
+            return self.upscaled
+        cv2.cvtColor(self.upscaled, cv2.COLOR_GRAY2BGR, dst=self.bgr)
+        return self.bgr
+
+
+def text_band(img: np.ndarray, margin: float = 0.25) -> Optional[Tuple[int, int]]:
+    """估计单行文字所在的行范围
+
+    Otsu 二值化后像素占少数的一方视为文字，取含文字的行并上下各留 margin 倍字高。
+
+    Args:
+        img: 预处理后的区域图像
+        margin: 上下留白占字高的比例
+
+    Returns:
+        (top, bottom)，没有文字时返回 None
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if cv2.countNonZero(binary) * 2 > binary.size:
+        binary = cv2.bitwise_not(binary)
+    counts = np.count_nonzero(binary, axis=1)
+    rows = np.flatnonzero(counts > max(1, binary.shape[1] // 50))
+    if rows.size == 0:
+        return None
+    pad = int((rows[-1] - rows[0] + 1) * margin)
+    return max(0, rows[0] - pad), min(img.shape[0], rows[-1] + 1 + pad)
+
+
+def rec_probabilities(text_rec, lines: List[np.ndarray]) -> Tuple[np.ndarray, List[str]]:
+    """绕过 CTC 贪心解码，直接运行 RapidOCR 的识别网络
+
+    与 text_rec 相同的缩放归一化，所有行补齐到最宽的宽高比后一次推理。
+
+    Args:
+        text_rec: RapidOCR 的 TextRecognizer
+        lines: 已缩放到识别高度的 BGR 行图像
+
+    Returns:
+        (每个时间步的字符概率 (N, T, C), 字符表)，字符表第 0 项为 CTC 空白
+    """
+    _, height, width = text_rec.rec_image_shape[:3]
+    max_wh_ratio = max([width / height] + [line.shape[1] / line.shape[0] for line in lines])
+    batch = np.stack([text_rec.resize_norm_img(line, max_wh_ratio) for line in lines]).astype(np.float32)
+    preds = text_rec.session(batch)[0]
+    return preds, text_rec.postprocess_op.character
+
+
+def greedy_decode(probs: np.ndarray, characters: List[str]) -> Tuple[str, float]:
+    """CTC 贪心解码（与 RapidOCR 的 CTCLabelDecode 一致）：每步取最大，去重复、去空白
+
+    Returns:
+        (文本, 保留字符概率的平均值)
+    """
+    index = probs.argmax(axis=1)
+    keep = index != 0
+    keep[1:] &= index[1:] != index[:-1]
+    text = "".join(characters[i] for i in index[keep])
+    kept = probs.max(axis=1)[keep]
+    return text, float(kept.mean()) if kept.size else 0.0
+
+
+def top_k(probs: np.ndarray, characters: List[str], k: int) -> TopKLattice:
+    """取每个时间步概率最高的 k 个字符"""
+    index = np.argpartition(probs, -k, axis=1)[:, -k:]
+    top = np.take_along_axis(probs, index, axis=1)
+    order = np.argsort(-top, axis=1)
+    index = np.take_along_axis(index, order, axis=1)
+    return TopKLattice([[characters[i] for i in row] for row in index],
+                       np.take_along_axis(top, order, axis=1))
+
+
+class RecOnlyEngine:
+    """仅识别模式
+
+    区域是框好的单行文字，不需要 RapidOCR 的检测网络、文本框排序和透视裁剪。
+    每个区域第一次出现文字时估计一次文字行范围（之后复用），裁掉上下空白并把
+    行高缩放到识别模型输入高度，直接调用 text_rec。
+    """
+
+    def __init__(self, ocr, height: int = REC_HEIGHT):
+        """初始化
+
+        Args:
+            ocr: RapidOCR 实例或 OcrHandle（需要提供 text_rec）
+            height: 识别模型输入高度
+        """
+        self.ocr = ocr
+        self.height = height
+        self.bands: Dict[str, Tuple[int, int]] = {}
+
+    def normalize(self, region_name: str, img: np.ndarray) -> np.ndarray:
+        """裁到文字行并缩放到识别高度（单通道或 BGR 输入，输出 BGR）"""
+        band = self.bands.get(region_name)
+        if band is None:
+            band = text_band(img)
+            if band is None:
+                band = (0, img.shape[0])
+            else:
+                self.bands[region_name] = band
+        line = img[band[0]:band[1]]
+        scale = self.height / line.shape[0]
+        width = max(1, int(round(line.shape[1] * scale)))
+        line = cv2.resize(line, (width, self.height), interpolation=cv2.INTER_LINEAR)
+        # 识别模型需要三通道输入，单通道图在缩放到识别高度后再扩展
+        if line.ndim == 2:
+            line = cv2.cvtColor(line, cv2.COLOR_GRAY2BGR)
+        return line
+
+    def recognize(self, region_name: str, img: np.ndarray, topk: int = 0) -> OcrResult:
+        """识别一个预处理后的区域"""
+        return self.recognize_many([(region_name, img)], topk)[0]
+
+    def recognize_many(self, items: List[Tuple[str, np.ndarray]], topk: int = 0) -> List[OcrResult]:
+        """多个区域一次送入识别模型
+
+        各区域都已缩放到同一识别高度，text_rec 按宽高比排序后把同一批次补齐到相同
+        宽度做一次推理（每批最多 rec_batch_num 个，默认 6），新增区域只增加批大小，
+        不再增加一次会话调用。
+
+        topk > 0 时直接运行识别网络，在结果中附带每个时间步的 top-k 字符概率
+        （文本与置信度按 RapidOCR 相同的贪心规则得到）。
+
+        Args:
+            items: [(区域名, 预处理后的图像), ...]
+            topk: 每个时间步保留的候选字符数，0 表示不需要
+
+        Returns:
+            [OcrResult, ...]，顺序与输入一致，耗时为整批的推理时间
+        """
+        if not items:
+            return []
+        lines = [self.normalize(name, img) for name, img in items]
+        start = time.perf_counter()
+        if topk <= 0:
+            rec_res, _ = self.ocr.text_rec(lines)
+            elapsed = time.perf_counter() - start
+            return [OcrResult(str(text), float(score), elapsed) for text, score in rec_res]
+        # OcrHandle 需要经共享引擎排队执行
+        if hasattr(self.ocr, "rec_probabilities"):
+            preds, characters = self.ocr.rec_probabilities(lines)
+        else:
+            preds, characters = rec_probabilities(self.ocr.text_rec, lines)
+        elapsed = time.perf_counter() - start
+        results = []
+        for probs in preds:
+            text, score = greedy_decode(probs, characters)
+            results.append(OcrResult(text, score, elapsed, top_k(probs, characters, topk)))
+        return results
+
+    def reset(self, region_name: Optional[str] = None):
+        """界面布局变化后重新估计文字行范围"""
+        if region_name is None:
+            self.bands.clear()
+        else:
+            self.bands.pop(region_name, None)
+
+
+if __name__ == "__main__":
+    # 微基准：time 区域 preprocess() 与 PreprocessPlan 的单次分配量和耗时
+    import time
+    import tracemalloc
+
+    roi = np.full((27, 231, 3), 25, dtype=np.uint8)
+    cv2.putText(roi, "0:05", (10, 21), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (235, 235, 235), 2)
+    plan = PreprocessPlan("time", roi.shape)
+    plan_bgr = PreprocessPlan("time", roi.shape, bgr_output=True)
+    assert np.array_equal(plan_bgr(roi), preprocess("time", roi))
+    assert np.array_equal(plan(roi), preprocess("time", roi)[:, :, 0])
+
+    def measure(label, fn, calls=2000):
+        fn()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = (time.perf_counter() - start) / calls
+        print(f"{label:<22} 单次峰值分配 {peak - before:>7} B  耗时 {elapsed * 1e6:7.1f}us")
+
+    measure("preprocess()", lambda: preprocess("time", roi))
+    measure("PreprocessPlan(BGR)", lambda: plan_bgr(roi))
+    measure("PreprocessPlan(单通道)", lambda: plan(roi))
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: ONNX Runtime 会话调优 - 线程数/图优化/优化模型缓存/内存池/IO 绑定，以及启动预热
+
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+from ocr_engine import REC_HEIGHT
+
+# RapidOCR 中持有 ONNX 会话的三个组件
+_COMPONENTS = ("text_det", "text_cls", "text_rec")
+_GRAPH_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+DEFAULT_PROFILE_PATH = "ocr_profile.json"
+
+
+class SessionProfile:
+    """ONNX Runtime 会话参数
+
+    默认值面向单个脚本线程独占 OCR；使用 OCR 进程池时应按进程数调小 intra_op_threads。
+    """
+
+    def __init__(self, intra_op_threads: int = 0, inter_op_threads: int = 1, graph_level: str = "all",
+                 optimized_model_dir: Optional[str] = "ort_cache", enable_mem_arena: bool = True,
+                 enable_mem_pattern: bool = True, io_binding: bool = True, warmup_rounds: int = 3):
+        """初始化会话参数
+
+        Args:
+            intra_op_threads: 单个算子内的并行线程数，0 表示由 ONNX Runtime 决定
+            inter_op_threads: 算子间并行线程数（顺序执行模式下基本不用）
+            graph_level: 图优化级别 disable / basic / extended / all
+            optimized_model_dir: 优化后模型的缓存目录，下次启动直接加载并跳过图优化；None 表示不缓存
+            enable_mem_arena: 是否使用 CPU 内存池
+            enable_mem_pattern: 是否按输入形状预先规划内存
+            io_binding: 是否用 IO 绑定 + 预分配输入缓冲执行推理
+            warmup_rounds: 启动预热时每个区域推理的次数
+        """
+        if graph_level not in _GRAPH_LEVELS:
+            raise ValueError(f"未知的图优化级别: {graph_level}")
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.graph_level = graph_level
+        self.optimized_model_dir = optimized_model_dir
+        self.enable_mem_arena = enable_mem_arena
+        self.enable_mem_pattern = enable_mem_pattern
+        self.io_binding = io_binding
+        self.warmup_rounds = warmup_rounds
+
+    @classmethod
+    def load(cls, filepath: str = DEFAULT_PROFILE_PATH) -> "SessionProfile":
+        """从 JSON 加载，文件不存在时使用默认值"""
+        if not os.path.exists(filepath):
+            return cls()
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return cls(**json.load(f))
+
+    def save(self, filepath: str = DEFAULT_PROFILE_PATH):
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(self.__dict__, f, indent=2, ensure_ascii=False)
+
+    def session_options(self, graph_level: Optional[str] = None) -> "ort.SessionOptions":
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        level = _GRAPH_LEVELS[graph_level or self.graph_level]
+        options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, level)
+        options.enable_cpu_mem_arena = self.enable_mem_arena
+        options.enable_mem_pattern = self.enable_mem_pattern
+        return options
+
+    def create_session(self, model_path: str, providers) -> "ort.InferenceSession":
+        """按本配置创建会话
+
+        开启优化模型缓存时，第一次把优化后的图写到缓存目录；之后直接加载缓存并关闭图优化，
+        缩短创建时间。缓存文件名包含 ONNX Runtime 版本，升级后自动重新生成。
+        OCR 进程池的多个工作进程可能同时生成缓存：各自先写到带进程号的临时文件，
+        会话创建完成（文件已写完）后再 os.replace 到最终路径，其他进程不会读到写了一半的文件。
+        """
+        if not self.optimized_model_dir or self.graph_level == "disable":
+            return ort.InferenceSession(model_path, self.session_options(), providers=providers)
+        os.makedirs(self.optimized_model_dir, exist_ok=True)
+        base = os.path.splitext(os.path.basename(model_path))[0]
+        cached = os.path.join(self.optimized_model_dir, f"{base}.{self.graph_level}.ort{ort.__version__}.onnx")
+        if os.path.exists(cached):
+            return ort.InferenceSession(cached, self.session_options("disable"), providers=providers)
+        tmp_path = f"{cached}.{os.getpid()}.tmp"
+        options = self.session_options()
+        options.optimized_model_filepath = tmp_path
+        session = ort.InferenceSession(model_path, options, providers=providers)
+        try:
+            os.replace(tmp_path, cached)
+        except OSError:
+            # 目标正被其他进程占用（Windows）等情况：放弃这份缓存，下次启动再生成
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return session
+
+
+class BoundSession:
+    """用 IO 绑定执行推理的 InferenceSession 代理
+
+    每个输入按形状保留一块预分配缓冲，推理时把输入拷进缓冲；形状不变时沿用上一次的
+    绑定，不再重新绑定输入和输出。固定区域的识别输入形状基本不变，绑定几乎总能复用。
+    其余属性（get_inputs 等）转发给原会话。
+    """
+
+    def __init__(self, session: "ort.InferenceSession"):
+        self._session = session
+        self._binding = session.io_binding()
+        self._buffers: Dict[str, np.ndarray] = {}
+        self._outputs = None
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def run(self, output_names, input_feed, run_options=None):
+        for name, value in input_feed.items():
+            value = np.asarray(value)
+            buffer = self._buffers.get(name)
+            if buffer is None or buffer.shape != value.shape or buffer.dtype != value.dtype:
+                buffer = self._buffers[name] = np.empty_like(value)
+                self._binding.bind_cpu_input(name, buffer)
+            np.copyto(buffer, value)
+        if output_names is None:
+            output_names = [output.name for output in self._session.get_outputs()]
+        if self._outputs != list(output_names):
+            self._binding.clear_binding_outputs()
+            for name in output_names:
+                self._binding.bind_output(name)
+            self._outputs = list(output_names)
+        self._session.run_with_iobinding(self._binding, run_options)
+        return self._binding.copy_outputs_to_cpu()
+
+
+def apply_profile(ocr, profile: SessionProfile) -> int:
+    """按配置重建 RapidOCR 内部的检测/方向分类/识别会话
+
+    Args:
+        ocr: RapidOCR 实例
+        profile: 会话参数
+
+    Returns:
+        重建的会话数（版本不兼容、找不到模型路径的组件保持原样）
+    """
+    if ort is None:
+        return 0
+    rebuilt = 0
+    for attr in _COMPONENTS:
+        wrapper = getattr(getattr(ocr, attr, None), "session", None)
+        session = getattr(wrapper, "session", None)
+        model_path = getattr(session, "_model_path", None)
+        if session is None or not model_path:
+            print(f"跳过 {attr}: 未找到 ONNX 会话")
+            continue
+        new_session = profile.create_session(model_path, session.get_providers())
+        wrapper.session = BoundSession(new_session) if profile.io_binding else new_session
+        rebuilt += 1
+    return rebuilt
+
+
+def warm_up(ocr, region_sizes: Dict[str, Tuple[int, int]], rounds: int = 3) -> float:
+    """用空白区域预热，让内存池、内存规划和线程池在第一次真实读取前就绪
+
+    检测网络对空白图不会输出文本框，所以识别网络单独用 text_rec 预热。
+
+    Args:
+        ocr: RapidOCR 实例（或提供 __call__/text_rec 的 OcrHandle）
+        region_sizes: 区域名 -> (宽, 高)，按实际区域尺寸生成输入
+        rounds: 每个区域推理次数
+
+    Returns:
+        预热耗时（秒）
+    """
+    start = time.perf_counter()
+    sizes = list(region_sizes.values()) or [(200, 32)]
+    for _ in range(rounds):
+        for width, height in sizes:
+            blank = np.full((height, width, 3), 255, dtype=np.uint8)
+            ocr(blank)
+            line_width = max(1, int(round(width * REC_HEIGHT / height)))
+            ocr.text_rec([np.full((REC_HEIGHT, line_width, 3), 255, dtype=np.uint8)])
+    return time.perf_counter() - start
+
+
+def tune_ocr(ocr, region_sizes: Optional[Dict[str, Tuple[int, int]]] = None,
+             profile_path: str = DEFAULT_PROFILE_PATH) -> str:
+    """按 ocr_profile.json 重建会话并预热
+
+    Args:
+        ocr: RapidOCR 实例
+        region_sizes: 区域名 -> (宽, 高)，None 时用一个默认尺寸预热
+        profile_path: 配置文件路径，不存在时使用默认配置
+
+    Returns:
+        用于日志的摘要文本
+    """
+    profile = SessionProfile.load(profile_path)
+    rebuilt = apply_profile(ocr, profile)
+    elapsed = warm_up(ocr, region_sizes or {}, profile.warmup_rounds)
+    message = f"OCR 会话已调优 {rebuilt} 个，预热 {elapsed * 1000:.0f}ms"
+    print(f"✓ {message}")
+    return message
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: OCR 进程池 - 每个工作进程持有自己的 RapidOCR 会话，提交后返回 Future
+
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from frame_ring import SharedFrameRing
+from ocr_engine import OcrResult, PreprocessPlan, RecOnlyEngine, result_from_lines
+from roi_change import RegionChangeDetector
+
+# 工作进程内的 OCR 实例（由 initializer 创建，每个进程一份）
+_worker_ocr = None
+_worker_engine: Optional[RecOnlyEngine] = None
+# 工作进程连接的共享内存帧缓冲区，以及每个区域的预处理计划
+_worker_ring: Optional[SharedFrameRing] = None
+_worker_plans: Dict[str, PreprocessPlan] = {}
+
+
+def create_default_ocr():
+    """工作进程默认的 OCR 构造函数（与 main_gui_amd.create_ocr 参数一致，按 ocr_profile.json 调优）"""
+    from rapidocr_onnxruntime import RapidOCR
+    from ocr_profile import tune_ocr
+    ocr = RapidOCR(det_score_mode='fast', binarize=True)
+    tune_ocr(ocr)
+    return ocr
+
+
+def _init_worker(ocr_factory: Callable, ring_name: Optional[str]):
+    global _worker_ocr, _worker_engine, _worker_ring
+    _worker_ocr = ocr_factory()
+    _worker_engine = RecOnlyEngine(_worker_ocr)
+    if ring_name is not None:
+        _worker_ring = SharedFrameRing.attach(ring_name)
+
+
+def _recognize(region_name: str, img: np.ndarray, rec_only: bool, topk: int) -> OcrResult:
+    """工作进程中执行一次识别"""
+    if rec_only:
+        return _worker_engine.recognize(region_name, img, topk)
+    start = time.perf_counter()
+    result, _ = _worker_ocr(img)
+    return result_from_lines(result, time.perf_counter() - start)
+
+
+def _recognize_slot(region_name: str, seq: int, box: Tuple[int, int, int, int], rec_only: bool,
+                    topk: int) -> Optional[OcrResult]:
+    """工作进程中直接在共享内存帧上裁剪、预处理并识别
+
+    预处理把区域写进本进程的缓冲后再校验序号，帧在这之前已被覆盖时不做推理，返回 None。
+    """
+    item = _worker_ring.get(seq)
+    if item is None:
+        return None
+    _, view = item
+    left, top, right, bottom = box
+    roi = view[top:bottom, left:right]
+    plan = _worker_plans.get(region_name)
+    if plan is None or not plan.matches(roi):
+        plan = _worker_plans[region_name] = PreprocessPlan(region_name, roi.shape)
+    img = plan(roi)
+    if np.may_share_memory(img, view):
+        # money 区域不做预处理，返回的是共享内存视图本身
+        img = img.copy()
+    if not _worker_ring.is_valid(seq):
+        return None
+    return _recognize(region_name, img, rec_only, topk)
+
+
+class OcrService:
+    """OCR 工作进程池
+
+    submit() 立即返回 Future，识别期间调用线程可以继续处理新帧。
+    同一区域再次提交时，上一次还没开始执行的请求会被取消（已经在执行的无法中断，
+    其结果也不再被 latest() 返回），调用方只需要等待每个区域最新一次提交的结果。
+
+    指定 ring_name 时工作进程连接截图写入的共享内存帧缓冲区（见 WindowCapture.set_frame_ring），
+    提交时只传帧序号和区域坐标，工作进程自己在共享内存上裁剪和预处理，图像不经过 pickle。
+    """
+
+    def __init__(self, workers: int = 2, ocr_factory: Callable = create_default_ocr,
+                 pixel_threshold: int = 48, min_pixels: int = 3, ring_name: Optional[str] = None):
+        """启动进程池
+
+        Args:
+            workers: 工作进程数，每个进程各加载一份模型
+            ocr_factory: 创建 OCR 实例的模块级函数（需可被 pickle）
+            pixel_threshold: is_stale() 中单个像素变化超过该值才计入（同 RegionChangeDetector）
+            min_pixels: is_stale() 中变化像素数不少于该值视为已变化
+            ring_name: 共享内存帧缓冲区名称，None 表示提交时传图像
+        """
+        self.workers = workers
+        self.ring_name = ring_name
+        self._change = RegionChangeDetector(pixel_threshold, min_pixels)
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(ocr_factory, ring_name))
+        self._latest: Dict[str, Future] = {}
+        self._inputs: Dict[str, np.ndarray] = {}
+        self.submitted = 0
+        self.cancelled = 0
+        self.superseded = 0
+
+    def submit(self, region_name: str, img: np.ndarray, rec_only: bool = True, topk: int = 0,
+               frame: Optional[Tuple[int, Tuple[int, int, int, int]]] = None) -> Future:
+        """提交一次识别
+
+        Args:
+            region_name: 区域名称
+            img: 预处理后的区域图像（连接了共享内存时只用于 is_stale 比较）
+            rec_only: 是否使用仅识别模式
+            topk: 仅识别模式下在结果中附带每个时间步的 top-k 候选字符
+            frame: (帧序号, 帧内区域坐标)，连接了共享内存时工作进程据此直接取图
+
+        Returns:
+            结果为 OcrResult 的 Future；经共享内存取图时该帧已被覆盖，结果为 None，需用新帧重新提交
+        """
+        previous = self._latest.get(region_name)
+        if previous is not None and not previous.done():
+            if previous.cancel():
+                self.cancelled += 1
+            else:
+                self.superseded += 1
+        # 预处理输出会被下一次调用覆盖，money 区域的输入是截图帧的视图，拷贝一份留给 is_stale
+        img = np.array(img)
+        if self.ring_name is not None and frame is not None:
+            seq, box = frame
+            future = self._executor.submit(_recognize_slot, region_name, seq, box, rec_only, topk)
+        else:
+            future = self._executor.submit(_recognize, region_name, img, rec_only, topk)
+        self._latest[region_name] = future
+        self._inputs[region_name] = img
+        self.submitted += 1
+        return future
+
+    def latest(self, region_name: str) -> Optional[Future]:
+        """该区域最新一次提交的 Future"""
+        return self._latest.get(region_name)
+
+    def is_stale(self, region_name: str, img: np.ndarray) -> bool:
+        """img 与该区域最新一次提交的图像相比是否已经变化（需要重新提交）
+
+        按变化像素数判断（见 RegionChangeDetector），跳秒只改动一个字形，整块区域的平均差会被稀释。
+        """
+        previous = self._inputs.get(region_name)
+        if previous is None:
+            return True
+        return self._change.differs(previous, img)
+
+    def summary(self) -> str:
+        return (f"{self.workers}进程 提交{self.submitted} 取消{self.cancelled} "
+                f"过期{self.superseded}")
+
+    def shutdown(self):
+        for future in self._latest.values():
+            future.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    # 自检（需要 rapidocr_onnxruntime）：连续提交 5 次，只有最新一次的结果有效
+    import cv2
+    from concurrent.futures import wait
+
+    service = OcrService(workers=1, ocr_factory=create_default_ocr)
+    img = np.full((30, 120, 3), 30, dtype=np.uint8)
+    cv2.putText(img, "0:05", (8, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (235, 235, 235), 2)
+    futures = [service.submit("time", img) for _ in range(5)]
+    wait([service.latest("time")])
+    print(service.latest("time").result(), service.summary())
+    service.shutdown()
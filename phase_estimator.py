@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 倒计时相位估计 - 用秒数跳变的帧时间拟合整秒边界，在预测零点的固定偏移处点击
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class PhaseEstimator:
+    """整秒边界的相位估计
+
+    第 i 次跳变在时刻 T_i 把显示变成 v_i，模型为 T_i = zero - v_i * period，zero 是显示变为 0
+    的时刻。每次跳变给出一个 zero 的观测，按跳变时间的不确定度（前后两帧间隔的一半）
+    加权平均；开启 fit_period 且跳变覆盖至少 3 个不同数值时同时拟合 period（游戏时钟漂移）。
+
+    与当前拟合相差超过 outlier（加上该次跳变自身的不确定度）的跳变被丢弃，
+    例如点击刷新时整块区域重绘；连续 2 次被丢弃说明倒计时变了，从新的跳变重新开始。
+    """
+
+    def __init__(self, period: float = 1.0, max_transitions: int = 8, min_transitions: int = 2,
+                 outlier: float = 0.03, fit_period: bool = False):
+        """初始化估计器
+
+        Args:
+            period: 显示一秒对应的真实时间（秒）
+            max_transitions: 参与拟合的最近跳变数
+            min_transitions: 认为估计可用所需的跳变数
+            outlier: 判定为异常跳变的残差阈值（秒）
+            fit_period: 是否同时拟合 period
+        """
+        self.period = period
+        self.nominal_period = period
+        self.max_transitions = max_transitions
+        self.min_transitions = min_transitions
+        self.outlier = outlier
+        self.fit_period = fit_period
+        self.rejected = 0
+        self.reset()
+
+    def reset(self):
+        self.transitions: List[Tuple[int, float, float]] = []
+        self.zero: Optional[float] = None
+        self.period = self.nominal_period
+        self._consecutive_rejects = 0
+
+    @property
+    def ready(self) -> bool:
+        return len(self.transitions) >= self.min_transitions
+
+    def boundary(self, value: int) -> Optional[float]:
+        """预测显示变为 value 的时刻 (perf_counter)"""
+        if self.zero is None:
+            return None
+        return self.zero - value * self.period
+
+    def add_transition(self, value: int, timestamp: float, halfwidth: float = 0.0) -> bool:
+        """记录一次秒数跳变
+
+        Args:
+            value: 跳变后显示的秒数（总剩余秒数）
+            timestamp: 跳变时刻估计（前后两帧时间戳的中点）
+            halfwidth: 跳变时刻的不确定度（前后两帧间隔的一半）
+
+        Returns:
+            是否采纳
+        """
+        if self.zero is not None:
+            residual = abs(timestamp + value * self.period - self.zero)
+            if residual > self.outlier + halfwidth:
+                self.rejected += 1
+                self._consecutive_rejects += 1
+                if self._consecutive_rejects < 2:
+                    return False
+                self.transitions.clear()
+        self._consecutive_rejects = 0
+        self.transitions.append((value, timestamp, max(halfwidth, 1e-4)))
+        del self.transitions[:-self.max_transitions]
+        self._fit()
+        return True
+
+    def _fit(self):
+        values = np.array([t[0] for t in self.transitions], dtype=np.float64)
+        times = np.array([t[1] for t in self.transitions], dtype=np.float64)
+        weights = 1.0 / np.array([t[2] for t in self.transitions], dtype=np.float64) ** 2
+        if self.fit_period and len(np.unique(values)) >= 3:
+            # 加权最小二乘 T = zero - period * v
+            slope, intercept = np.polyfit(values, times, 1, w=np.sqrt(weights))
+            self.period, self.zero = -slope, intercept
+        else:
+            self.zero = float(np.average(times + values * self.period, weights=weights))
+
+    @property
+    def uncertainty(self) -> float:
+        """零点估计的标准误差（秒）"""
+        if not self.transitions:
+            return math.inf
+        weights = 1.0 / np.array([t[2] for t in self.transitions]) ** 2
+        return float(1.0 / math.sqrt(weights.sum()))
+
+    def summary(self) -> str:
+        if not self.ready:
+            return f"跳变{len(self.transitions)} 未就绪"
+        return f"跳变{len(self.transitions)} ±{self.uncertainty * 1000:.1f}ms 丢弃{self.rejected}"
+
+
+if __name__ == "__main__":
+    # 回放评估：渲染最后 5 秒倒计时的帧（500fps，帧间隔带抖动），检测跳变、估计相位，
+    # 按 "显示变为 1 后 buy_click_delay 秒" 计算点击时刻，与真实时刻比较。
+    # 对照组为原策略：每 0.25 秒 OCR 一次（耗时 40ms），第一次读到 1 后再等 buy_click_delay。
+    import random
+
+    import cv2
+
+    from digit_transition import SecondsDigitDetector
+
+    def render(value: int) -> np.ndarray:
+        img = np.full((30, 160, 3), 25, dtype=np.uint8)
+        x = 8
+        for char in f"0:{value:02d}s":
+            cv2.putText(img, char, (x, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (235, 235, 235), 2)
+            x += 12 if char == ":" else 20
+        return img
+
+    glyphs = {v: render(v) for v in range(10)}
+    delay = 0.5
+    random.seed(7)
+    errors, baseline = [], []
+    for trial in range(200):
+        zero = 100.0 + random.random()  # 显示变为 0 的真实时刻
+        truth = zero - 1.0 + delay
+        estimator, watcher = PhaseEstimator(), SecondsDigitDetector()
+        t = zero - 5.0
+        while t < zero - 1.0 + delay - 0.02:
+            value = max(0, math.ceil(zero - t))
+            event = watcher.feed(glyphs[value], t)
+            if event is not None:
+                # 跳变后的数值由粗略的截止时刻估计取整得到
+                estimator.add_transition(round(zero + random.uniform(-0.2, 0.2) - event[0]), *event)
+            t += 0.002 + random.uniform(-0.0005, 0.0015)
+        errors.append(estimator.boundary(1) + delay - truth)
+        ocr_t = zero - 5.0 + random.uniform(0, 0.25)
+        while math.ceil(zero - ocr_t) > 1:
+            ocr_t += 0.25
+        baseline.append(ocr_t + 0.04 + delay - truth)
+
+    def describe(values):
+        values = np.abs(np.array(values)) * 1000
+        return f"平均 {values.mean():6.2f}ms  p95 {np.percentile(values, 95):6.2f}ms  最大 {values.max():6.2f}ms"
+
+    print(f"相位估计 点击误差: {describe(errors)}")
+    print(f"原策略   点击误差: {describe(baseline)}")
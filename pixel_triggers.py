@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 像素触发器 - 配置声明触发条件，编译为扁平探针索引，每帧一次取像素 + 一次查表判断全部触发器
+
+import json
+import math
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from color_match import LabLut, default_lut, delta_e_table, probe_grid
+
+
+class TriggerEvent(NamedTuple):
+    """触发器状态变化（边沿）"""
+    name: str
+    active: bool  # True 为上升沿（条件开始满足），False 为下降沿
+    timestamp: float  # 触发帧的截图时间戳 (perf_counter)
+    seq: int  # 触发帧序号
+
+
+class PixelTrigger:
+    """一个像素触发条件：区域内探针与目标颜色的 CIEDE2000 小于容差"""
+
+    def __init__(self, name: str, region: str, target_bgr: Sequence[int], tolerance: float = 15.0,
+                 pattern: str = "grid3", debounce: int = 1, min_fraction: float = 0.6, inset: float = 0.2):
+        """初始化
+
+        Args:
+            name: 触发器名称
+            region: 区域名称（RegionSelector 中的键）
+            target_bgr: 目标颜色 (B, G, R)
+            tolerance: CIEDE2000 容差
+            pattern: 探针图案，"center" 为区域中心一点，"gridN" 为区域内 N×N 网格
+            debounce: 条件连续成立（或不成立）多少帧才改变状态，1 表示立即
+            min_fraction: 需要满足条件的探针比例
+            inset: 网格距区域边缘的比例
+        """
+        if pattern != "center" and not (pattern.startswith("grid") and pattern[4:].isdigit()):
+            raise ValueError(f"未知的探针图案: {pattern}")
+        self.name = name
+        self.region = region
+        self.target_bgr = tuple(int(v) for v in target_bgr)
+        self.tolerance = tolerance
+        self.pattern = pattern
+        self.debounce = max(1, int(debounce))
+        self.min_fraction = min_fraction
+        self.inset = inset
+
+    @property
+    def grid(self) -> int:
+        return 1 if self.pattern == "center" else int(self.pattern[4:])
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PixelTrigger":
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        data = dict(self.__dict__)
+        data["target_bgr"] = list(self.target_bgr)
+        return data
+
+
+def load_triggers(filepath: str, defaults: List[dict]) -> List[PixelTrigger]:
+    """从 JSON 列表加载触发器，文件不存在时使用 defaults"""
+    if os.path.exists(filepath):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            defaults = json.load(f)
+    return [PixelTrigger.from_dict(data) for data in defaults]
+
+
+class PixelTriggerEngine:
+    """把所有触发器编译成一组扁平数组，每帧一次判断
+
+    编译时把每个触发器的探针换算成截图帧内坐标并首尾相接（ys, xs），同时记录每个探针所属
+    触发器使用的色差表和容差。每帧只做一次花式索引取出全部探针像素、一次查表得到色差，
+    按触发器分段计数后更新去抖状态，只在状态变化时返回事件。
+    """
+
+    def __init__(self, triggers: List[PixelTrigger], selector, win_cap, lut: Optional[LabLut] = None):
+        """编译触发器
+
+        Args:
+            triggers: 触发器列表
+            selector: 区域配置（get_region）
+            win_cap: WindowCapture，用于把屏幕坐标换算为截图帧内坐标
+            lut: BGR→Lab 查找表，None 时使用进程内共享的默认表
+        """
+        self.triggers = triggers
+        self.names = [trigger.name for trigger in triggers]
+        self.lut = lut or default_lut()
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+        ys, xs, owners, table_ids, tolerances = [], [], [], [], []
+        required, debounce = [], []
+        targets: Dict[tuple, int] = {}
+        for i, trigger in enumerate(triggers):
+            region = selector.get_region(trigger.region)
+            if region is None:
+                raise ValueError(f"触发器 {trigger.name} 使用的区域 {trigger.region} 未设置")
+            py, px = probe_grid(win_cap.frame_region(region), trigger.grid, trigger.inset)
+            ys.append(py)
+            xs.append(px)
+            owners.append(np.full(py.size, i))
+            table_ids.append(np.full(py.size, targets.setdefault(trigger.target_bgr, len(targets))))
+            tolerances.append(np.full(py.size, trigger.tolerance, dtype=np.float32))
+            required.append(max(1, math.ceil(trigger.min_fraction * py.size)))
+            debounce.append(trigger.debounce)
+        self._ys = np.concatenate(ys)
+        self._xs = np.concatenate(xs)
+        self._table_ids = np.concatenate(table_ids)
+        self._tolerance = np.concatenate(tolerances)
+        sizes = np.array([y.size for y in ys])
+        self._starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self._required = np.array(required)
+        self._debounce = np.array(debounce)
+        # 每个不同目标色一张色差表 (目标数, 表项数)
+        self._tables = delta_e_table(self.lut, list(targets))
+        self.reset()
+        self.frames = 0
+        self.events = 0
+
+    def reset(self):
+        """所有触发器回到未满足状态；条件此刻仍成立的触发器会在下一次 update 中重新产生上升沿"""
+        self._state = np.zeros(len(self.triggers), dtype=bool)
+        self._streak = np.zeros(len(self.triggers), dtype=np.int32)
+
+    def update(self, frame: np.ndarray, timestamp: float, seq: int = -1) -> List[TriggerEvent]:
+        """用一帧更新全部触发器
+
+        Args:
+            frame: 截图帧（WindowCapture.capture / wait_frame 返回的帧）
+            timestamp: 帧截图时间戳
+            seq: 帧序号
+
+        Returns:
+            本帧发生的状态变化
+        """
+        self.frames += 1
+        pixels = frame[self._ys, self._xs]
+        close = self._tables[self._table_ids, self.lut.index(pixels)] < self._tolerance
+        raw = np.add.reduceat(close, self._starts, dtype=np.int32) >= self._required
+        self._streak = np.where(raw != self._state, self._streak + 1, 0)
+        flip = self._streak >= self._debounce
+        if not flip.any():
+            return []
+        self._state ^= flip
+        self._streak[flip] = 0
+        events = [TriggerEvent(self.names[i], bool(self._state[i]), timestamp, seq) for i in np.flatnonzero(flip)]
+        self.events += len(events)
+        return events
+
+    def active(self, name: str) -> bool:
+        """触发器当前（去抖后）是否满足"""
+        return bool(self._state[self._index[name]])
+
+    def summary(self) -> str:
+        states = " ".join(f"{name}={'1' if on else '0'}" for name, on in zip(self.names, self._state))
+        return f"{states} 事件{self.events}/{self.frames}帧"
+
+
+if __name__ == "__main__":
+    # 自检：两个触发器共 18 个探针，模拟按钮变色、单帧噪声和去抖
+    import tempfile
+    import time
+
+    class _Regions:
+        regions = {"buy": (100, 100, 300, 160), "verify": (400, 300, 600, 360)}
+
+        def get_region(self, name):
+            return self.regions.get(name)
+
+    class _Capture:
+        @staticmethod
+        def frame_region(region):
+            return region
+
+    lut = LabLut(filepath=os.path.join(tempfile.mkdtemp(), "lut.npy"))
+    triggers = [
+        PixelTrigger("buy_ready", "buy", (32, 29, 20), tolerance=15),
+        PixelTrigger("confirm_ready", "verify", (32, 29, 20), tolerance=18, debounce=3),
+    ]
+    engine = PixelTriggerEngine(triggers, _Regions(), _Capture(), lut)
+    frame = np.full((720, 1280, 3), 200, dtype=np.uint8)
+    log = []
+    for i in range(12):
+        frame[100:160, 100:300] = (32, 29, 20) if 3 <= i < 8 else (200, 200, 200)
+        # verify 区域在第 5 帧闪一下（会被去抖过滤），从第 7 帧起稳定
+        frame[300:360, 400:600] = (32, 29, 20) if i == 5 or i >= 7 else (200, 200, 200)
+        log += engine.update(frame, i * 0.002, i)
+    print([(e.name, e.active, e.seq) for e in log])
+    assert [(e.name, e.active, e.seq) for e in log] == [
+        ("buy_ready", True, 3), ("buy_ready", False, 8), ("confirm_ready", True, 9)]
+
+    rounds = 20000
+    start = time.perf_counter()
+    for i in range(rounds):
+        engine.update(frame, i, i)
+    print(f"每帧耗时 (2 个触发器 18 个探针): {(time.perf_counter() - start) / rounds * 1e6:.1f}us")
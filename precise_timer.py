@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 精确等待 - 先粗睡到截止前的自旋预算处，再自旋 perf_counter 到截止时刻，统计超时
+
+import threading
+import time
+from typing import Optional
+
+from latency_trace import LatencyHistogram
+
+
+class PreciseTimer:
+    """睡眠 + 自旋的混合等待
+
+    time.sleep 的醒来时刻受系统调度粒度影响（Windows 默认约 15.6ms，高精度定时器约 1ms），
+    可能晚几毫秒。这里只睡到 deadline - spin_budget，剩下的一小段自旋等待，
+    返回时刻通常比 deadline 晚几微秒。
+
+    adaptive 时自旋预算跟随实际的睡眠过头量：某次过头超过预算就立即放大到该值加 margin，
+    否则每次缓慢收缩 2%，不低于 min_spin_budget。统计三项直方图：
+    coarse（粗睡醒来比预定晚多少）、spin（自旋耗时）、overshoot（最终返回晚于 deadline 多少）。
+    """
+
+    def __init__(self, spin_budget: float = 0.002, adaptive: bool = True, min_spin_budget: float = 0.0005,
+                 max_spin_budget: float = 0.02, margin: float = 0.0005):
+        """初始化
+
+        Args:
+            spin_budget: 初始自旋预算（秒）
+            adaptive: 是否根据测得的睡眠过头量调整自旋预算
+            min_spin_budget: 自旋预算下限（秒）
+            max_spin_budget: 自旋预算上限（秒）
+            margin: 调整时在过头量之上额外留出的时间（秒）
+        """
+        self.spin_budget = spin_budget
+        self.adaptive = adaptive
+        self.min_spin_budget = min_spin_budget
+        self.max_spin_budget = max_spin_budget
+        self.margin = margin
+        self.coarse = LatencyHistogram()
+        self.spin = LatencyHistogram()
+        self.overshoot = LatencyHistogram()
+        self.overslept = 0  # 粗睡已经越过 deadline 的次数
+        self._lock = threading.Lock()
+
+    def wait_until(self, deadline: float) -> float:
+        """等到 deadline (perf_counter)
+
+        Returns:
+            返回时刻晚于 deadline 的秒数；调用时已过 deadline 时为负数或 0，不计入统计
+        """
+        now = time.perf_counter()
+        if now >= deadline:
+            return now - deadline
+        budget = self.spin_budget
+        late = None
+        if deadline - now > budget:
+            target = deadline - budget
+            time.sleep(target - now)
+            late = max(0.0, time.perf_counter() - target)
+        spin_start = time.perf_counter()
+        while time.perf_counter() < deadline:
+            pass
+        end = time.perf_counter()
+        with self._lock:
+            if late is not None:
+                self.coarse.record(late)
+                if late > budget:
+                    self.overslept += 1
+                if self.adaptive:
+                    self._adapt(late)
+            self.spin.record(end - spin_start)
+            self.overshoot.record(end - deadline)
+        return end - deadline
+
+    def sleep(self, seconds: float) -> float:
+        """精确等待 seconds 秒，返回超时量"""
+        return self.wait_until(time.perf_counter() + seconds)
+
+    def _adapt(self, late: float):
+        needed = late + self.margin
+        if needed > self.spin_budget:
+            self.spin_budget = min(self.max_spin_budget, needed)
+        else:
+            self.spin_budget = max(self.min_spin_budget, needed, self.spin_budget * 0.98)
+
+    def summary(self) -> str:
+        if self.overshoot.total == 0:
+            return "无数据"
+        over = self.overshoot
+        return (f"超时 p50 {over.percentile(50) * 1e6:.0f}us p99 {over.percentile(99) * 1e6:.0f}us "
+                f"max {over.max * 1e6:.0f}us 粗睡过头 p99 {self.coarse.percentile(99) * 1000:.2f}ms "
+                f"自旋预算 {self.spin_budget * 1000:.2f}ms 睡过{self.overslept}/{over.total}")
+
+
+_default_timer: Optional[PreciseTimer] = None
+
+
+def default_timer() -> PreciseTimer:
+    """进程内共享的默认计时器（统计汇总在一处）"""
+    global _default_timer
+    if _default_timer is None:
+        _default_timer = PreciseTimer()
+    return _default_timer
+
+
+def precise_sleep(seconds: float) -> float:
+    """用默认计时器精确等待 seconds 秒"""
+    return default_timer().sleep(seconds)
+
+
+def wait_until(deadline: float) -> float:
+    """用默认计时器等到 deadline (perf_counter)"""
+    return default_timer().wait_until(deadline)
+
+
+if __name__ == "__main__":
+    # 对比 time.sleep 与混合等待在购买流程常用时长上的超时
+    import random
+
+    durations = [0.01, 0.02, 0.03, 0.1, 0.25]
+    raw = LatencyHistogram()
+    for _ in range(40):
+        for seconds in durations:
+            deadline = time.perf_counter() + seconds
+            time.sleep(seconds)
+            raw.record(max(0.0, time.perf_counter() - deadline))
+    print(f"time.sleep    超时 p50 {raw.percentile(50) * 1e6:.0f}us p99 {raw.percentile(99) * 1e6:.0f}us "
+          f"max {raw.max * 1e6:.0f}us")
+
+    timer = PreciseTimer()
+    for _ in range(40):
+        for seconds in durations:
+            timer.sleep(seconds + random.uniform(0, 0.001))
+    print(f"PreciseTimer  {timer.summary()}")
+    spin_share = timer.spin.sum / sum(durations) / 40
+    print(f"自旋占等待时间: {spin_share * 100:.1f}%")
+    assert timer.overshoot.percentile(99) < 0.0005
@@ -21,15 +21,15 @@ class RegionSelector:
     可以命名选框并获取(left, top, right, bottom)格式的坐标。
     """
     
-    def __init__(self):
+    def __init__(self, output_idx: int = 0, device_idx: int = 0):
         """初始化区域选择器
         
         Args:
             output_idx: 输出屏幕索引（多屏幕时指定）
             device_idx: 设备索引
         """
-        self.output_idx = 0
-        self.device_idx = 0
+        self.output_idx = output_idx
+        self.device_idx = device_idx
         self.regions: Dict[str, Tuple[int, int, int, int]] = {}
 
         p_adapters = enum_dxgi_adapters()
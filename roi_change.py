@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 区域变化检测 - ROI 像素没有变化时复用上一次的 OCR 结果
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class RegionChangeDetector:
+    """按区域缓存 OCR 结果，像素没变就直接返回缓存文本
+
+    变化判断统计降采样后单通道中差值超过 pixel_threshold 的像素数，不少于 min_pixels 即为变化。
+    不用整块区域的平均绝对差：一个字形变化（如 0:09→0:08）摊到整个区域上平均差不到 2，
+    会被当成未变化。倒计时一秒才变一次，监控阶段绝大多数帧都能命中缓存。
+    """
+
+    def __init__(self, pixel_threshold: int = 48, min_pixels: int = 3, step: int = 2):
+        """初始化变化检测器
+
+        Args:
+            pixel_threshold: 单个像素变化超过该值 (0-255) 才计入，压制截图噪声
+            min_pixels: 变化像素数不少于该值视为区域变化
+            step: 降采样步长，越大越快但越不敏感
+        """
+        self.pixel_threshold = pixel_threshold
+        self.min_pixels = min_pixels
+        self.step = step
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._pending: Dict[str, np.ndarray] = {}
+        self._texts: Dict[str, str] = {}
+        self._stats: Dict[str, List[int]] = {}  # name -> [命中, 未命中]
+
+    def _signature(self, roi: np.ndarray) -> np.ndarray:
+        """降采样签名：BGR 图只取绿色通道，省掉 cvtColor"""
+        if roi.ndim == 3:
+            sample = roi[::self.step, ::self.step, 1]
+        else:
+            sample = roi[::self.step, ::self.step]
+        return sample.astype(np.int16)
+
+    def lookup(self, name: str, roi: np.ndarray) -> Optional[str]:
+        """查询区域是否变化
+
+        Args:
+            name: 区域名称
+            roi: 当前帧的区域图像
+
+        Returns:
+            未变化时返回缓存文本，否则返回 None（调用方做 OCR 后再 store）
+        """
+        stats = self._stats.setdefault(name, [0, 0])
+        sig = self._signature(roi)
+        prev = self._signatures.get(name)
+        if prev is not None and prev.shape == sig.shape:
+            if not self._changed(prev, sig):
+                stats[0] += 1
+                return self._texts[name]
+        stats[1] += 1
+        self._pending[name] = sig
+        return None
+
+    def differs(self, before: np.ndarray, after: np.ndarray) -> bool:
+        """两张区域图像之间是否有变化（与 lookup 相同的判断，不读写缓存）"""
+        prev, sig = self._signature(before), self._signature(after)
+        return prev.shape != sig.shape or self._changed(prev, sig)
+
+    def _changed(self, prev: np.ndarray, sig: np.ndarray) -> bool:
+        return np.count_nonzero(np.abs(sig - prev) > self.pixel_threshold) >= self.min_pixels
+
+    def store(self, name: str, text: str):
+        """记录刚刚 OCR 过的区域签名和结果"""
+        sig = self._pending.pop(name, None)
+        if sig is not None:
+            self._signatures[name] = sig
+            self._texts[name] = text
+
+    def invalidate(self, name: Optional[str] = None):
+        """丢弃缓存（name 为 None 时丢弃全部）"""
+        if name is None:
+            self._signatures.clear()
+            self._texts.clear()
+        else:
+            self._signatures.pop(name, None)
+            self._texts.pop(name, None)
+
+    def hit_rate(self, name: Optional[str] = None) -> float:
+        """缓存命中率"""
+        if name is None:
+            hits = sum(s[0] for s in self._stats.values())
+            total = sum(s[0] + s[1] for s in self._stats.values())
+        else:
+            hits, misses = self._stats.get(name, [0, 0])
+            total = hits + misses
+        return hits / total if total else 0.0
+
+    def summary(self) -> str:
+        """各区域命中率，用于监控窗口显示"""
+        parts = []
+        for name, (hits, misses) in self._stats.items():
+            parts.append(f"{name} {self.hit_rate(name):.0%}({hits}/{hits + misses})")
+        return " ".join(parts)
+
+
+if __name__ == "__main__":
+    # 自检：231x27 的 time 区域，个位数字变化必须判为变化，只有截图噪声时必须命中缓存
+    import cv2
+
+    def render(text: str) -> np.ndarray:
+        img = np.full((27, 231, 3), 25, dtype=np.uint8)
+        cv2.putText(img, text, (8, 21), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (235, 235, 235), 2)
+        return img
+
+    rng = np.random.default_rng(0)
+    detector = RegionChangeDetector()
+    for before, after in [("0:09", "0:08"), ("0:08", "0:06"), ("1:00", "0:59"), ("0:11", "0:10")]:
+        detector.invalidate()
+        assert detector.lookup("time", render(before)) is None
+        detector.store("time", before)
+        noisy = cv2.add(render(before), rng.integers(0, 12, (27, 231, 3), dtype=np.uint8))
+        assert detector.lookup("time", noisy) == before, f"{before} 加噪声后应命中缓存"
+        assert detector.lookup("time", render(after)) is None, f"{before}→{after} 应判为变化"
+        mean_diff = np.abs(render(before)[:, :, 1].astype(int) - render(after)[:, :, 1]).mean()
+        print(f"{before}→{after}: 平均差 {mean_diff:.2f}，判为变化 ✓")
+    print(detector.summary())
+    assert detector.differs(render("0:09"), render("0:08"))
+    assert not detector.differs(render("0:09"), cv2.add(render("0:09"), rng.integers(0, 12, (27, 231, 3), dtype=np.uint8)))
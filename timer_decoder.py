@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 倒计时文本解码 - 在识别网络的 top-k 候选上做受语法约束的 CTC 束搜索，结合上一次读数的先验
+
+import math
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ocr_engine import OcrResult, TopKLattice
+
+BLANK = "blank"
+DIGITS = "0123456789"
+
+_DIGIT_SET = frozenset(DIGITS)
+# 语法中"任意数字"的键。用 None 而不是某个字符，识别出的字母（如与 0 相近的 "D"）不会被当成数字
+_ANY_DIGIT = None
+
+# 语法自动机：状态 -> {字符类别: 下一状态}
+# 接受 "M分S秒"（M、S 为 1~2 位）、"N天"（N 为 1~3 位）、"N小时"（N 为 1~2 位）
+_GRAMMAR: Dict[str, Dict[Optional[str], str]] = {
+    "start": {_ANY_DIGIT: "n1"},
+    "n1": {_ANY_DIGIT: "n2", "分": "min", "天": "day", "小": "hour1"},
+    "n2": {_ANY_DIGIT: "n3", "分": "min", "天": "day", "小": "hour1"},
+    "n3": {"天": "day"},
+    "min": {_ANY_DIGIT: "s1"},
+    "s1": {_ANY_DIGIT: "s2", "秒": "time"},
+    "s2": {"秒": "time"},
+    "hour1": {"时": "hour"},
+    "time": {},
+    "day": {},
+    "hour": {},
+}
+# 接受状态 -> 读数类型
+_ACCEPT = {"time": "time", "day": "day", "hour": "hour"}
+# 语法中出现的非数字字符（分、秒、天、小、时）
+_SEPARATORS = frozenset(key for edges in _GRAMMAR.values() for key in edges if key is not _ANY_DIGIT)
+
+
+def _advance(state: str, char: str) -> Optional[str]:
+    if char in _DIGIT_SET:
+        return _GRAMMAR[state].get(_ANY_DIGIT)
+    if char not in _SEPARATORS:
+        return None
+    return _GRAMMAR[state].get(char)
+
+
+class TimerReading(NamedTuple):
+    """一次倒计时读数"""
+    kind: str  # "time" / "day" / "hour"
+    value: int  # time: 剩余秒数（分 * 60 + 秒）；day: 天数；hour: 小时数
+    text: str  # 解码出的字符串
+    confidence: float  # 该字符串在所有合法候选中的后验概率
+
+
+class TimerDecoder:
+    """受语法约束的倒计时解码器
+
+    贪心解码逐时间步取最大，任何一个字符认错（"分"→"份"、"6"→"b"）都会让整串无法解析。
+    这里在每个时间步的 top-k 候选上做 CTC 前缀束搜索，只扩展语法自动机允许的前缀，
+    对完整候选的概率再乘上先验：与跟踪器预测的剩余秒数相差越远，先验越小
+    （最多扣 max_penalty 个 nat，画面确实变化时网络证据仍能胜出）。
+    """
+
+    def __init__(self, beam_width: int = 16, prior_sigma: float = 1.5, max_penalty: float = 6.0,
+                 min_confidence: float = 0.5):
+        """初始化解码器
+
+        Args:
+            beam_width: 每个时间步保留的前缀数
+            prior_sigma: 先验的尺度（秒）
+            max_penalty: 先验最多扣除的对数概率
+            min_confidence: 最优候选后验概率低于该值时视为读取失败
+        """
+        self.beam_width = beam_width
+        self.prior_sigma = prior_sigma
+        self.max_penalty = max_penalty
+        self.min_confidence = min_confidence
+
+    def decode(self, result: OcrResult, expected: Optional[float] = None) -> Optional[TimerReading]:
+        """解码一次识别结果
+
+        Args:
+            result: OCR 结果，带 top-k 候选时在候选上搜索，否则按文本解析
+            expected: 跟踪器预测的该帧剩余时间（秒），None 表示没有先验
+
+        Returns:
+            TimerReading，没有合法候选或最优候选不够确定时返回 None
+        """
+        lattice = result.lattice if result.lattice is not None else lattice_from_text(result.text)
+        candidates = self.search(lattice)
+        best, best_score, total = None, -math.inf, []
+        for prefix, log_prob in candidates:
+            reading = self._interpret(prefix)
+            if reading is None:
+                continue
+            score = log_prob + self._prior(reading, expected)
+            total.append(score)
+            if score > best_score:
+                best, best_score = reading, score
+        if best is None:
+            return None
+        confidence = 1.0 / float(np.sum(np.exp(np.array(total) - best_score)))
+        if confidence < self.min_confidence:
+            return None
+        return best._replace(confidence=confidence)
+
+    def search(self, lattice: TopKLattice) -> List[Tuple[str, float]]:
+        """CTC 前缀束搜索，返回语法接受的完整前缀及其对数概率"""
+        # 前缀 -> [以空白结尾的概率, 以字符结尾的概率, 自动机状态]
+        beams = {"": [1.0, 0.0, "start"]}
+        log_scale = 0.0
+        for chars, probs in zip(lattice.chars, lattice.probs):
+            step: Dict[str, list] = {}
+            for prefix, (p_blank, p_char, state) in beams.items():
+                last = prefix[-1] if prefix else None
+                for char, p in zip(chars, probs):
+                    if char == BLANK:
+                        self._add(step, prefix, state, (p_blank + p_char) * p, 0.0)
+                        continue
+                    if char == last:
+                        # 相同字符连续出现：不经空白是重复，经过空白才是新字符
+                        self._add(step, prefix, state, 0.0, p_char * p)
+                        extend = p_blank * p
+                    else:
+                        extend = (p_blank + p_char) * p
+                    next_state = _advance(state, char)
+                    if next_state is not None and extend > 0.0:
+                        self._add(step, prefix + char, next_state, 0.0, extend)
+            if not step:
+                return []
+            kept = sorted(step.items(), key=lambda item: item[1][0] + item[1][1], reverse=True)
+            beams = dict(kept[:self.beam_width])
+            # 每步按最大值归一，避免长序列下溢
+            scale = max(v[0] + v[1] for v in beams.values())
+            if scale <= 0.0:
+                return []
+            for v in beams.values():
+                v[0] /= scale
+                v[1] /= scale
+            log_scale += math.log(scale)
+        return [(prefix, math.log(v[0] + v[1]) + log_scale)
+                for prefix, v in beams.items() if v[2] in _ACCEPT and v[0] + v[1] > 0.0]
+
+    @staticmethod
+    def _add(step: Dict[str, list], prefix: str, state: str, p_blank: float, p_char: float):
+        entry = step.get(prefix)
+        if entry is None:
+            step[prefix] = [p_blank, p_char, state]
+        else:
+            entry[0] += p_blank
+            entry[1] += p_char
+
+    @staticmethod
+    def _interpret(text: str) -> Optional[TimerReading]:
+        state = "start"
+        for char in text:
+            state = _advance(state, char)
+            if state is None:
+                return None
+        kind = _ACCEPT.get(state)
+        try:
+            if kind == "time":
+                minutes, seconds = text[:-1].split("分")
+                if int(minutes) > 60 or int(seconds) >= 60:
+                    return None
+                return TimerReading(kind, int(minutes) * 60 + int(seconds), text, 1.0)
+            if kind == "day":
+                return TimerReading(kind, int(text[:-1]), text, 1.0)
+            if kind == "hour":
+                return TimerReading(kind, int(text[:-2]), text, 1.0)
+        except ValueError:
+            # 语法已保证只含数字，这里只是兜底：解析失败按读取失败处理，不让异常打断脚本线程
+            return None
+        return None
+
+    def _prior(self, reading: TimerReading, expected: Optional[float]) -> float:
+        """与预测的剩余时间的一致程度（对数先验）"""
+        if expected is None or reading.kind != "time":
+            return 0.0
+        distance = (reading.value - math.floor(expected)) / self.prior_sigma
+        return -min(self.max_penalty, 0.5 * distance * distance)
+
+
+def lattice_from_text(text: str) -> TopKLattice:
+    """把一个确定的字符串变成单候选网格（缓存、模板命中等没有网络输出的结果）
+
+    字符之间插入空白以保留连续相同的数字；数字和语法分隔符之外的字符（空格、冒号、字母 D 等）直接丢弃。
+    """
+    chars: List[List[str]] = []
+    for char in text:
+        if char in _DIGIT_SET or char in _SEPARATORS:
+            chars.append([char])
+            chars.append([BLANK])
+    return TopKLattice(chars, np.ones((len(chars), 1)))
+
+
+if __name__ == "__main__":
+    # 自检：构造带误读的网格（"分" 与 "份" 接近、"6" 与 "b" 接近、一个数字含糊），
+    # 对比贪心解码与受约束解码的结果
+    import time
+
+    def make_lattice(steps):
+        """steps: 每个字符的候选 [(字符, 概率), ...]，字符之间插入空白"""
+        chars, probs = [], []
+        for options in steps:
+            # 候选不足 3 个时补上空白和一个语法之外的字符
+            options = (options + [(BLANK, 0.005), ("口", 0.001)])[:3]
+            for row in (options, [(BLANK, 0.97), ("1", 0.02), ("7", 0.01)]):
+                chars.append([c for c, _ in row])
+                probs.append([p for _, p in row])
+        return TopKLattice(chars, np.array(probs))
+
+    cases = [
+        ("份 误读", [[("0", 0.99)], [("份", 0.55), ("分", 0.40)], [("1", 0.9)], [("6", 0.9)], [("秒", 0.99)]], 16.4, 16),
+        ("b 误读", [[("1", 0.99)], [("分", 0.99)], [("b", 0.6), ("6", 0.35)], [("秒", 0.99)]], 66.5, 66),
+        ("含糊数字+先验", [[("0", 0.99)], [("分", 0.99)], [("8", 0.5), ("3", 0.45)], [("秒", 0.99)]], 3.2, 3),
+        ("小时", [[("2", 0.99)], [("小", 0.99)], [("时", 0.98)]], None, 2),
+    ]
+    decoder = TimerDecoder()
+    for label, steps, expected, truth in cases:
+        lattice = make_lattice(steps)
+        greedy = "".join(c[0] for c in lattice.chars if c[0] != BLANK)
+        reading = decoder.decode(OcrResult(greedy, 0.0, 0.0, lattice), expected)
+        ok = reading is not None and reading.value == truth
+        print(f"{label:8s} 贪心: {greedy:8s} 解码: {reading.text if reading else None!s:8s} "
+              f"后验 {reading.confidence if reading else 0:.2f} {'✓' if ok else '✗'}")
+    # 与 0 相近的字母 D：文本里的 D 被丢弃（读取失败），网格里的 D 候选不能当数字
+    assert decoder.decode(OcrResult("0分D秒", 0.0, 0.0, None)) is None
+    lattice = make_lattice([[("0", 0.99)], [("分", 0.99)], [("1", 0.65), ("D", 0.3)], [("秒", 0.99)]])
+    reading = decoder.decode(OcrResult("0分1秒", 0.0, 0.0, lattice))
+    assert reading is not None and "D" not in reading.text and reading.value == 1
+    print("字母 D 不被当作数字 ✓")
+    lattice = make_lattice(cases[0][1])
+    start = time.perf_counter()
+    for _ in range(1000):
+        decoder.decode(OcrResult("", 0.0, 0.0, lattice), 16.4)
+    print(f"单次解码耗时: {(time.perf_counter() - start):.2f}ms")
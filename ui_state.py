@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# @Date: 2026-10-17
+# @Description: 界面状态分类 - 用降采样帧和少量特征区域的缩略图在单帧内判断列表/确认弹窗/购买成功/加载中
+
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+LISTING = "listing"  # 交易行列表（显示倒计时）
+CONFIRM = "confirm"  # 购买确认弹窗
+SUCCESS = "success"  # 购买成功提示
+LOADING = "loading"  # 加载中 / 黑屏
+UNKNOWN = "unknown"
+STATES = (LISTING, CONFIRM, SUCCESS, LOADING)
+
+
+class UiStateClassifier:
+    """单帧界面状态分类器
+
+    特征向量 = 整帧按 grid 均匀取点（最近邻，不做整帧缩放）+ 每个特征区域 INTER_AREA 缩成
+    patch_size 的缩略图。分类顺序：
+    1. 规则（如确认按钮颜色匹配）命中即返回对应状态；
+    2. 特征几乎是纯色（标准差小于 uniform_std）视为加载中；
+    3. 与各状态原型的平均绝对差取最近者，超过 max_distance 返回 UNKNOWN。
+    原型由脚本在状态确定的时刻在线学习（读到倒计时 -> 列表，购买后三角币变化 -> 成功），
+    可保存到 .npz 供下次启动直接使用。单帧耗时约一百微秒。
+    """
+
+    def __init__(self, filepath: Optional[str] = None, grid: Tuple[int, int] = (24, 14),
+                 patch_size: Tuple[int, int] = (8, 4), max_distance: float = 14.0,
+                 uniform_std: float = 3.0, max_per_state: int = 8):
+        """初始化分类器
+
+        Args:
+            filepath: 原型文件路径 (.npz)，存在时自动加载
+            grid: 整帧取点网格 (列数, 行数)
+            patch_size: 特征区域缩略图尺寸 (宽, 高)
+            max_distance: 判定为某状态的最大平均绝对差 (0~255)
+            uniform_std: 特征标准差低于该值视为加载中
+            max_per_state: 每个状态最多保留的原型数
+        """
+        self.filepath = filepath
+        self.grid = grid
+        self.patch_size = patch_size
+        self.max_distance = max_distance
+        self.uniform_std = uniform_std
+        self.max_per_state = max_per_state
+        self.prototypes: Dict[str, np.ndarray] = {}
+        self.rules: List[Tuple[str, Callable[[np.ndarray], bool]]] = []
+        self._grid_index: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._patches: List[Tuple[int, int, int, int]] = []
+        self.classified = 0
+        self.unknown = 0
+        if filepath:
+            self.load(filepath)
+
+    def set_layout(self, frame_shape: Tuple[int, ...], patches: Dict[str, Tuple[int, int, int, int]]):
+        """设置帧尺寸和特征区域（截图帧内坐标），特征维度变化时丢弃已有原型
+
+        Args:
+            frame_shape: 截图帧形状
+            patches: 区域名 -> (left, top, right, bottom)
+        """
+        height, width = frame_shape[:2]
+        cols, rows = self.grid
+        xs = ((np.arange(cols) + 0.5) * width / cols).astype(np.intp)
+        ys = ((np.arange(rows) + 0.5) * height / rows).astype(np.intp)
+        ys, xs = np.meshgrid(ys, xs, indexing='ij')
+        self._grid_index = (ys.ravel(), xs.ravel())
+        self._patches = [region for _, region in sorted(patches.items())
+                         if region[2] > region[0] and region[3] > region[1]]
+        dim = self.dimension
+        for state in [s for s, p in self.prototypes.items() if p.shape[1] != dim]:
+            print(f"界面状态原型维度不符，丢弃: {state}")
+            del self.prototypes[state]
+
+    @property
+    def ready(self) -> bool:
+        """是否已设置帧布局"""
+        return self._grid_index is not None
+
+    @property
+    def dimension(self) -> int:
+        cols, rows = self.grid
+        width, height = self.patch_size
+        return (cols * rows + len(self._patches) * width * height) * 3
+
+    def add_rule(self, state: str, rule: Callable[[np.ndarray], bool]):
+        """添加优先于原型匹配的规则，rule(frame) 为 True 时直接判定为 state"""
+        self.rules.append((state, rule))
+
+    def signature(self, frame: np.ndarray) -> np.ndarray:
+        """单帧特征向量 (float32)"""
+        parts = [frame[self._grid_index].ravel()]
+        for left, top, right, bottom in self._patches:
+            parts.append(cv2.resize(frame[top:bottom, left:right], self.patch_size,
+                                    interpolation=cv2.INTER_AREA).ravel())
+        return np.concatenate(parts).astype(np.float32)
+
+    def classify(self, frame: np.ndarray) -> Tuple[str, float]:
+        """判断一帧的界面状态
+
+        Returns:
+            (状态, 与最近原型的平均绝对差)，规则命中或加载中时距离为 0
+        """
+        self.classified += 1
+        for state, rule in self.rules:
+            if rule(frame):
+                return state, 0.0
+        if not self.ready:
+            return UNKNOWN, np.inf
+        sig = self.signature(frame)
+        if sig.std() < self.uniform_std:
+            return LOADING, 0.0
+        best, best_distance = UNKNOWN, np.inf
+        for state, prototypes in self.prototypes.items():
+            distance = float(np.abs(prototypes - sig).mean(axis=1).min())
+            if distance < best_distance:
+                best, best_distance = state, distance
+        if best_distance > self.max_distance:
+            self.unknown += 1
+            return UNKNOWN, best_distance
+        return best, best_distance
+
+    def learn(self, state: str, sample: np.ndarray) -> bool:
+        """记录一个已知状态的样本
+
+        Args:
+            state: 状态名
+            sample: 截图帧，或 signature() 得到的特征向量
+
+        Returns:
+            是否加入了原型（与已有原型过于相似时不加入）
+        """
+        sig = sample if sample.ndim == 1 else self.signature(sample)
+        prototypes = self.prototypes.get(state)
+        if prototypes is None:
+            self.prototypes[state] = sig[None, :]
+            return True
+        if np.abs(prototypes - sig).mean(axis=1).min() < self.max_distance / 3:
+            return False
+        # 超过上限时丢弃最早的原型
+        self.prototypes[state] = np.vstack([prototypes, sig])[-self.max_per_state:]
+        return True
+
+    def load(self, filepath: str):
+        if not os.path.exists(filepath):
+            return
+        data = np.load(filepath)
+        if tuple(data["grid"]) != tuple(self.grid) or tuple(data["patch_size"]) != tuple(self.patch_size):
+            print(f"界面状态原型参数不一致，忽略: {filepath}")
+            return
+        self.prototypes = {state: data[state] for state in STATES if state in data}
+
+    def save(self, filepath: Optional[str] = None):
+        filepath = filepath or self.filepath
+        if not filepath or not self.prototypes:
+            return
+        np.savez(filepath, grid=np.array(self.grid), patch_size=np.array(self.patch_size), **self.prototypes)
+
+    def summary(self) -> str:
+        counts = " ".join(f"{state}:{len(p)}" for state, p in self.prototypes.items())
+        return f"原型 {counts or '无'} 未知{self.unknown}/{self.classified}"
+
+
+if __name__ == "__main__":
+    # 自检：合成列表 / 确认弹窗 / 成功提示 / 黑屏四种画面，各学一帧后对加噪声的新帧分类
+    import time
+
+    rng = np.random.default_rng(3)
+    height, width = 700, 1400
+    patches = {"time": (1150, 600, 1380, 627), "money": (1100, 40, 1300, 70), "verify_check": (700, 330, 743, 373)}
+
+    def render(state: str, seconds: int = 30) -> np.ndarray:
+        frame = np.full((height, width, 3), 40, dtype=np.uint8)
+        if state == LOADING:
+            return np.zeros_like(frame)
+        frame[80:650, 60:1050] = (70, 60, 55)  # 商品列表
+        cv2.putText(frame, f"0:{seconds:02d}", (1160, 622), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (235, 235, 235), 2)
+        cv2.putText(frame, "123456", (1110, 65), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 220, 240), 2)
+        if state == CONFIRM:
+            frame[200:500, 400:1000] = (30, 30, 30)
+            frame[330:373, 650:800] = (65, 109, 175)
+        elif state == SUCCESS:
+            frame[250:450, 450:950] = (60, 140, 60)
+        return frame
+
+    classifier = UiStateClassifier()
+    classifier.set_layout((height, width, 3), patches)
+    for state in (LISTING, CONFIRM, SUCCESS):
+        classifier.learn(state, render(state))
+    correct, total = 0, 0
+    for state in (LISTING, CONFIRM, SUCCESS, LOADING):
+        for seconds in range(0, 60, 7):
+            frame = cv2.add(render(state, seconds), rng.integers(0, 8, (height, width, 3), dtype=np.uint8))
+            predicted, distance = classifier.classify(frame)
+            correct += predicted == state
+            total += 1
+    print(f"分类正确 {correct}/{total}, {classifier.summary()}")
+    frame = render(LISTING, 12)
+    start = time.perf_counter()
+    for _ in range(5000):
+        classifier.classify(frame)
+    print(f"单帧分类耗时: {(time.perf_counter() - start) / 5000 * 1e6:.1f}us")
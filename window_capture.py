@@ -5,11 +5,31 @@
 # @FilePath: /DeltaForceScript/window_capture.py
 # @Description: 窗口截图工具 - 包含Windows Graphics Capture API支持
 
-import dxcam
-import win32gui
+import os
+import bisect
+import glob
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
 import cv2
 import numpy as np
 
+from frame_recorder import FrameRecorder, FrameRecording
+
+# dxcam / win32gui 只在 Windows 上可用，回放后端在 Linux 上也要能导入本模块
+try:
+    import dxcam
+except Exception as e:
+    dxcam = None
+    print(f"dxcam 加载失败，仅可使用回放后端: {e}")
+try:
+    import win32gui
+except Exception:
+    win32gui = None
+
+
 def enum_windows_with_title():
     """枚举所有窗口并显示标题"""
     def enum_callback(hwnd, results):
@@ -18,35 +38,556 @@ def enum_windows_with_title():
             if window_title:
                 results.append((hwnd, window_title))
         return True
-    
+
     windows = []
     win32gui.EnumWindows(enum_callback, windows)
     return windows
 
-class WindowCapture():
+
+class CaptureBackend:
+    """截图后端接口
+
+    所有后端都提供 capture() / stop()，以及最近一帧的时间戳和分辨率。
+    时间戳统一使用 time.perf_counter() 时钟，便于和决策逻辑的计时对齐。
+    """
+
+    def capture(self) -> Optional[np.ndarray]:
+        """获取最新一帧 (BGR)，没有可用帧时返回 None"""
+        raise NotImplementedError
+
+    def stop(self):
+        """释放后端资源"""
+        pass
+
+    @property
+    def frame_timestamp(self) -> float:
+        """最近一次 capture() 返回帧的时间戳 (perf_counter 秒)"""
+        raise NotImplementedError
+
+    @property
+    def resolution(self) -> Tuple[int, int]:
+        """帧分辨率 (width, height)"""
+        raise NotImplementedError
+
+    def set_region(self, region: Optional[Tuple[int, int, int, int]]):
+        """只截取屏幕上的 (left, top, right, bottom) 区域，None 表示整屏"""
+        raise NotImplementedError
+
+
+class CropPlan:
+    """截图裁剪计划
+
+    由 RegionSelector 的区域计算出所有区域的外接矩形 (bounds)，截图后端只拷贝这一块；
+    ScriptThread 通过 local_region() 把屏幕坐标换算到裁剪后帧内的坐标。
+    crop_regions() 额外提供每个区域独立、连续的预分配缓冲区。
+    """
+
+    def __init__(self, regions: Dict[str, Tuple[int, int, int, int]], names: Optional[List[str]] = None):
+        """初始化裁剪计划
+
+        Args:
+            regions: 区域字典，值为 (left, top, right, bottom)
+            names: 参与裁剪的区域名称，None 表示全部
+        """
+        names = list(regions) if names is None else names
+        self.regions = {name: tuple(regions[name]) for name in names if regions.get(name)}
+        if not self.regions:
+            raise ValueError("裁剪计划中没有有效区域")
+        boxes = list(self.regions.values())
+        self.bounds = (
+            min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes),
+        )
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_selector(cls, selector, names: Optional[List[str]] = None) -> "CropPlan":
+        return cls(selector.get_all_regions(), names)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """裁剪后帧的大小 (width, height)"""
+        left, top, right, bottom = self.bounds
+        return (right - left, bottom - top)
+
+    def local_region(self, region: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """屏幕坐标 -> 裁剪后帧内坐标"""
+        left, top, right, bottom = region
+        ox, oy, ex, ey = self.bounds
+        if left < ox or top < oy or right > ex or bottom > ey:
+            raise ValueError(f"区域 {region} 不在裁剪范围 {self.bounds} 内")
+        return (left - ox, top - oy, right - ox, bottom - oy)
+
+    def crop_regions(self, frame: np.ndarray) -> Dict[str, np.ndarray]:
+        """把裁剪后帧中的每个区域拷贝到各自的预分配缓冲区"""
+        rois = {}
+        for name, region in self.regions.items():
+            left, top, right, bottom = self.local_region(region)
+            src = frame[top:bottom, left:right]
+            buf = self._buffers.get(name)
+            if buf is None or buf.shape != src.shape:
+                buf = self._buffers[name] = np.empty_like(src)
+            np.copyto(buf, src)
+            rois[name] = buf
+        return rois
+
+
+class DxcamBackend(CaptureBackend):
+    """基于 dxcam 的桌面截图后端"""
+
     def __init__(self, device_idx: int = 0, output_idx: int = 0, target_fps: int = 500, max_buffer_len: int = 8):
+        if dxcam is None:
+            raise RuntimeError("dxcam 不可用，请在 Windows 上运行或改用 ReplayBackend")
+        print(dxcam.device_info())
+        print(dxcam.output_info())
+        self.camera = dxcam.create(device_idx=device_idx, output_idx=output_idx, output_color="BGR", max_buffer_len=max_buffer_len)
+        self.target_fps = target_fps
+        self.region = None
+        self.camera.start(target_fps=target_fps, video_mode=True)
+        self._timestamp = 0.0
+
+    def capture(self) -> Optional[np.ndarray]:
+        img = self.camera.get_latest_frame()
+        self._timestamp = time.perf_counter()
+        return img
+
+    def stop(self):
+        self.camera.stop()
+
+    @property
+    def frame_timestamp(self) -> float:
+        return self._timestamp
+
+    @property
+    def resolution(self) -> Tuple[int, int]:
+        if self.region is not None:
+            left, top, right, bottom = self.region
+            return (right - left, bottom - top)
+        width, height = self.camera.width, self.camera.height
+        return (width, height)
+
+    def set_region(self, region: Optional[Tuple[int, int, int, int]]):
+        # dxcam 只能在 start 时指定区域，需要重启采集线程
+        self.camera.stop()
+        self.region = region
+        self.camera.start(region=region, target_fps=self.target_fps, video_mode=True)
+
+
+class _ImageSequence:
+    """PNG/JPG 图片序列，按文件名排序"""
+
+    def __init__(self, path: str, fps: float):
+        self.files = sorted(
+            f for f in glob.glob(os.path.join(path, "*"))
+            if f.lower().endswith((".png", ".jpg", ".bmp"))
+        )
+        if not self.files:
+            raise ValueError(f"目录中没有图片: {path}")
+        # 可选的 timestamps.json: 与文件一一对应的秒级时间戳列表
+        ts_file = os.path.join(path, "timestamps.json")
+        if os.path.exists(ts_file):
+            with open(ts_file, 'r', encoding='utf-8') as f:
+                self.timestamps = [float(t) for t in json.load(f)]
+        else:
+            self.timestamps = [i / fps for i in range(len(self.files))]
+
+    def __len__(self):
+        return len(self.files)
+
+    def read(self, idx: int) -> Optional[np.ndarray]:
+        return cv2.imread(self.files[idx], cv2.IMREAD_COLOR)
+
+
+class _NpyStack:
+    """(N, H, W, 3) 的 .npy 帧堆栈，可选同名 .ts.npy 时间戳"""
+
+    def __init__(self, path: str, fps: float):
+        self.frames = np.load(path, mmap_mode='r')
+        if self.frames.ndim != 4:
+            raise ValueError(f"帧堆栈维度应为 (N, H, W, C)，实际: {self.frames.shape}")
+        ts_file = path[:-len(".npy")] + ".ts.npy"
+        if os.path.exists(ts_file):
+            self.timestamps = [float(t) for t in np.load(ts_file)]
+        else:
+            self.timestamps = [i / fps for i in range(len(self.frames))]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def read(self, idx: int) -> Optional[np.ndarray]:
+        return np.ascontiguousarray(self.frames[idx])
+
+
+class _VideoStream:
+    """视频文件，只支持顺序读取 (跳帧时用 grab 丢弃)"""
+
+    def __init__(self, path: str, fps: float):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"无法打开视频: {path}")
+        video_fps = self.cap.get(cv2.CAP_PROP_FPS) or fps
+        count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.timestamps = [i / video_fps for i in range(count)]
+        self.pos = 0
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def read(self, idx: int) -> Optional[np.ndarray]:
+        if idx < self.pos:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            self.pos = idx
+        while self.pos < idx:
+            self.cap.grab()
+            self.pos += 1
+        ok, frame = self.cap.read()
+        self.pos += 1
+        return frame if ok else None
+
+    def release(self):
+        self.cap.release()
+
+
+class _RecordingReader:
+    """FrameRecorder 录制的 .dfrec 文件，区域录制会合成回外接矩形"""
+
+    def __init__(self, path: str):
+        self.recording = FrameRecording(path)
+        self.timestamps = [float(t) for t in self.recording.timestamps]
+        self.origin = self.recording.origin
+
+    def __len__(self):
+        return len(self.recording)
+
+    def read(self, idx: int) -> Optional[np.ndarray]:
+        return self.recording.compose(idx)
+
+
+class ReplayBackend(CaptureBackend):
+    """录制回放后端 - 用于在没有游戏桌面的机器上做基准测试
+
+    支持图片序列目录、.npy 帧堆栈、视频文件和 FrameRecorder 录制的 .dfrec 文件。
+    speed=1.0 按录制时间回放，>1 加速，<=0 则每次 capture() 立即返回下一帧（测吞吐）。
+    和 dxcam 一样，capture() 会阻塞到下一帧到期；消费者处理过慢时直接跳到最新帧。
+    """
+
+    def __init__(self, source: str, speed: float = 1.0, loop: bool = False, fps: float = 60.0):
+        """初始化回放后端
+
+        Args:
+            source: 图片目录 / .npy 文件 / .dfrec 录制 / 视频文件路径
+            speed: 回放倍速
+            loop: 播放结束后是否从头开始
+            fps: 源文件没有时间戳时使用的帧率
+        """
+        if os.path.isdir(source):
+            self.reader = _ImageSequence(source, fps)
+        elif source.lower().endswith(".npy"):
+            self.reader = _NpyStack(source, fps)
+        elif source.lower().endswith(".dfrec"):
+            self.reader = _RecordingReader(source)
+        else:
+            self.reader = _VideoStream(source, fps)
+        if len(self.reader) == 0:
+            raise ValueError(f"回放源为空: {source}")
+        self.speed = speed
+        self.loop = loop
+        ts = self.reader.timestamps
+        self._offsets = [t - ts[0] for t in ts]
+        self._start = None
+        self._index = -1
+        self._timestamp = 0.0
+        self.region = None
+        first = self.reader.read(0)
+        self._resolution = (first.shape[1], first.shape[0])
+
+    def _due_time(self, idx: int) -> float:
+        """第 idx 帧在 perf_counter 时钟上的到期时间"""
+        return self._start + self._offsets[idx] / self.speed
+
+    def capture(self) -> Optional[np.ndarray]:
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = now
+        if self.speed <= 0:
+            idx = self._index + 1
+        else:
+            elapsed = (now - self._start) * self.speed
+            idx = bisect.bisect_right(self._offsets, elapsed) - 1
+            if idx <= self._index:
+                idx = self._index + 1
+                if idx < len(self._offsets):
+                    time.sleep(max(0.0, self._due_time(idx) - time.perf_counter()))
+        if idx >= len(self._offsets):
+            if not self.loop:
+                return None
+            # 从头循环，时钟原点顺延到当前时刻
+            self._start = time.perf_counter()
+            self._index = -1
+            idx = 0
+        frame = self.reader.read(idx)
+        self._index = idx
+        if frame is not None and self.region is not None:
+            # 录制文件的帧可能本身就是裁剪过的，需要减去其左上角的屏幕坐标
+            ox, oy = getattr(self.reader, "origin", (0, 0))
+            left, top, right, bottom = self.region
+            # 每帧单独一份：帧会被 _publish 直接交给消费者，复用缓冲区会在读取时被下一帧覆盖
+            frame = frame[top - oy:bottom - oy, left - ox:right - ox].copy()
+        if self.speed <= 0:
+            self._timestamp = time.perf_counter()
+        else:
+            self._timestamp = self._due_time(idx)
+        return frame
+
+    def stop(self):
+        if hasattr(self.reader, "release"):
+            self.reader.release()
+
+    @property
+    def frame_index(self) -> int:
+        """最近一次返回帧在回放源中的序号"""
+        return self._index
+
+    @property
+    def frame_timestamp(self) -> float:
+        return self._timestamp
+
+    @property
+    def resolution(self) -> Tuple[int, int]:
+        if self.region is not None:
+            left, top, right, bottom = self.region
+            return (right - left, bottom - top)
+        return self._resolution
+
+    def set_region(self, region: Optional[Tuple[int, int, int, int]]):
+        self.region = region
+
+
+class WindowCapture():
+    def __init__(self, device_idx: int = 0, output_idx: int = 0, target_fps: int = 500, max_buffer_len: int = 8,
+                 backend: Optional[CaptureBackend] = None, crop_plan: Optional[CropPlan] = None,
+                 origin: Tuple[int, int] = (0, 0)):
         """初始化窗口捕获
-        
+
         Args:
             device_idx: 设备索引
             output_idx: 输出屏幕索引（多屏幕时指定）
             target_fps: 目标帧率
+            backend: 截图后端，None 时使用 dxcam
+            crop_plan: 裁剪计划，指定后 capture() 只返回各区域的外接矩形
+            origin: 该屏幕左上角在虚拟桌面中的坐标（多屏时区域使用虚拟桌面坐标）
         """
-        print(dxcam.device_info())
-        print(dxcam.output_info())
         self.device_idx = device_idx
         self.output_idx = output_idx
-        self.camera = dxcam.create(device_idx=device_idx, output_idx=output_idx, output_color="BGR", max_buffer_len=max_buffer_len)
-        self.camera.start(target_fps=target_fps, video_mode=True)
+        self.origin = origin
+        if backend is None:
+            backend = DxcamBackend(device_idx, output_idx, target_fps, max_buffer_len)
+        self.backend = backend
+        # 同一截图流可以同时有多个录制（多实例共用截图流时每个实例各录各的区域）；
+        # 增删时整体替换元组，取帧线程遍历的始终是完整的快照
+        self.recorders: Tuple[FrameRecorder, ...] = ()
+        self.crop_plan = None
+        if crop_plan is not None:
+            self.set_crop_plan(crop_plan)
+        # 取帧线程：新帧到达时递增序号并唤醒 wait_frame() 的等待者
+        self.frame_seq = -1
+        self._latest = None
+        self._latest_ts = 0.0
+        self._cond = threading.Condition()
+        self._pump = None
+        self._pump_running = False
+        # 可选的共享内存帧环形缓冲区 (frame_ring.SharedFrameRing)，OCR 工作进程从中按序号取帧
+        self.frame_ring = None
+
+    def set_frame_ring(self, ring):
+        """每一帧同时写入共享内存环形缓冲区，槽位序号与 frame_seq 一致
+
+        其他进程按 (frame_seq, frame_region) 直接在共享内存上裁剪区域，不用 pickle 传图像。
+        形状与缓冲区不一致的帧（例如未设置裁剪计划时）不写入，读取方按序号取不到该帧。
+        """
+        self.frame_ring = ring
+
+    def set_crop_plan(self, crop_plan: Optional[CropPlan]):
+        """设置裁剪计划，None 恢复整屏截图"""
+        self.crop_plan = crop_plan
+        if crop_plan is None:
+            self.backend.set_region(None)
+        else:
+            # 后端使用屏幕内坐标
+            left, top, right, bottom = crop_plan.bounds
+            ox, oy = self.origin
+            self.backend.set_region((left - ox, top - oy, right - ox, bottom - oy))
+
+    def frame_region(self, region: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """把屏幕坐标换算为 capture() 返回帧内的坐标（点击仍使用屏幕坐标）"""
+        if self.crop_plan is None:
+            left, top, right, bottom = region
+            ox, oy = self.origin
+            return (left - ox, top - oy, right - ox, bottom - oy)
+        return self.crop_plan.local_region(region)
+
+    def _publish(self, img: np.ndarray, timestamp: float) -> int:
+        """登记一帧新画面并唤醒等待者，返回其序号
+
+        img 不做拷贝直接交给消费者，后端每次 capture() 必须返回不会再被改写的数组。
+        """
+        for recorder in self.recorders:
+            recorder.append(img, timestamp)
+        with self._cond:
+            self.frame_seq += 1
+            if self.frame_ring is not None and img.shape == self.frame_ring.shape:
+                self.frame_ring.write(img, timestamp, self.frame_seq)
+            self._latest = img
+            self._latest_ts = timestamp
+            self._cond.notify_all()
+            return self.frame_seq
+
+    def _pump_loop(self):
+        while self._pump_running:
+            img = self.backend.capture()
+            if img is None:
+                # dxcam 偶尔拿不到帧，回放结束后也会一直返回 None
+                time.sleep(0.001)
+                continue
+            self._publish(img, self.backend.frame_timestamp)
+
+    def start_pump(self):
+        """启动后台取帧线程（wait_frame 首次调用时会自动启动）
+
+        启动后 capture() 不再直接访问后端，而是立即返回取帧线程拿到的最新一帧。
+        """
+        if self._pump is not None:
+            return
+        self._pump_running = True
+        self._pump = threading.Thread(target=self._pump_loop, name="WindowCapturePump", daemon=True)
+        self._pump.start()
+
+    def stop_pump(self):
+        if self._pump is not None:
+            self._pump_running = False
+            self._pump.join(timeout=1.0)
+            self._pump = None
+
+    def wait_frame(self, after_seq: int = -1, timeout: Optional[float] = None) -> Optional[Tuple[int, float, np.ndarray]]:
+        """阻塞等待序号大于 after_seq 的新帧
+
+        Args:
+            after_seq: 上一次处理过的帧序号，-1 表示任意帧
+            timeout: 超时时间（秒），None 表示一直等待
+
+        Returns:
+            (seq, timestamp, frame)，超时返回 None。消费者把返回的 seq 作为下一次的 after_seq，
+            每一帧只会被处理一次，处理过慢时会跳到最新帧。
+        """
+        self.start_pump()
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.frame_seq > after_seq, timeout):
+                return None
+            return self.frame_seq, self._latest_ts, self._latest
+
+    def latest_frame(self) -> Optional[Tuple[int, float, np.ndarray]]:
+        """同 capture()，但同时返回该帧的序号和时间戳 (seq, timestamp, frame)，拿不到帧时返回 None
+
+        取帧线程运行时 frame_seq / frame_timestamp 随时会被更新到更新的帧，
+        需要知道某一帧截图时刻的调用方（例如 OCR 完成后再用时间戳）应使用这里一起拿到的值。
+        """
+        if self._pump is not None:
+            with self._cond:
+                if self._latest is None:
+                    return None
+                return self.frame_seq, self._latest_ts, self._latest
+        img = self.backend.capture()
+        if img is None:
+            return None
+        timestamp = self.backend.frame_timestamp
+        return self._publish(img, timestamp), timestamp, img
 
     def capture(self) -> np.ndarray:
-        img = self.camera.get_latest_frame()
+        if self._pump is not None:
+            with self._cond:
+                return self._latest
+        img = self.backend.capture()
+        if img is not None:
+            self._publish(img, self.backend.frame_timestamp)
         return img
 
+    def start_recording(self, filepath: str, capacity: int, names: Optional[List[str]] = None) -> FrameRecorder:
+        """开始录制 capture() 拿到的每一帧
+
+        Args:
+            filepath: 录制文件路径 (.dfrec)
+            capacity: 最多录制的帧数，文件按此一次性分配
+            names: 只录制这些区域（需要已设置裁剪计划），None 表示整帧
+        """
+        width, height = self.resolution
+        regions = None
+        if names is not None:
+            if self.crop_plan is None:
+                raise RuntimeError("按区域录制需要先设置裁剪计划")
+            regions = {name: self.frame_region(self.crop_plan.regions[name]) for name in names}
+        origin = self.origin
+        if self.crop_plan is not None:
+            origin = (self.crop_plan.bounds[0], self.crop_plan.bounds[1])
+        recorder = FrameRecorder(filepath, (height, width, 3), capacity, regions, origin)
+        self.recorders = self.recorders + (recorder,)
+        return recorder
+
+    def stop_recording(self, recorder: Optional[FrameRecorder] = None):
+        """停止录制并关闭文件
+
+        Args:
+            recorder: start_recording() 返回的录制，None 表示停止全部
+        """
+        stopped = self.recorders if recorder is None else tuple(r for r in self.recorders if r is recorder)
+        self.recorders = tuple(r for r in self.recorders if r not in stopped)
+        for r in stopped:
+            r.close()
+
+    def capture_rois(self) -> Optional[Dict[str, np.ndarray]]:
+        """截图并返回裁剪计划中每个区域的独立缓冲区"""
+        if self.crop_plan is None:
+            raise RuntimeError("未设置裁剪计划")
+        frame = self.capture()
+        if frame is None:
+            return None
+        return self.crop_plan.crop_regions(frame)
+
+    @property
+    def frame_timestamp(self) -> float:
+        return self._latest_ts
+
+    @property
+    def resolution(self) -> Tuple[int, int]:
+        return self.backend.resolution
+
     def stop(self):
-        self.camera.stop()
-    
+        self.stop_pump()
+        self.stop_recording()
+        self.backend.stop()
+
+
+def measure_fps(win_cap: WindowCapture, seconds: float = 5.0) -> float:
+    """统计一段时间内 capture() 返回的有效帧率"""
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        frame = win_cap.capture()
+        if frame is None:
+            break
+        frames += 1
+    return frames / (time.perf_counter() - start)
+
+
 if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        # python window_capture.py <回放源> [倍速]：在无桌面的机器上测回放帧率
+        speed = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+        wc = WindowCapture(backend=ReplayBackend(sys.argv[1], speed=speed))
+        print(f"分辨率: {wc.resolution}, 帧率: {measure_fps(wc):.1f} fps")
+        wc.stop()
+        sys.exit(0)
     wc = WindowCapture()
     from region_selector import RegionSelector
     selector = RegionSelector()